@@ -11,7 +11,7 @@ This command:
 """
 import sys
 from argparse import ArgumentParser
-import pluggage.registry
+from cirrus.registry_cache import get_factory
 
 from cirrus.documentation_utils import build_docs
 from cirrus.environment import is_anaconda
@@ -21,7 +21,7 @@ from cirrus.logger import get_logger
 
 LOGGER = get_logger()
 
-FACTORY = pluggage.registry.get_factory(
+FACTORY = get_factory(
     'builder',
     load_modules=['cirrus.plugins.builders']
 )
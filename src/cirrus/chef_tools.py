@@ -6,13 +6,15 @@ Helpers/utils for modifying chef objects on the server and in a local repo
 
 """
 import os
-import git
 import json
-import chef
 import uuid
 
 from contextlib import contextmanager
 from cirrus.logger import get_logger
+from cirrus.lazy_import import lazy_import
+
+git = lazy_import('git')
+chef = lazy_import('chef')
 
 LOGGER = get_logger()
 
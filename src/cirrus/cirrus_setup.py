@@ -6,15 +6,17 @@ import os
 import sys
 import json
 import getpass
-import requests
 
 from argparse import ArgumentParser
 
 from cirrus.configuration import load_setup_configuration, get_creds_plugin
 from cirrus.logger import get_logger
 from cirrus.environment import is_anaconda, cirrus_bin
+from cirrus.registry_cache import write_registry
+from cirrus.lazy_import import lazy_import
 from cirrus._2to3 import get_raw_input
 
+requests = lazy_import('requests')
 LOGGER = get_logger()
 GITHUB_AUTH_URL = "https://api.github.com/authorizations"
 
@@ -371,32 +373,43 @@ def main():
     opts = build_parser(sys.argv[1:])
     config = load_setup_configuration()
 
-    # make sure gitconfig has a cirrus section
-    if 'cirrus' not in config.gitconfig.sections:
-        config.gitconfig.add_section('cirrus')
+    # journal the gitconfig changes and write them in one go
+    with config.gitconfig.batch():
+        # make sure gitconfig has a cirrus section
+        if 'cirrus' not in config.gitconfig.sections:
+            config.gitconfig.add_section('cirrus')
+
+        if is_anaconda():
+            config.gitconfig.set_param(
+                'alias',
+                'cirrus',
+                '! {0}/cirrus'.format(cirrus_bin())
+            )
+        else:
+            config.gitconfig.set_param(
+                'alias',
+                'cirrus',
+                '! {0}/bin/cirrus'.format(os.environ['VIRTUALENV_HOME'])
+            )
 
-    if is_anaconda():
-        config.gitconfig.set_param(
-            'alias',
-            'cirrus',
-            '! {0}/cirrus'.format(cirrus_bin())
-        )
-    else:
-        config.gitconfig.set_param(
-            'alias',
-            'cirrus',
-            '! {0}/bin/cirrus'.format(os.environ['VIRTUALENV_HOME'])
-        )
+        # make sure the creds plugin value is set
+        if opts.cred_plugin is not None:
+            config.set_gitconfig_param('credential-plugin', opts.cred_plugin)
 
-    # make sure the creds plugin value is set
     if opts.cred_plugin is not None:
-        config._set_creds_plugin(opts.cred_plugin)
+        config._load_creds_plugin()
 
     if not opts.robot_mode:
         interactive_setup(opts, config)
     else:
         robot_setup(opts, config)
 
+    # precompute the command and plugin registry for fast startup
+    try:
+        write_registry()
+    except RuntimeError as ex:
+        LOGGER.warning("Unable to write registry cache: {0}".format(ex))
+
 
 
 if __name__ == '__main__':
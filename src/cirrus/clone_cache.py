@@ -0,0 +1,210 @@
+#!/usr/bin/env python
+"""
+_clone_cache_
+
+Cache of shallow, partial clones of remote repos.
+
+Each remote gets one bare clone in clone_cache under the cirrus
+home dir, made with --filter=blob:none --depth 1 so only the
+commit being used is transferred. Tags already in the cache are
+used without contacting the remote, other refs are updated with
+an incremental --depth 1 fetch. Working copies are checked out
+from the cache as git worktrees so they share its object store.
+
+Override the location with the CIRRUS_CLONE_CACHE env var, set
+it to "off" to disable it.
+
+"""
+import os
+import hashlib
+import shutil
+
+from cirrus.environment import cirrus_home
+from cirrus.logger import get_logger
+from cirrus.lazy_import import lazy_import
+from cirrus._2to3 import unicode_
+
+git = lazy_import('git')
+
+LOGGER = get_logger()
+CACHE_DIR = 'clone_cache'
+CLONE_OPTIONS = ('--filter=blob:none', '--depth', '1')
+
+
+def cache_directory():
+    """
+    path to the clone cache directory or None if
+    caching is disabled or cirrus home cant be found
+    """
+    override = os.environ.get('CIRRUS_CLONE_CACHE')
+    if override is not None:
+        if override.lower() in ('off', 'false', '0', ''):
+            return None
+        return override
+    try:
+        return os.path.join(cirrus_home(), CACHE_DIR)
+    except RuntimeError:
+        return None
+
+
+def shallow_clone(clone_url, dirname, tag=None):
+    """
+    _shallow_clone_
+
+    Plain shallow, partial clone of clone_url into dirname,
+    at tag if provided, for use when the cache is disabled
+
+    """
+    if os.path.exists(dirname):
+        shutil.rmtree(dirname)
+    args = list(CLONE_OPTIONS)
+    if tag is not None:
+        args.extend(['--branch', tag])
+    git.Git().clone(clone_url, dirname, *args)
+
+
+class CloneCache(object):
+    """
+    _CloneCache_
+
+    Directory of bare partial clones, one per repo url.
+
+    :param directory: where the cached clones live
+
+    """
+    def __init__(self, directory):
+        self.directory = directory
+
+    def path(self, repo_url):
+        """path to the cached clone for repo_url"""
+        name = repo_url.rstrip('/').split('/')[-1]
+        if name.endswith('.git'):
+            name = name[:-4]
+        digest = hashlib.sha1(repo_url.encode('utf-8')).hexdigest()[:12]
+        return os.path.join(
+            self.directory, "{0}-{1}.git".format(name, digest)
+        )
+
+    def _resolve(self, mirror, ref):
+        """sha for ref in the cached clone or None"""
+        try:
+            return git.Git(mirror).rev_parse(
+                '--verify', '-q', "{0}^{{commit}}".format(ref)
+            )
+        except git.exc.GitCommandError:
+            return None
+
+    def update(self, repo_url, tag=None, clone_url=None):
+        """
+        _update_
+
+        Make sure the cached clone for repo_url has tag (or the
+        remote HEAD if tag is None), cloning or fetching as needed.
+
+        :param repo_url: url used to key the cache
+        :param tag: tag to fetch, tags are treated as immutable so a
+           tag that is already in the cache is not fetched again
+        :param clone_url: url to clone/fetch from if different from
+           repo_url, eg with credentials embedded
+        :returns: path to the cached clone, sha of the commit
+
+        """
+        clone_url = clone_url or repo_url
+        mirror = self.path(repo_url)
+        tag_ref = None if tag is None else "refs/tags/{0}".format(tag)
+        if not os.path.exists(mirror):
+            LOGGER.info("Cloning {0} into {1}".format(repo_url, mirror))
+            if not os.path.exists(self.directory):
+                os.makedirs(self.directory)
+            args = ['--bare'] + list(CLONE_OPTIONS)
+            if tag is not None:
+                args.extend(['--branch', tag])
+            git.Git().clone(clone_url, mirror, *args)
+            return mirror, self._resolve(mirror, tag_ref or 'HEAD')
+
+        mirror_git = git.Git(mirror)
+        # credentials may have changed since the clone
+        mirror_git.config('remote.origin.url', clone_url)
+        if tag_ref is not None:
+            sha = self._resolve(mirror, tag_ref)
+            if sha is not None:
+                LOGGER.debug("{0} {1} found in clone cache".format(repo_url, tag))
+                return mirror, sha
+            LOGGER.info("Fetching {0} {1}".format(repo_url, tag))
+            mirror_git.fetch(
+                'origin', "+{0}:{0}".format(tag_ref), *CLONE_OPTIONS
+            )
+            return mirror, self._resolve(mirror, tag_ref)
+        LOGGER.info("Fetching {0} HEAD".format(repo_url))
+        mirror_git.fetch('origin', 'HEAD', *CLONE_OPTIONS)
+        return mirror, self._resolve(mirror, 'FETCH_HEAD')
+
+    def checkout(self, repo_url, dirname, tag=None, clone_url=None):
+        """
+        _checkout_
+
+        Check out tag (or the remote HEAD) from the cached clone
+        of repo_url as a detached worktree in dirname. An existing
+        worktree already at the right commit is left alone.
+
+        :returns: sha checked out
+
+        """
+        mirror, sha = self.update(repo_url, tag=tag, clone_url=clone_url)
+        dirname = os.path.abspath(dirname)
+        if os.path.exists(dirname):
+            worktree = git.Git(dirname)
+            try:
+                common_dir = worktree.rev_parse('--git-common-dir')
+                head = worktree.rev_parse('HEAD')
+            except git.exc.GitCommandError:
+                common_dir = head = None
+            if common_dir is not None and os.path.samefile(
+                    os.path.join(dirname, common_dir), mirror):
+                if head != sha:
+                    worktree.checkout('--detach', sha)
+                return sha
+            # not one of ours, eg an old full clone
+            shutil.rmtree(dirname)
+        mirror_git = git.Git(mirror)
+        mirror_git.worktree('prune')
+        mirror_git.worktree('add', '--detach', dirname, sha)
+        return sha
+
+    def clear(self):
+        """remove all cached clones"""
+        if os.path.exists(self.directory):
+            shutil.rmtree(self.directory)
+
+
+def clone_cache():
+    """
+    the CloneCache for the default location or None
+    if caching is disabled
+    """
+    directory = cache_directory()
+    if directory is None:
+        return None
+    return CloneCache(directory)
+
+
+def checkout(repo_url, dirname, tag=None, clone_url=None):
+    """
+    _checkout_
+
+    Get a working copy of repo_url at tag in dirname, via the
+    clone cache if enabled, otherwise with a shallow clone
+
+    """
+    cache = clone_cache()
+    if cache is None:
+        shallow_clone(clone_url or repo_url, dirname, tag=tag)
+        return
+    try:
+        cache.checkout(repo_url, dirname, tag=tag, clone_url=clone_url)
+    except git.exc.GitCommandError as ex:
+        msg = "Unable to check out {0} {1}: {2}".format(
+            repo_url, tag or 'HEAD', unicode_(ex)
+        )
+        LOGGER.error(msg)
+        raise RuntimeError(msg)
@@ -0,0 +1,137 @@
+#!/usr/bin/env python
+"""
+_commit_cache_
+
+Content addressed cache of parsed commit rows used to build
+release notes. Commits never change once written, so a row keyed
+by its sha is valid forever and re-running a release, or building
+a nightly from the same base, only has to parse the commits that
+are new since the last build.
+
+The cache is opt in, see release new --commit-cache, as a warm
+cache only matches a streaming git log on a 50000 commit history
+and mainly helps on large packs or slow disks.
+
+Rows are stored in 256 json shard files, keyed on the first two
+hex digits of the sha, under cirrus/commit_cache in the repo's git
+dir. Shard mtimes are used as the LRU clock, once the cache grows
+past max_bytes the least recently used shards are dropped.
+
+"""
+import os
+import json
+
+from cirrus.logger import get_logger
+
+LOGGER = get_logger()
+CACHE_DIR = os.path.join('cirrus', 'commit_cache')
+MAX_CACHE_BYTES = 32 * 1024 * 1024
+
+
+def cache_directory(git_dir):
+    """path to the commit cache for the given git dir"""
+    return os.path.join(git_dir, CACHE_DIR)
+
+
+class CommitCache(object):
+    """
+    _CommitCache_
+
+    sha: commit row store, shards are read on first access and
+    changes are held in memory until flush is called
+
+    """
+    def __init__(self, directory, max_bytes=MAX_CACHE_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._shards = {}
+        self._dirty = set()
+
+    def _path(self, prefix):
+        return os.path.join(self.directory, "{0}.json".format(prefix))
+
+    def _shard(self, sha):
+        prefix = sha[:2]
+        shard = self._shards.get(prefix)
+        if shard is None:
+            path = self._path(prefix)
+            try:
+                with open(path, 'r') as handle:
+                    shard = json.load(handle)
+                os.utime(path, None)
+            except (IOError, OSError, ValueError):
+                shard = {}
+            self._shards[prefix] = shard
+        return shard
+
+    def get(self, sha):
+        """return the cached row for sha or None"""
+        row = self._shard(sha).get(sha)
+        if row is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return row
+
+    def put(self, sha, row):
+        """store the row for sha, written out by flush"""
+        self._shard(sha)[sha] = row
+        self._dirty.add(sha[:2])
+
+    def flush(self):
+        """write changed shards and evict old ones"""
+        if not self._dirty:
+            return
+        try:
+            if not os.path.exists(self.directory):
+                os.makedirs(self.directory)
+            for prefix in sorted(self._dirty):
+                path = self._path(prefix)
+                tmp_file = "{0}.tmp".format(path)
+                with open(tmp_file, 'w') as handle:
+                    handle.write(json.dumps(self._shards[prefix]))
+                os.rename(tmp_file, path)
+        except (IOError, OSError) as ex:
+            LOGGER.debug("Unable to write commit cache: {0}".format(ex))
+            return
+        self._dirty.clear()
+        self.evict()
+
+    def entries(self):
+        """list of (mtime, size, path) for the shard files, oldest first"""
+        result = []
+        for name in os.listdir(self.directory):
+            if not name.endswith('.json'):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            result.append((stat.st_mtime, stat.st_size, path))
+        result.sort()
+        return result
+
+    def evict(self):
+        """remove least recently used shards until under max_bytes"""
+        entries = self.entries()
+        total = sum(e[1] for e in entries)
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+
+    def clear(self):
+        """remove all cached rows"""
+        self._shards = {}
+        self._dirty.clear()
+        if not os.path.exists(self.directory):
+            return
+        for _, _, path in self.entries():
+            os.remove(path)
@@ -10,14 +10,20 @@ Commands should access this by doing
 from cirrus.configuration import load_configuration
 conf = load_configuration()
 
+Loaded configurations are cached per process, keyed on the
+cirrus.conf and gitconfig paths and invalidated when either
+file changes. Each caller gets its own copy of the sections.
+
 """
 import os
+import hashlib
 import subprocess
 
-from cirrus.gitconfig import load_gitconfig
+from cirrus.gitconfig import load_gitconfig, can_parse_natively
 from cirrus.environment import repo_directory
 
-import pluggage.registry
+from cirrus.registry_cache import get_factory
+from cirrus.version_edits import VersionEdits
 from cirrus._2to3 import ConfigParser
 
 
@@ -27,7 +33,7 @@ def get_creds_plugin(plugin_name):
 
     Get the credential access plugin requested from the factory
     """
-    factory = pluggage.registry.get_factory(
+    factory = get_factory(
         'credentials',
         load_modules=['cirrus.plugins.creds']
     )
@@ -69,14 +75,21 @@ class Configuration(dict):
                 )
         if self.gitconfig_file is None:
             self.gitconfig_file = os.path.join(os.environ['HOME'], '.gitconfig')
-        self.gitconfig = load_gitconfig(self.gitconfig_file)
+        self.gitconfig = load_gitconfig(
+            self.gitconfig_file,
+            native=can_parse_natively(self.gitconfig_file)
+        )
         self._load_creds_plugin()
 
     def setup_load(self):
         if self.gitconfig_file is None:
             self.gitconfig_file = os.path.join(os.environ['HOME'], '.gitconfig')
-        self.gitconfig = load_gitconfig(self.gitconfig_file)
-        self.gitconfig.add_section('cirrus')
+        self.gitconfig = load_gitconfig(
+            self.gitconfig_file,
+            native=can_parse_natively(self.gitconfig_file)
+        )
+        with self.gitconfig.batch():
+            self.gitconfig.add_section('cirrus')
         self._load_creds_plugin()
 
     def _load_creds_plugin(self):
@@ -194,6 +207,17 @@ class Configuration(dict):
     def venv_name(self):
         return self.get('build', {}).get('virtualenv_name', 'venv')
 
+    def release_formats(self):
+        """
+        artifact formats built by git cirrus release build, eg
+
+        [build]
+        release_formats = sdist wheel
+        """
+        return parse_list(
+            self.get('build', {}).get('release_formats', 'sdist')
+        )
+
     def extras_require(self):
         """
         support for extras_require additional requirement sets
@@ -239,16 +263,50 @@ class Configuration(dict):
             self.get('package', {}).get('version_attribute', '__version__')
         )
 
+    def clone(self):
+        """
+        _clone_
+
+        Return a copy of this configuration with its own section
+        dicts and parser. The gitconfig and credentials are shared.
+        """
+        result = Configuration(
+            self.config_file, gitconfig_file=self.gitconfig_file
+        )
+        for section, values in self.items():
+            result[section] = dict(values)
+        if self.parser is not None:
+            result.parser = ConfigParser.RawConfigParser()
+            for section in self.parser.sections():
+                result.parser.add_section(section)
+                for option, value in self.parser.items(section):
+                    result.parser.set(section, option, value)
+        result.credentials = self.credentials
+        result.gitconfig = self.gitconfig
+        return result
+
     def update_package_version(self, new_version):
         """
         _update_package_version_
 
-        Update the version in the configuration field
+        Update the version in the configuration field, editing
+        only the version line of cirrus.conf
         """
-        self['package']['version'] = new_version
+        edits = VersionEdits()
+        edits.set_config_version(self.config_file, new_version)
+        edits.apply()
+        self.set_package_version(new_version)
+
+    def set_package_version(self, new_version):
+        """
+        update the loaded version after cirrus.conf has been
+        edited on disk, eg by a VersionEdits
+        """
+        self.setdefault('package', {})['version'] = new_version
+        if not self.parser.has_section('package'):
+            self.parser.add_section('package')
         self.parser.set('package', 'version', new_version)
-        with open(self.config_file, 'w') as handle:
-            self.parser.write(handle)
+        invalidate_configuration(self.config_file)
 
     def add_docker_settings(self, template, context, directory, repo=None):
         """
@@ -267,6 +325,7 @@ class Configuration(dict):
             self.parser.set('docker', 'repo', repo)
         with open(self.config_file, 'w') as handle:
             self.parser.write(handle)
+        invalidate_configuration(self.config_file)
 
     def configuration_map(self):
         result = {
@@ -278,7 +337,52 @@ class Configuration(dict):
         return result
 
 
-def load_configuration(package_dir=None, gitconfig_file=None):
+_CONFIG_CACHE = {}
+
+
+def _file_stamp(filename):
+    """
+    inode, size and content hash of filename, None if missing.
+    The files are small so hashing them is cheap next to parsing
+    them, and catches same size edits within the mtime resolution
+    """
+    try:
+        stat = os.stat(filename)
+        with open(filename, 'rb') as handle:
+            digest = hashlib.sha1(handle.read()).hexdigest()
+    except (OSError, IOError):
+        return None
+    return (stat.st_ino, stat.st_size, digest)
+
+
+def _gitconfig_path(gitconfig_file):
+    """resolve the gitconfig file that load_gitconfig will read"""
+    if os.environ.get('CIRRUS_GITCONFIG') is not None:
+        return os.environ['CIRRUS_GITCONFIG']
+    if gitconfig_file is None:
+        return os.path.join(os.environ.get('HOME', ''), '.gitconfig')
+    return gitconfig_file
+
+
+def invalidate_configuration(config_path=None):
+    """
+    _invalidate_configuration_
+
+    Drop cached configurations for the cirrus.conf file
+    provided, or all cached configurations if None.
+    Code that writes cirrus.conf should call this.
+
+    """
+    if config_path is None:
+        _CONFIG_CACHE.clear()
+        return
+    config_path = os.path.abspath(config_path)
+    for key in list(_CONFIG_CACHE.keys()):
+        if key[0] == config_path:
+            del _CONFIG_CACHE[key]
+
+
+def load_configuration(package_dir=None, gitconfig_file=None, cached=True):
     """
     _load_configuration_
 
@@ -287,6 +391,8 @@ def load_configuration(package_dir=None, gitconfig_file=None):
 
     :param package_dir: Location of cirrus managed package if not pwd
     :param gitconfig_file: Path to gitconfig if not ~/.gitconfig
+    :param cached: If True (default) reuse a previously loaded
+        configuration if neither file has changed since
     :returns: Configuration instance
 
     """
@@ -304,9 +410,18 @@ def load_configuration(package_dir=None, gitconfig_file=None):
         msg = "Couldnt find ./cirrus.conf, are you in a package directory?"
         raise RuntimeError(msg)
 
+    git_path = _gitconfig_path(gitconfig_file)
+    key = (os.path.abspath(config_path), os.path.abspath(git_path))
+    stamp = (_file_stamp(config_path), _file_stamp(git_path))
+    if cached and key in _CONFIG_CACHE:
+        cached_stamp, config_instance = _CONFIG_CACHE[key]
+        if cached_stamp == stamp:
+            return config_instance.clone()
+
     config_instance = Configuration(config_path, gitconfig_file=gitconfig_file)
     config_instance.load()
-    return config_instance
+    _CONFIG_CACHE[key] = (stamp, config_instance)
+    return config_instance.clone()
 
 
 def load_setup_configuration(package_dir=None, gitconfig_file=None):
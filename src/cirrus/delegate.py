@@ -8,15 +8,26 @@ the sub command verb enabling
 git cirrus do_a_thing  to be routed to the appropriate
 command call for do_a_thing
 
+By default the verb is run as a subprocess using the console
+script installed in the cirrus virtualenv. Setting the
+CIRRUS_DISPATCH env var to inprocess will instead load the
+entry point for the verb and call it in this interpreter,
+avoiding the cost of starting a second python process.
+
 """
 import os
 import os.path
-import pkg_resources
 import sys
 import signal
 import subprocess
 
 import cirrus.environment as env
+import cirrus.registry_cache as registry_cache
+
+
+DISPATCH_ENV = 'CIRRUS_DISPATCH'
+DISPATCH_SUBPROCESS = 'subprocess'
+DISPATCH_INPROCESS = 'inprocess'
 
 
 def install_signal_handlers():
@@ -38,6 +49,95 @@ def run_command(cmd):
     return subprocess.call(cmd, shell=False)
 
 
+def exit_status(code):
+    """
+    convert a command return value or SystemExit code
+    into an integer exit status, mimicking the interpreter
+    """
+    if code is None:
+        return 0
+    if isinstance(code, int):
+        return code
+    sys.stderr.write("{0}\n".format(code))
+    return 1
+
+
+def run_in_process(func, argv):
+    """
+    _run_in_process_
+
+    call the command function func with sys.argv set to argv,
+    catching SystemExit so that the exit status can be returned
+    as it would be by a subprocess
+
+    """
+    install_signal_handlers()
+    saved_argv = sys.argv
+    sys.argv = argv
+    try:
+        result = func()
+    except SystemExit as ex:
+        result = ex.code
+    finally:
+        sys.argv = saved_argv
+    return exit_status(result)
+
+
+class CommandTable(object):
+    """
+    _CommandTable_
+
+    Lazily populated map of cirrus command name to entry point.
+    Entry points are read from the registry cache if it is valid,
+    otherwise they are scanned when first needed. The command
+    module is only imported when it is loaded
+
+    """
+    def __init__(self, group="cirrus_commands"):
+        self.group = group
+        self._entry_points = None
+
+    @property
+    def entry_points(self):
+        """name: entry point map, populated on first access"""
+        if self._entry_points is None:
+            self._entry_points = registry_cache.command_entry_points()
+        if self._entry_points is None:
+            import pkg_resources
+            self._entry_points = {
+                ep.name: ep
+                for ep in pkg_resources.iter_entry_points(group=self.group)
+            }
+        return self._entry_points
+
+    def names(self):
+        """sorted list of available command names"""
+        return sorted(self.entry_points.keys())
+
+    def __contains__(self, name):
+        return name in self.entry_points
+
+    def load(self, name):
+        """import and return the callable for the named command"""
+        return self.entry_points[name].load()
+
+
+def dispatch_mode():
+    """
+    get the dispatch mode from the environment, defaults
+    to running commands as subprocesses, with a warning if
+    the env var is set to something unknown
+    """
+    mode = os.environ.get(DISPATCH_ENV, DISPATCH_SUBPROCESS)
+    if mode not in (DISPATCH_SUBPROCESS, DISPATCH_INPROCESS):
+        msg = (
+            "Unknown {0} value: {1}, expected {2} or {3}, using {2}\n"
+        ).format(DISPATCH_ENV, mode, DISPATCH_SUBPROCESS, DISPATCH_INPROCESS)
+        sys.stderr.write(msg)
+        return DISPATCH_SUBPROCESS
+    return mode
+
+
 HELP = \
 """
 Cirrus commands available are:
@@ -56,7 +156,7 @@ def format_help(command_list):
     return HELP.format(subs)
 
 
-def main():
+def main(commands=None):
     """
     _main_
 
@@ -64,13 +164,13 @@ def main():
     Extracts the available verbs that are installed as
     entry points by setup.py as cirrus_commands
 
+    :param commands: optional CommandTable, defaults to one
+       built from the cirrus_commands entry points
+
     """
-    home = env.virtualenv_home()
-    commands = []
-    for script in pkg_resources.iter_entry_points(group="cirrus_commands"):
-        comm = str(script).split(" = ", 1)[0]
-        commands.append(comm)
-    commands.sort()
+    if commands is None:
+        commands = CommandTable()
+    mode = dispatch_mode()
 
     # switch to the current GIT_PREFIX working dir
     old_dir = os.getcwd()
@@ -80,14 +180,20 @@ def main():
         args = sys.argv[1:]
         if len(args) == 0 or args[0] == '-h':
             # missing command or help
-            print(format_help(commands))
+            print(format_help(commands.names()))
             exit_code = 0
         else:
+            home = env.virtualenv_home()
             command_path = "{0}/bin/{1}".format(home, args[0])
-            if not os.path.exists(command_path):
+            if mode == DISPATCH_INPROCESS and args[0] in commands:
+                exit_code = run_in_process(
+                    commands.load(args[0]),
+                    [command_path, ] + args[1:]
+                )
+            elif not os.path.exists(command_path):
                 msg = "Unknown command: {}".format(args[0])
                 print(msg)
-                print(format_help(commands))
+                print(format_help(commands.names()))
                 exit_code = 127
             else:
                 exit_code = run_command([command_path, ] + args[1:])
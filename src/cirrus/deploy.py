@@ -8,7 +8,7 @@ Essentially a thin wrapper for the deploy_plugins
 module and its constituent bits
 
 """
-import pluggage.registry
+from cirrus.registry_cache import get_factory
 from argparse import ArgumentParser
 from cirrus.logger import get_logger
 from cirrus.configuration import load_configuration
@@ -23,7 +23,7 @@ def get_plugin(plugin_name):
 
     Get the deploy plugin requested from the factory
     """
-    factory = pluggage.registry.get_factory(
+    factory = get_factory(
         'deploy',
         load_modules=['cirrus.plugins.deployers']
     )
@@ -8,13 +8,15 @@ import os
 import re
 import sys
 import subprocess
-from distutils.version import StrictVersion
 
 from argparse import ArgumentParser, Action
 from cirrus.logger import get_logger
 from cirrus._2to3 import to_str
 from cirrus.configuration import load_configuration
-import dockerstache.dockerstache as ds
+from cirrus.lazy_import import lazy_import, lazy_attribute
+
+ds = lazy_import('dockerstache.dockerstache')
+StrictVersion = lazy_attribute('distutils.version', 'StrictVersion')
 
 LOGGER = get_logger()
 
@@ -10,7 +10,7 @@ import sys
 import tarfile
 
 from cirrus.invoke_helpers import local
-import pluggage.registry
+from cirrus.registry_cache import get_factory
 
 from cirrus.configuration import load_configuration
 from cirrus.logger import get_logger
@@ -24,7 +24,7 @@ def get_publisher_plugin(plugin_name):
 
     Get the publisher plugin requested from the factory
     """
-    factory = pluggage.registry.get_factory(
+    factory = get_factory(
         'publish',
         load_modules=['cirrus.plugins.publishers']
     )
@@ -22,6 +22,73 @@ from cirrus._2to3 import to_str
 NUMBER_OF_SUBDIRS = 6
 
 
+_GIT_ENVIRONMENT = {}
+
+
+def _rev_parse(*args):
+    """run git rev-parse with args, returns output lines or None"""
+    command = ['git', 'rev-parse']
+    command.extend(args)
+    process = subprocess.Popen(
+        command, stdout=subprocess.PIPE, stderr=subprocess.PIPE
+    )
+    outp, err = process.communicate()
+    if process.returncode:
+        return None
+    return [to_str(x).strip() for x in outp.strip().splitlines()]
+
+
+def git_environment():
+    """
+    _git_environment_
+
+    Discover the git repo top level dir, git dir and current
+    branch for the current working directory with a single
+    git rev-parse call. The result is cached per working
+    directory, call invalidate_git_environment after changing
+    branch.
+
+    Returns a dict with repo_dir, git_dir and branch keys, or
+    None if not in a git repo. branch is None if HEAD does not
+    point at a commit yet and HEAD if it is detached
+
+    """
+    try:
+        cwd = os.getcwd()
+    except OSError:
+        # working dir has been removed
+        return None
+    cached = _GIT_ENVIRONMENT.get(cwd)
+    if cached is not None and os.path.isdir(cached['repo_dir']):
+        return cached
+
+    lines = _rev_parse('--show-toplevel', '--git-dir', '--abbrev-ref', 'HEAD')
+    if lines is None:
+        # no commits yet on HEAD, or not a repo at all
+        lines = _rev_parse('--show-toplevel', '--git-dir')
+        if lines is None:
+            return None
+        lines.append(None)
+    repo_dir, git_dir, branch = (lines + [None, None])[:3]
+    if git_dir is not None:
+        git_dir = os.path.join(cwd, git_dir)
+    result = {
+        'repo_dir': repo_dir,
+        'git_dir': git_dir,
+        'branch': branch
+    }
+    _GIT_ENVIRONMENT[cwd] = result
+    return result
+
+
+def invalidate_git_environment():
+    """
+    clear the cached git environment, call this after
+    checking out a branch or moving a repo
+    """
+    _GIT_ENVIRONMENT.clear()
+
+
 def repo_directory():
     """
     helper method that extracts the current git repo directory
@@ -29,12 +96,32 @@ def repo_directory():
     If in a repo, this returns the path to the top level dir,
     if not, it returns None
     """
-    command = ['git', 'rev-parse', '--show-toplevel']
-    process = subprocess.Popen(command, stdout=subprocess.PIPE)
-    outp, err = process.communicate()
-    if process.returncode:
+    env = git_environment()
+    if env is None:
+        return None
+    return env['repo_dir']
+
+
+def git_directory():
+    """
+    path to the .git dir for the current repo or None
+    if not in a repo
+    """
+    env = git_environment()
+    if env is None:
+        return None
+    return env['git_dir']
+
+
+def active_branch_name():
+    """
+    name of the checked out branch in the current repo or None
+    if not in a repo
+    """
+    env = git_environment()
+    if env is None:
         return None
-    return to_str(outp.strip())
+    return env['branch']
 
 
 def is_anaconda():
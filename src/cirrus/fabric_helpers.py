@@ -6,7 +6,11 @@ Utils/helpers for fabric api
 
 """
 import copy
-from fabric.api import env
+from cirrus.lazy_import import lazy_import
+
+# settings are written to fabric.api.env, so go through the
+# module rather than a proxy for the env object itself
+fabric_api = lazy_import('fabric.api')
 
 
 class FabricHelper(object):
@@ -34,6 +38,7 @@ class FabricHelper(object):
         self.ssh_key_cache = None
 
     def __enter__(self):
+        env = fabric_api.env
         self.hostname_cache = copy.copy(env.host_string)
         self.username_cache = copy.copy(env.user)
         self.ssh_key_cache = copy.copy(env.key_filename)
@@ -44,9 +49,7 @@ class FabricHelper(object):
         return self
 
     def __exit__(self, *args):
+        env = fabric_api.env
         env.host_string = self.hostname_cache
         env.user = self.username_cache
         env.key_filename = self.ssh_key_cache
-
-
-
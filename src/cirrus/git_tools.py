@@ -5,17 +5,72 @@ _git_tools_
 Utils for doing git and github related business
 
 """
+import io
 import os
+import re
+import codecs
+import atexit
+import datetime
 import itertools
-
-import git
-import arrow
+import subprocess
+import collections
 
 from cirrus.logger import get_logger
+from cirrus.commit_cache import CommitCache, cache_directory
+from cirrus.environment import invalidate_git_environment
+from cirrus.lazy_import import lazy_import
 from cirrus._2to3 import unicode_
 
+git = lazy_import('git')
+
 
 LOGGER = get_logger()
+_REPO_POOL = {}
+
+
+def get_repo(repo_dir=None, repo_class=None):
+    """
+    _get_repo_
+
+    Return a shared git.Repo handle for repo_dir, opening it on
+    first use. Reusing the handle keeps GitPython's persistent
+    git cat-file processes alive for the whole command instead of
+    spawning new ones per call. Handles are closed at exit.
+
+    Set CIRRUS_REPO_POOL=off to open a new handle every time.
+
+    :param repo_dir: path to the repo, defaults to the cwd
+    :param repo_class: Repo class to construct, defaults to git.Repo.
+       Modules with their own git import pass their git.Repo
+
+    """
+    if repo_class is None:
+        repo_class = git.Repo
+    if os.environ.get('CIRRUS_REPO_POOL', 'on').lower() in ('off', '0', 'false'):
+        return repo_class(repo_dir)
+    path = os.getcwd() if repo_dir is None else repo_dir
+    key = (os.path.abspath(path), repo_class)
+    repo = _REPO_POOL.get(key)
+    if repo is None:
+        repo = repo_class(repo_dir)
+        _REPO_POOL[key] = repo
+    return repo
+
+
+def close_repos():
+    """
+    close all pooled repo handles, stopping their
+    git helper processes
+    """
+    while _REPO_POOL:
+        _, repo = _REPO_POOL.popitem()
+        try:
+            repo.close()
+        except Exception as ex:
+            LOGGER.debug("Error closing repo handle: {0}".format(ex))
+
+
+atexit.register(close_repos)
 
 
 class RepoInitializer(object):
@@ -27,7 +82,7 @@ class RepoInitializer(object):
 
     """
     def __init__(self, repo=None):
-        self.repo = git.Repo(repo)
+        self.repo = get_repo(repo)
 
     def check_origin(self, origin_name='origin'):
         """verify that origin exists in this repo"""
@@ -63,6 +118,7 @@ class RepoInitializer(object):
         else:
             LOGGER.info("checking out existing branch {}".format(branch_name))
             self.repo.git.checkout(branch_name)
+            invalidate_git_environment()
         local_branch = self.repo.heads[branch_name]
         if remote:
             if not self.branch_exists_origin(branch_name, origin_name):
@@ -99,6 +155,146 @@ class RepoInitializer(object):
         self.branch_status()
 
 
+_FETCHED = {}
+
+
+def fetch_branches(repo, branches, remote='origin'):
+    """
+    _fetch_branches_
+
+    Update the remote tracking refs for branches with a single
+    git fetch from remote. Each branch is only fetched once per
+    process, later calls for the same branch are answered from
+    the record of the first fetch, so a command can fetch all the
+    branches it needs up front and then work locally.
+
+    If any branch is missing on the remote, the ones that exist
+    are found with ls-remote and fetched instead.
+
+    :param repo: git.Repo instance
+    :returns: dict of branch: True/False if it exists on the remote
+
+    """
+    fetched = _FETCHED.setdefault((repo.git_dir, remote), {})
+    wanted = [b for b in branches if b not in fetched]
+    if wanted:
+        refspecs = [
+            "+refs/heads/{0}:refs/remotes/{1}/{0}".format(b, remote)
+            for b in wanted
+        ]
+        try:
+            repo.git.fetch(remote, *refspecs)
+            fetched.update((b, True) for b in wanted)
+        except git.exc.GitCommandError as ex:
+            if "couldn't find remote ref" not in unicode_(ex):
+                raise
+            heads = repo.git.ls_remote('--heads', remote, *wanted)
+            found = set(
+                line.split()[1][len('refs/heads/'):]
+                for line in heads.splitlines() if line.strip()
+            )
+            existing = [b for b in wanted if b in found]
+            if existing:
+                repo.git.fetch(remote, *[
+                    r for b, r in zip(wanted, refspecs) if b in found
+                ])
+            fetched.update((b, b in found) for b in wanted)
+    return dict((b, fetched[b]) for b in branches)
+
+
+def invalidate_fetched():
+    """forget which branches have been fetched"""
+    _FETCHED.clear()
+
+
+def merge_tracking_branch(repo, branch, remote='origin'):
+    """
+    merge the remote tracking ref for branch into the checked out
+    branch, fast forwarding where possible, like git pull would
+    without going back to the remote
+    """
+    tracking = "refs/remotes/{0}/{1}".format(remote, branch)
+    return repo.git.merge('--no-edit', tracking)
+
+
+def push_refs(repo, refs, remote='origin'):
+    """
+    _push_refs_
+
+    Push all the refs (branch names, refs/tags/... etc) to remote
+    in one git push --atomic, so either all of them are updated
+    or none are. Falls back to a plain push if the server doesnt
+    support atomic pushes. Raises RuntimeError on failure.
+
+    """
+    refs = list(refs)
+    try:
+        try:
+            return repo.git.push('--atomic', '--porcelain', remote, *refs)
+        except git.exc.GitCommandError as ex:
+            if 'does not support --atomic' not in unicode_(ex):
+                raise
+            LOGGER.info("{0} does not support atomic pushes".format(remote))
+            return repo.git.push('--porcelain', remote, *refs)
+    except git.exc.GitCommandError as ex:
+        msg = "Push of {0} to {1} failed: {2}".format(
+            ' '.join(refs), remote, ex
+        )
+        LOGGER.error(msg)
+        raise RuntimeError(msg)
+
+
+STATUS_REF = 'refs/cirrus/status/{0}'
+
+
+def publish_commits(repo, shas, remote='origin'):
+    """
+    _publish_commits_
+
+    Make sure the remote knows about the commits so that GitHub
+    statuses can be set on them. Commits already reachable from
+    a remote tracking branch are skipped, the rest are pushed
+    to temporary refs under refs/cirrus/status in one push.
+
+    :returns: list of temporary refs pushed, remove them with
+       unpublish_commits once the statuses are set
+
+    """
+    shas = list(shas)
+    if not shas:
+        return []
+    output = repo.git.rev_list(
+        *shas + ['--not', '--remotes={0}'.format(remote)]
+    )
+    unknown = set(output.split())
+    missing = [sha for sha in shas if sha in unknown]
+    if not missing:
+        return []
+    push_refs(
+        repo,
+        ["{0}:{1}".format(sha, STATUS_REF.format(sha)) for sha in missing],
+        remote
+    )
+    return [STATUS_REF.format(sha) for sha in missing]
+
+
+def unpublish_commits(repo, refs, remote='origin'):
+    """
+    remove the temporary refs created by publish_commits,
+    failures are logged and ignored
+    """
+    if not refs:
+        return
+    try:
+        repo.git.push(remote, '--delete', *refs)
+    except git.exc.GitCommandError as ex:
+        LOGGER.warning(
+            "Unable to remove {0} from {1}: {2}".format(
+                ' '.join(refs), remote, ex
+            )
+        )
+
+
 def checkout_and_pull(repo_dir, branch_from, pull=True, origin='origin'):
     """
     _checkout_and_pull_
@@ -108,23 +304,21 @@ def checkout_and_pull(repo_dir, branch_from, pull=True, origin='origin'):
 
     returns a reference to the pulled branch
     """
-    repo = git.Repo(repo_dir)
+    repo = get_repo(repo_dir)
 
     if str(repo.active_branch) != branch_from:
         git.Git().checkout(branch_from)
+        invalidate_git_environment()
 
-    # pull branch_from from remote
+    # update branch_from from remote, fetching it if this
+    # process hasnt already
     if pull:
-        remote_branch = "remotes/{origin}/{branch}".format(origin=origin, branch=branch_from)
-        ref = "refs/heads/{branch}:refs/{remote_branch}".format(
-            branch=branch_from, remote_branch=remote_branch
-        )
-        branches = [str(x.strip()) for x in repo.git.branch(all=True).split() if x.strip()]
-        if remote_branch not in branches:
-            LOGGER.info("couldnt find remote for {} in {}, skipping pull...".format(branch_from, branches))
+        if origin not in [x.name for x in repo.remotes]:
+            return
+        if not fetch_branches(repo, [branch_from], origin)[branch_from]:
+            LOGGER.info("couldnt find remote for {} on {}, skipping pull...".format(branch_from, origin))
             return
-        if origin in [x.name for x in repo.remotes]:
-            return repo.remotes.origin.pull(ref)
+        return merge_tracking_branch(repo, branch_from, origin)
 
 
 def branch(repo_dir, branchname, branch_from):
@@ -134,16 +328,18 @@ def branch(repo_dir, branchname, branch_from):
     Create a new branch off of branch_from, from repo, named
     branchname
     """
-    repo = git.Repo(repo_dir)
+    repo = get_repo(repo_dir)
 
     if branchname in repo.heads:
         msg = "Branch: {0} already exists.".format(branchname)
         LOGGER.info("{0} Checking it out...".format(msg))
         branch_ref = getattr(repo.heads, branchname)
         branch_ref.checkout()
+        invalidate_git_environment()
     else:
         g = git.Git(repo_dir)
         g.checkout(branch_from, b=branchname)
+        invalidate_git_environment()
 
     if not str(repo.active_branch) == branchname:
         msg = (
@@ -166,7 +362,7 @@ def remote_branch_exists(repo_dir, branchname):
     match = branchname
     if not match.startswith('origin/'):
         match = "origin/{}".format(str(branchname))
-    repo = git.Repo(repo_dir)
+    repo = get_repo(repo_dir)
     resp = repo.git.branch('-r')
     remote_branches = [y for y in resp.split() if y.startswith('origin/')]
     return match in remote_branches
@@ -179,7 +375,7 @@ def has_unstaged_changes(repo_dir):
     Are there changes to tracked files in the repo?
     Return True if so, False if it is clean
     """
-    repo = git.Repo(repo_dir)
+    repo = get_repo(repo_dir)
     output = repo.git.status(
         '--untracked-files=no',  '--porcelain'
     ).split()
@@ -189,7 +385,7 @@ def has_unstaged_changes(repo_dir):
 
 
 def current_branch(repo_dir):
-    repo = git.Repo(repo_dir)
+    repo = get_repo(repo_dir)
     return str(repo.active_branch)
 
 
@@ -205,9 +401,9 @@ def update_to_branch(branch, config, origin='origin'):
     )
     repo_dir = os.getcwd()
 
-    LOGGER.info("fetching remotes...")
-    r = git.Repo(repo_dir)
-    r.remotes[origin].fetch()
+    LOGGER.info("fetching {0}...".format(branch))
+    r = get_repo(repo_dir)
+    fetch_branches(r, [branch], origin)
 
     g = git.Git()
     LOGGER.info("checking out {0}...".format(branch))
@@ -215,12 +411,14 @@ def update_to_branch(branch, config, origin='origin'):
 
     branch_ref = r.heads[branch]
     branch_ref.checkout()
+    invalidate_git_environment()
     return
 
 
 def update_to_tag(tag, config, origin='origin'):
     """
-    checkout specified tag, pulling remote tags first
+    checkout specified tag, fetching it from the remote
+    if it isnt known locally
     """
     LOGGER.info(
         "selfupdate running, will switch to tag {0}".format(
@@ -229,14 +427,18 @@ def update_to_tag(tag, config, origin='origin'):
     )
     repo_dir = os.getcwd()
 
-    LOGGER.info("fetching remote tags...")
-    r = git.Repo(repo_dir)
-    r.remotes[origin].fetch(tags=True)
+    r = get_repo(repo_dir)
+    if tag not in tag_index(repo_dir):
+        # only the requested tag, not every tag and branch
+        LOGGER.info("fetching {0}...".format(tag))
+        r.git.fetch(origin, "+refs/tags/{0}:refs/tags/{0}".format(tag))
+        invalidate_tag_index()
 
     ref = r.tags[tag]
     LOGGER.info("checking out {0}...".format(tag))
     g = git.Git()
     g.checkout(ref)
+    invalidate_git_environment()
     return
 
 
@@ -245,7 +447,7 @@ def commit_files_optional_push(repo_dir, commit_msg, push=True, *filenames):
     commit files to the repo, push remote if required.
 
     """
-    repo = git.Repo(repo_dir)
+    repo = get_repo(repo_dir)
     repo.index.add(filenames)
     for f in filenames:
         if os.access(f, os.X_OK):
@@ -278,7 +480,7 @@ def push(repo_dir):
 
     Push local branch to remote
     """
-    repo = git.Repo(repo_dir)
+    repo = get_repo(repo_dir)
     ret = repo.remotes.origin.push(repo.head)
     # Check to make sure that we haven't errored out.
     for r in ret:
@@ -297,18 +499,18 @@ def tag_release(repo_dir, tag, master='master', push=True):
 
     """
     checkout_and_pull(repo_dir, master, pull=push)
-    repo = git.Repo(repo_dir)
-    exists = any(existing_tag.name == tag for existing_tag in repo.tags)
-    if exists:
+    if tag in tag_index(repo_dir):
         # tag already exists
         msg = (
             "Attempting to create tag {0} on "
             "{1} but tag exists already"
         ).format(tag, master)
         raise RuntimeError(msg)
+    repo = get_repo(repo_dir)
     repo.create_tag(tag)
+    invalidate_tag_index()
     if push:
-        repo.remotes.origin.push(repo.head, tags=True)
+        push_refs(repo, [master, "refs/tags/{0}".format(tag)])
 
 
 def get_active_branch(repo_dir):
@@ -317,7 +519,7 @@ def get_active_branch(repo_dir):
 
     Returns active branch for a give directory
     """
-    repo = git.Repo(repo_dir)
+    repo = get_repo(repo_dir)
     return repo.active_branch
 
 
@@ -330,11 +532,12 @@ def merge(repo_dir, source, destination):
     :returns: sha of the last commit from the merged branch
 
     """
-    repo = git.Repo(repo_dir)
+    repo = get_repo(repo_dir)
     repo.git.checkout(source)
+    invalidate_git_environment()
 
-    ref = "refs/heads/{0}:refs/remotes/origin/{0}".format(source)
-    repo.remotes.origin.pull(ref)
+    if fetch_branches(repo, [source])[source]:
+        merge_tracking_branch(repo, source)
     repo.git.merge(destination)
     latest = repo.head.ref.commit.hexsha
     return latest
@@ -347,7 +550,7 @@ def get_diff_files(repo_dir):
     Returns a list of paths to files that have been changed on
     the working directory
     """
-    repo = git.Repo(repo_dir)
+    repo = get_repo(repo_dir)
     changes = repo.index.diff(None)
     diffs = []
     for diff in changes:
@@ -356,6 +559,121 @@ def get_diff_files(repo_dir):
     return diffs
 
 
+TAG_REF_FORMAT = (
+    '%(refname)%1f%(objectname)%1f%(*objectname)'
+    '%1f%(creatordate:unix)%1f%(*committerdate:unix)'
+)
+_TAG_INDEX = {}
+
+
+def version_sort_key(name):
+    """
+    sort key that orders numeric parts of a tag name by
+    value, so 0.10.0 sorts after 0.9.0
+    """
+    return tuple(
+        (0, int(part), u'') if part.isdigit() else (1, 0, part)
+        for part in re.split(r'(\d+)', name) if part
+    )
+
+
+class TagIndex(object):
+    """
+    _TagIndex_
+
+    Map of the tags in a repo to the sha and date of the
+    commit they point to, built from a single for-each-ref
+
+    """
+    def __init__(self, rows):
+        self.shas = {}
+        self.dates = {}
+        for name, sha, date in rows:
+            self.shas[name] = sha
+            self.dates[name] = date
+        self._by_date = sorted(self.shas, key=self.dates.get, reverse=True)
+
+    def __contains__(self, name):
+        return name in self.shas
+
+    def __len__(self):
+        return len(self.shas)
+
+    def sha(self, name):
+        """commit sha for tag name or None"""
+        return self.shas.get(name)
+
+    def by_date(self, prefix=None):
+        """tag names, newest commit first"""
+        if prefix is None:
+            return list(self._by_date)
+        return [x for x in self._by_date if x.startswith(prefix)]
+
+    def by_version(self, prefix=None, reverse=True):
+        """tag names sorted by version, highest first"""
+        names = self.shas
+        if prefix is not None:
+            names = [x for x in names if x.startswith(prefix)]
+        return sorted(names, key=version_sort_key, reverse=reverse)
+
+
+def _tag_refs_stamp(git_dir):
+    """
+    mtimes of the files that change when tags are added or
+    removed: packed-refs, refs/tags and each directory under
+    it, for nested tags such as refs/tags/nightly/1.2.3
+    """
+    result = []
+    try:
+        result.append(os.path.getmtime(os.path.join(git_dir, 'packed-refs')))
+    except OSError:
+        result.append(None)
+    tags_dir = os.path.join(git_dir, 'refs', 'tags')
+    for dirpath, _, _ in os.walk(tags_dir):
+        try:
+            result.append((dirpath, os.path.getmtime(dirpath)))
+        except OSError:
+            continue
+    return tuple(result)
+
+
+def tag_index(repo_dir):
+    """
+    _tag_index_
+
+    Return the TagIndex for repo_dir. The index is cached per repo
+    and rebuilt when packed-refs or the refs/tags directories
+    change, or after
+    invalidate_tag_index is called
+
+    """
+    repo = get_repo(repo_dir)
+    git_dir = getattr(repo, 'common_dir', None) or repo.git_dir
+    stamp = _tag_refs_stamp(git_dir)
+    key = os.path.abspath(git_dir)
+    cached = _TAG_INDEX.get(key)
+    if cached is not None and cached[0] == stamp:
+        return cached[1]
+
+    rows = []
+    command = [
+        'git', 'for-each-ref', '--format={0}'.format(TAG_REF_FORMAT),
+        'refs/tags'
+    ]
+    for line in _stream_git(repo_dir, command, u'\n'):
+        ref, sha, peeled, created, committed = line.split(u'\x1f')
+        date = int(committed or created or 0)
+        rows.append((ref[len('refs/tags/'):], peeled or sha, date))
+    index = TagIndex(rows)
+    _TAG_INDEX[key] = (stamp, index)
+    return index
+
+
+def invalidate_tag_index():
+    """clear the cached tag indexes"""
+    _TAG_INDEX.clear()
+
+
 def get_tags_with_sha(repo_dir):
     """
     _get_tags_with_sha_
@@ -364,8 +682,7 @@ def get_tags_with_sha(repo_dir):
     tag:sha
 
     """
-    repo = git.Repo(repo_dir)
-    return {tag.name: tag.commit.hexsha for tag in repo.tags}
+    return dict(tag_index(repo_dir).shas)
 
 
 def get_tags(repo_dir):
@@ -376,12 +693,377 @@ def get_tags(repo_dir):
     newest first
 
     """
-    repo = git.Repo(repo_dir)
-    tags_with_date = {
-        tag.name: tag.commit.committed_date
-        for tag in repo.tags
+    return tag_index(repo_dir).by_date()
+
+
+BRANCH_REF_FORMAT = '%(refname)%1f%(objectname)'
+RELEASE_VERSION = re.compile(r'^(\d+)\.(\d+)\.(\d+)$')
+
+
+def release_version_key(version):
+    """
+    (major, minor, micro) tuple for an X.Y.Z version
+    string or None if it isnt one
+    """
+    match = RELEASE_VERSION.match(version)
+    if match is None:
+        return None
+    return tuple(int(x) for x in match.groups())
+
+
+class ReleaseIndex(object):
+    """
+    _ReleaseIndex_
+
+    The release branches in a repo, local and remote, keyed by
+    version. Each entry records the local sha, the sha on each
+    remote and whether all of them are merged into the develop
+    branch. Versions are parsed once so the index can be sorted
+    and searched without re-parsing branch names.
+
+    """
+    def __init__(self, prefix, refs, merged_refs):
+        """
+        :param prefix: release branch prefix, eg release/
+        :param refs: list of (full refname, sha)
+        :param merged_refs: set of full refnames merged into develop
+        """
+        self.prefix = prefix
+        self.releases = {}
+        for ref, sha in refs:
+            if ref.startswith('refs/heads/'):
+                remote = None
+                name = ref[len('refs/heads/'):]
+            else:
+                remote, _, name = ref[len('refs/remotes/'):].partition('/')
+            if not name.startswith(prefix):
+                continue
+            version = name[len(prefix):]
+            entry = self.releases.setdefault(
+                version,
+                {
+                    'version': version,
+                    'branch': name,
+                    'key': release_version_key(version),
+                    'local': None,
+                    'remotes': {},
+                    'merged': True
+                }
+            )
+            if remote is None:
+                entry['local'] = sha
+            else:
+                entry['remotes'][remote] = sha
+            if ref not in merged_refs:
+                entry['merged'] = False
+
+    def __contains__(self, version):
+        return self._version(version) in self.releases
+
+    def _version(self, version):
+        if version.startswith(self.prefix):
+            return version[len(self.prefix):]
+        return version
+
+    def get(self, version):
+        """entry for a version or release branch name or None"""
+        return self.releases.get(self._version(version))
+
+    def has_branch(self, version, remote=None):
+        """
+        check for a local release branch, or one on the
+        named remote if remote is given
+        """
+        entry = self.get(version)
+        if entry is None:
+            return False
+        if remote is None:
+            return entry['local'] is not None
+        return remote in entry['remotes']
+
+    def sorted(self, merged=None):
+        """
+        entries ordered by version, lowest first, optionally only
+        merged or unmerged ones. Versions that are not X.Y.Z sort
+        first by name
+        """
+        entries = [
+            e for e in self.releases.values()
+            if merged is None or e['merged'] == merged
+        ]
+        return sorted(
+            entries,
+            key=lambda e: (e['key'] is not None, e['key'] or (), e['version'])
+        )
+
+    def unmerged(self, version_only=False):
+        """names (or versions) of the release branches not merged to develop"""
+        field = 'version' if version_only else 'branch'
+        return [e[field] for e in self.sorted(merged=False)]
+
+    def latest(self, *versions):
+        """
+        highest X.Y.Z version out of the unmerged releases and
+        any extra versions given
+        """
+        keys = [e['key'] for e in self.releases.values() if not e['merged']]
+        keys.extend(release_version_key(v) for v in versions)
+        keys = [k for k in keys if k is not None]
+        if not keys:
+            return None
+        return "{0}.{1}.{2}".format(*max(keys))
+
+    def next_free_version(self, current, bump):
+        """
+        bump the highest of current and the unmerged releases
+        with the bump callable until the result doesnt clash with
+        an existing release branch
+        """
+        version = bump(self.latest(current) or current)
+        while version in self.releases:
+            version = bump(version)
+        return version
+
+
+def release_index(repo_dir, prefix, develop_branch):
+    """
+    _release_index_
+
+    Build the ReleaseIndex for repo_dir with one for-each-ref over
+    the local and remote branches and one for-each-ref --merged
+    listing the ones already merged into develop_branch
+
+    """
+    patterns = ['refs/heads', 'refs/remotes']
+    refs = []
+    command = ['git', 'for-each-ref', '--format={0}'.format(BRANCH_REF_FORMAT)]
+    for line in _stream_git(repo_dir, command + patterns, u'\n'):
+        ref, sha = line.split(u'\x1f')
+        if not ref.endswith('/HEAD'):
+            refs.append((ref, sha))
+    command = [
+        'git', 'for-each-ref', '--format=%(refname)',
+        '--merged={0}'.format(develop_branch)
+    ]
+    merged = set(_stream_git(repo_dir, command + patterns, u'\n'))
+    return ReleaseIndex(prefix, refs, merged)
+
+
+def ref_shas(repo_dir, *refs):
+    """
+    map of full ref name: commit sha for the refs that exist,
+    tags are peeled to their commit. One for-each-ref call,
+    cheap enough to check whether a step is already done
+    """
+    command = [
+        'git', 'for-each-ref',
+        '--format=%(refname)%00%(objectname)%00%(*objectname)'
+    ]
+    command.extend(refs)
+    wanted = set(refs)
+    result = {}
+    for line in _stream_git(repo_dir, command, u'\n'):
+        name, sha, peeled = line.split(u'\x00')
+        if name in wanted:
+            result[name] = peeled or sha
+    return result
+
+
+def merged_refs(repo_dir, commit, *patterns):
+    """
+    set of full refnames matching patterns that are reachable
+    from commit, ie already merged into it. Empty if commit
+    doesnt exist
+    """
+    command = [
+        'git', 'for-each-ref', '--format=%(refname)',
+        '--merged={0}'.format(commit)
+    ]
+    command.extend(patterns)
+    try:
+        return set(
+            _stream_git(repo_dir, command, u'\n', expect_failure=True)
+        )
+    except RuntimeError:
+        return set()
+
+
+def commit_parents(repo_dir, shas):
+    """
+    map of sha: list of parent shas for each of the commits,
+    looked up by piping them to one git log --stdin
+    """
+    if not shas:
+        return {}
+    command = [
+        'git', 'log', '--no-walk=unsorted', '--stdin', '--format=%H %P'
+    ]
+    result = {}
+    stdin = u'\n'.join(shas) + u'\n'
+    for line in _stream_git(repo_dir, command, u'\n', stdin):
+        fields = line.split()
+        result[fields[0]] = fields[1:]
+    return result
+
+
+def reachable_commits(repo_dir, commit, shas):
+    """
+    subset of shas that are ancestors of (or equal to) commit,
+    walking the history of commit once and stopping as soon as
+    all of them have been seen
+    """
+    wanted = set(shas)
+    found = set()
+    if not wanted:
+        return found
+    revs = _stream_git(
+        repo_dir, ['git', 'rev-list', commit], u'\n', expect_failure=True
+    )
+    try:
+        for sha in revs:
+            if sha in wanted:
+                found.add(sha)
+                if found == wanted:
+                    break
+    except RuntimeError:
+        return set()
+    finally:
+        revs.close()
+    return found
+
+
+LOG_FORMAT = '%cn%x1f%ct%x1f%B'
+LOG_CHUNK_SIZE = 64 * 1024
+COMMIT_BATCH_SIZE = 5000
+EPOCH = datetime.datetime(1970, 1, 1)
+
+
+def format_commit_date(timestamp):
+    """
+    format a unix timestamp as an ISO 8601 UTC date,
+    eg 2015-07-29T22:59:43+00:00
+    """
+    date = EPOCH + datetime.timedelta(seconds=int(timestamp))
+    return u"{0}+00:00".format(date.isoformat())
+
+
+def _stream_git(repo_dir, command, separator, stdin=None, expect_failure=False):
+    """
+    run a git command and yield its output split on separator,
+    parsing it as it is read. stdin is written to the process
+    before its output is read. Failures raise RuntimeError and
+    are logged as errors unless expect_failure is True
+    """
+    process = subprocess.Popen(
+        command,
+        cwd=repo_dir,
+        stdin=subprocess.PIPE if stdin is not None else None,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE
+    )
+    if stdin is not None:
+        process.stdin.write(stdin.encode('utf-8'))
+        process.stdin.close()
+    decoder = codecs.getincrementaldecoder('utf-8')('replace')
+    pending = u''
+    finished = False
+    try:
+        while True:
+            chunk = process.stdout.read(LOG_CHUNK_SIZE)
+            pending += decoder.decode(chunk, final=not chunk)
+            records = pending.split(separator)
+            pending = records.pop()
+            for record in records:
+                yield record
+            if not chunk:
+                finished = True
+                break
+    finally:
+        if not finished and process.poll() is None:
+            # consumer stopped early, dont leave git running
+            process.kill()
+            process.wait()
+        process.stdout.close()
+    error = process.stderr.read()
+    process.stderr.close()
+    if process.wait():
+        msg = "{0} failed: {1}".format(
+            ' '.join(command[:2]),
+            error.decode('utf-8', 'replace').strip()
+        )
+        if expect_failure:
+            LOGGER.debug(msg)
+        else:
+            LOGGER.error(msg)
+        raise RuntimeError(msg)
+
+
+def _commit_row(committer, timestamp, message):
+    return {
+        'committer': committer,
+        'message': message,
+        'date': format_commit_date(timestamp)
     }
-    return sorted(tags_with_date, key=tags_with_date.get, reverse=True)
+
+
+def _iter_cached_commit_msgs(repo_dir, since_sha, cache):
+    """
+    list the commits in the range with rev-list and only run
+    git log for the ones that are not in the cache, a batch
+    of shas at a time
+    """
+    revs = _stream_git(
+        repo_dir,
+        ['git', 'rev-list', '{0}..HEAD'.format(since_sha)],
+        u'\n'
+    )
+    while True:
+        batch = list(itertools.islice(revs, COMMIT_BATCH_SIZE))
+        if not batch:
+            break
+        rows = dict((sha, cache.get(sha)) for sha in batch)
+        missing = [sha for sha in batch if rows[sha] is None]
+        if missing:
+            command = [
+                'git', 'log', '-z', '--no-walk=unsorted', '--stdin',
+                '--format=%H%x1f{0}'.format(LOG_FORMAT)
+            ]
+            records = _stream_git(
+                repo_dir, command, u'\0', u'\n'.join(missing) + u'\n'
+            )
+            for record in records:
+                sha, committer, timestamp, message = record.split(u'\x1f', 3)
+                row = _commit_row(committer, timestamp, message)
+                cache.put(sha, row)
+                rows[sha] = row
+        for sha in batch:
+            yield rows[sha]
+
+
+def iter_commit_msgs(repo_dir, since_sha, cache=None):
+    """
+    _iter_commit_msgs_
+
+    Generator of commit message data for the repo provided since
+    the since_sha value of a commit or tag, newest first.
+
+    Runs a single git log process and parses its output as it is
+    read, so the history is never held in memory as a whole.
+
+    :param cache: optional commit_cache.CommitCache, commits found
+       in it are not parsed again and new ones are added to it
+
+    """
+    if cache is not None:
+        for row in _iter_cached_commit_msgs(repo_dir, since_sha, cache):
+            yield row
+        return
+    command = [
+        'git', 'log', '-z', '--format={0}'.format(LOG_FORMAT),
+        '{0}..HEAD'.format(since_sha)
+    ]
+    for record in _stream_git(repo_dir, command, u'\0'):
+        yield _commit_row(*record.split(u'\x1f', 2))
 
 
 def get_commit_msgs(repo_dir, since_sha):
@@ -392,19 +1074,62 @@ def get_commit_msgs(repo_dir, since_sha):
     since_sha value of a commit or tag.
 
     """
-    repo = git.Repo(repo_dir)
-    rev_range = '..'.join([since_sha,repo.head.commit.hexsha])
-    result = []
-    for commit in repo.iter_commits(rev_range):
-        row = {
-            'committer': commit.committer.name,
-            'message': commit.message,
-            'date': str(arrow.get(commit.committed_date))
-        }
-        result.append(row)
+    return list(iter_commit_msgs(repo_dir, since_sha))
+
+
+def group_by_author(rows):
+    """
+    _group_by_author_
+
+    Collect commit rows into an ordered map of committer:
+    list of commits, newest first. Authors are listed in the
+    order they first appear in rows
+
+    """
+    result = collections.OrderedDict()
+    for row in rows:
+        result.setdefault(row['committer'], []).append(row)
+    for commits in result.values():
+        commits.sort(key=lambda x: x['date'], reverse=True)
     return result
 
 
+def write_commit_messages(rows, handle):
+    """
+    _write_commit_messages_
+
+    Write plaintext release notes for the commit rows to
+    the file like handle, see format_commit_messages
+
+    """
+    handle.write(u" - Commit History:")
+    for author, commits in group_by_author(rows).items():
+        handle.write(u"\n -- Author: {0}".format(author))
+        for commit in commits:
+            handle.write(
+                u'\n --- {0}: {1}'.format(commit['date'], commit['message'])
+            )
+
+
+def write_markdown(rows, handle):
+    """
+    _write_markdown_
+
+    Write markdown release notes for the commit rows to
+    the file like handle, see markdown_format
+
+    """
+    handle.write(u'Commit History\n==============')
+    for author, commits in group_by_author(rows).items():
+        handle.write(
+            u'\n\nAuthor: {0}\n--------'.format(author) + u'-' * len(author)
+        )
+        for commit in commits:
+            handle.write(
+                u'\n\n{0}: {1}'.format(commit['date'], commit['message'])
+            )
+
+
 def format_commit_messages(rows):
     """
     _format_commit_messages_
@@ -419,21 +1144,9 @@ def format_commit_messages(rows):
     --- DATETIME: COMMIT MESSAGE
 
     """
-    result = [u" - Commit History:"]
-
-    for author, commits in itertools.groupby(rows, lambda x: x['committer']):
-        result.append(u" -- Author: {0}".format(author))
-        sorted_commits = sorted(
-            [ c for c in commits ],
-            key=lambda x: x['date'],
-            reverse=True
-        )
-        result.extend(
-            u' --- {0}: {1}'.format(commit['date'],commit['message'])
-            for commit in sorted_commits
-        )
-
-    return '\n'.join(result)
+    handle = io.StringIO()
+    write_commit_messages(rows, handle)
+    return handle.getvalue()
 
 
 def markdown_format(rows):
@@ -454,26 +1167,58 @@ def markdown_format(rows):
     DATETIME: COMMIT MESSAGE
 
     """
-    result = ['Commit History\n==============']
-
-    for author, commits in itertools.groupby(rows, lambda x: x['committer']):
-        result.append(
-            '\nAuthor: {0}\n--------'.format(author) + '-' * len(author))
-        sorted_commits = sorted(
-            [c for c in commits],
-            key=lambda x: x['date'],
-            reverse=True)
-        result.extend('\n{0}: {1}'.format(
-            commit['date'],
-            commit['message']) for commit in sorted_commits)
-
-    return '\n'.join(result)
+    handle = io.StringIO()
+    write_markdown(rows, handle)
+    return handle.getvalue()
 
 FORMATTERS = {
     'plaintext': format_commit_messages,
     'markdown': markdown_format,
     }
 
+WRITERS = {
+    'plaintext': write_commit_messages,
+    'markdown': write_markdown,
+    }
+
+
+def write_release_notes(repo_dir, since_tag, formatter, handle, cache=False):
+    """
+    _write_release_notes_
+
+    Given a repo_dir and tag, write release notes for all
+    commits since that tag to the file like handle, streaming
+    the commit history from git log
+
+    :param cache: use the commit cache in the repo's git dir
+       so only commits not seen by a previous build are parsed,
+       off by default since a plain git log is as fast on most repos
+
+    """
+    if formatter not in WRITERS:
+        raise RuntimeError(
+            ('Invalid release notes formatting: {0} Update cirrus.conf'
+             ' entry to use either: plaintext, markdown'.format(formatter)))
+    tags = get_tags_with_sha(repo_dir)
+    if since_tag not in tags:
+        msg = "Could not find tag {0} in {1}".format(since_tag, repo_dir)
+        raise RuntimeError(msg)
+
+    sha = tags[since_tag]
+    commit_cache = None
+    if cache:
+        commit_cache = CommitCache(
+            cache_directory(get_repo(repo_dir).git_dir)
+        )
+    WRITERS[formatter](iter_commit_msgs(repo_dir, sha, commit_cache), handle)
+    if commit_cache is not None:
+        LOGGER.info(
+            "Release notes commit cache: {0} hits, {1} misses".format(
+                commit_cache.hits, commit_cache.misses
+            )
+        )
+        commit_cache.flush()
+
 
 def build_release_notes(repo_dir, since_tag, formatter):
     """
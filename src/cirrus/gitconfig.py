@@ -7,24 +7,42 @@ local gitconfig parser/updater since the lib on pypi seems to be busted
 """
 import os
 import re
+import shutil
+import tempfile
 import subprocess
 import contextlib
 from cirrus._2to3 import to_str
 
 
-@contextlib.contextmanager
-def gitconfig(filename="~/.gitconfig"):
+def gitconfig_path(filename):
+    """the file to read, CIRRUS_GITCONFIG overrides filename"""
     if os.environ.get('CIRRUS_GITCONFIG') is not None:
-        filename = os.environ['CIRRUS_GITCONFIG']
-    c = GitConfig(filename=filename)
+        return os.environ['CIRRUS_GITCONFIG']
+    return filename
+
+
+def can_parse_natively(filename="~/.gitconfig"):
+    """
+    True if the gitconfig file exists and has no include or
+    includeIf sections, so parsing it in process gives the same
+    result as git config -l
+    """
+    filename = os.path.expanduser(gitconfig_path(filename))
+    if not os.path.exists(filename):
+        return False
+    with open(filename, 'r') as handle:
+        return not any(INCLUDE_LINE.match(line) for line in handle)
+
+
+@contextlib.contextmanager
+def gitconfig(filename="~/.gitconfig", native=False):
+    c = GitConfig(filename=gitconfig_path(filename), native=native)
     c.parse()
     yield c
 
 
-def load_gitconfig(filename="~/.gitconfig"):
-    if os.environ.get('CIRRUS_GITCONFIG') is not None:
-        filename = os.environ['CIRRUS_GITCONFIG']
-    c = GitConfig(filename=filename)
+def load_gitconfig(filename="~/.gitconfig", native=False):
+    c = GitConfig(filename=gitconfig_path(filename), native=native)
     c.parse()
     return c
 
@@ -87,17 +105,154 @@ class GitConfigSection(object):
 
 
 VALID_LINE = re.compile("^[a-zA-Z0-9_-]+\.[a-zA-Z0-9_-]+=")
+SECTION_LINE = re.compile(r'^\s*\[\s*([a-zA-Z0-9_.-]+)\s*("(.*)")?\s*\]')
+INCLUDE_LINE = re.compile(r'^\s*\[\s*include(if)?[\s\]"]', re.IGNORECASE)
+PARAM_LINE = re.compile(r'^\s*([a-zA-Z0-9_-]+)\s*=(.*)$')
+VALUE_ESCAPES = {'n': '\n', 't': '\t', 'b': '\b', '"': '"', '\\': '\\'}
+
+
+def parse_value(raw):
+    """
+    _parse_value_
+
+    Convert the raw text after the = of a gitconfig line into
+    its value, handling quoting, escapes and trailing comments
+    the same way git does
+
+    """
+    result = []
+    pending_space = ''
+    in_quote = False
+    chars = iter(raw.lstrip())
+    for char in chars:
+        if char == '\\':
+            escaped = next(chars, '')
+            result.append(pending_space)
+            result.append(VALUE_ESCAPES.get(escaped, escaped))
+            pending_space = ''
+            continue
+        if char == '"':
+            in_quote = not in_quote
+            continue
+        if not in_quote:
+            if char in ';#':
+                break
+            if char.isspace():
+                pending_space += char
+                continue
+        result.append(pending_space)
+        result.append(char)
+        pending_space = ''
+    return ''.join(result)
+
+
+def format_value(value):
+    """
+    _format_value_
+
+    Escape and if needed quote a value for writing
+    to a gitconfig file
+
+    """
+    value = str(value)
+    escaped = value.replace('\\', '\\\\').replace('"', '\\"')
+    escaped = escaped.replace('\n', '\\n').replace('\t', '\\t')
+    if (value != value.strip()) or ';' in value or '#' in value:
+        escaped = '"{0}"'.format(escaped)
+    return escaped
+
+
+def logical_lines(lines):
+    """
+    _logical_lines_
+
+    Group raw lines, joining backslash continuations, yields
+    (first line index, last line index, joined text) tuples
+
+    """
+    start = None
+    text = ''
+    for index, line in enumerate(lines):
+        line = line.rstrip('\r\n')
+        if start is None:
+            start = index
+        trailing = len(line) - len(line.rstrip('\\'))
+        if trailing % 2:
+            text += line[:-1]
+            continue
+        text += line
+        yield start, index, text
+        start = None
+        text = ''
+    if start is not None:
+        yield start, len(lines) - 1, text
+
+
+def scan_config(lines):
+    """
+    _scan_config_
+
+    Scan gitconfig lines and return a list of
+    (section, param, value, first index, last index) entries
+    plus a section: last index map for the simple sections
+    (no subsections) in the file.
+
+    Sections and params are lowercased as git config -l does.
+    Subsections and valueless boolean params are skipped, as
+    they are by the git config -l parsing in GitConfig.parse
+
+    """
+    entries = []
+    sections = {}
+    section = None
+    for first, last, text in logical_lines(lines):
+        stripped = text.strip()
+        if not stripped or stripped[0] in '#;':
+            continue
+        match = SECTION_LINE.match(text)
+        if match:
+            section = None
+            if match.group(2) is None:
+                section = match.group(1).lower()
+                sections[section] = last
+            continue
+        if section is None:
+            continue
+        sections[section] = last
+        match = PARAM_LINE.match(text)
+        if match is None:
+            continue
+        param, raw = match.group(1), match.group(2)
+        entries.append((section, param.lower(), parse_value(raw), first, last))
+    return entries, sections
 
 
 class GitConfig(dict):
     """
     Object to encapsulate/parse/update a gitconfig file
+
+    By default the file is read with git config -l and each
+    set_param/unset_param runs git config and re-parses the file.
+    With native=True the file is parsed in process instead.
+
+    Within a batch() block, set_param/unset_param only update the
+    in-memory map and record the change in a journal, the journal
+    is written back to the file in a single atomic write when the
+    outermost batch exits:
+
+    with config.batch():
+        config.set_param('cirrus', 'github-user', user)
+        config.set_param('cirrus', 'github-token', token)
+
     """
-    def __init__(self, filename=None):
+    def __init__(self, filename=None, native=False):
         super(GitConfig, self).__init__(self)
         if filename is None:
             filename = '${HOME}/.gitconfig'
         self.filename = os.path.expanduser(filename)
+        self.native = native
+        self.journal = []
+        self._batch_depth = 0
 
     @property
     def command(self):
@@ -106,6 +261,9 @@ class GitConfig(dict):
 
     def parse(self):
         """re-read and parse all elements of git config and populate self"""
+        if self.native:
+            self.parse_native()
+            return
         self.clear()
         result = shell_command(self.command + " -l")
         for line in result.split('\n'):
@@ -117,11 +275,32 @@ class GitConfig(dict):
             param, value = param_val.split('=', 1)
             sect_dict[param] = value
 
+    def parse_native(self):
+        """
+        read and parse the gitconfig file in process without
+        running git, a missing file is treated as empty
+        """
+        self.clear()
+        entries, _ = scan_config(self._read_lines())
+        for section, param, value, _, _ in entries:
+            self.setdefault(section, {})[param] = value
+
+    def _read_lines(self):
+        if not os.path.exists(self.filename):
+            return []
+        with open(self.filename, 'r') as handle:
+            return handle.readlines()
+
     @property
     def sections(self):
         """list sections in the gitconfig"""
         return self.keys()
 
+    @property
+    def batching(self):
+        """True if changes are currently being journaled"""
+        return self._batch_depth > 0
+
     def __getitem__(self, key):
         """override getitem operator to wrap section in GitConfigSection"""
         if key in self:
@@ -141,20 +320,131 @@ class GitConfig(dict):
     def add_section(self, section):
         """add a new section, returns section instance"""
         self.set_param(section, 'cirrus-section-init-xyz', 'xyz')
-        self.parse()
+        if not self.batching:
+            self.parse()
         return self[section]
 
     def set_param(self, section, param, value):
         """set/add parameter in section"""
+        if self.batching:
+            section, param = section.lower(), param.lower()
+            self.setdefault(section, {})[param] = str(value)
+            self.journal.append(('set', section, param, str(value)))
+            return
         shell_command(self.command + ' {0}.{1} \"{2}\"'.format(section, param, str(value)))
         self.parse()
 
     def unset_param(self, section, param):
         """unset a parameter in the section provided"""
+        if self.batching:
+            section, param = section.lower(), param.lower()
+            if param not in self.get(section, {}):
+                msg = "No such param {0}.{1} in {2}".format(
+                    section, param, self.filename
+                )
+                raise RuntimeError(msg)
+            del dict.__getitem__(self, section)[param]
+            self.journal.append(('unset', section, param, None))
+            return
         shell_command(self.command + " --unset {0}.{1}".format(section, param))
         self.parse()
 
+    @contextlib.contextmanager
+    def batch(self):
+        """
+        _batch_
+
+        Context manager that journals set_param/unset_param calls
+        and flushes them in one write on exit. Batches can be nested,
+        the outermost one flushes. If the block raises, the journal
+        is discarded and the in-memory map restored.
+
+        """
+        if not self.batching:
+            snapshot = dict((k, dict(v)) for k, v in self.items())
+        self._batch_depth += 1
+        try:
+            yield self
+        except Exception:
+            self._batch_depth -= 1
+            if not self.batching:
+                self.journal = []
+                self.clear()
+                self.update(snapshot)
+            raise
+        self._batch_depth -= 1
+        if not self.batching:
+            self.flush()
+
+    def flush(self):
+        """
+        _flush_
+
+        Apply the journal to the current content of the file
+        and atomically replace it. Formatting, comments and
+        params not touched by the journal are preserved.
+
+        """
+        if not self.journal:
+            return
+        lines = self._read_lines()
+        if lines and not lines[-1].endswith('\n'):
+            lines[-1] += '\n'
+        for action, section, param, value in self.journal:
+            lines = apply_change(lines, action, section, param, value)
+        self._write_lines(lines)
+        self.journal = []
+
+    def _write_lines(self, lines):
+        dirname = os.path.dirname(os.path.abspath(self.filename))
+        handle, tmp_file = tempfile.mkstemp(dir=dirname, prefix='.gitconfig')
+        try:
+            with os.fdopen(handle, 'w') as writer:
+                writer.write(''.join(lines))
+            if os.path.exists(self.filename):
+                shutil.copymode(self.filename, tmp_file)
+            os.rename(tmp_file, self.filename)
+        except Exception:
+            if os.path.exists(tmp_file):
+                os.remove(tmp_file)
+            raise
+
     @property
     def exists(self):
         """True if file exists"""
         return os.path.exists(self.filename)
+
+
+def apply_change(lines, action, section, param, value):
+    """
+    _apply_change_
+
+    Apply a single journal entry to the list of gitconfig lines,
+    returns the updated list of lines
+
+    """
+    entries, sections = scan_config(lines)
+    matches = [
+        e for e in entries if e[0] == section and e[1] == param
+    ]
+    if action == 'unset':
+        for entry in reversed(matches):
+            del lines[entry[3]:entry[4] + 1]
+        return lines
+
+    # reuse the indentation of the file where possible
+    indent = '\t'
+    for entry in entries:
+        line = lines[entry[3]]
+        indent = line[:len(line) - len(line.lstrip())]
+        if entry[0] == section:
+            break
+    new_line = "{0}{1} = {2}\n".format(indent, param, format_value(value))
+    if matches:
+        entry = matches[-1]
+        lines[entry[3]:entry[4] + 1] = [new_line]
+    elif section in sections:
+        lines.insert(sections[section] + 1, new_line)
+    else:
+        lines.extend(["[{0}]\n".format(section), new_line])
+    return lines
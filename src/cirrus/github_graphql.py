@@ -0,0 +1,219 @@
+#!/usr/bin/env python
+"""
+_github_graphql_
+
+Batched GitHub GraphQL queries for pull requests.
+
+A single query per page returns the open PRs together with their
+head sha, combined commit status and review decision, replacing a
+list call plus a details and status call per PR with the REST API.
+Specific PRs are fetched together in one query by number.
+
+Results are normalised to the shape of the REST pull request json
+(number, title, user.login, head.sha, issue_url, statuses_url etc)
+plus combined_status and review_decision keys, so callers can use
+either backend. GraphQLUnavailable is raised when the endpoint can't
+be used (eg older GitHub Enterprise, token without access), callers
+should fall back to REST. Set CIRRUS_GITHUB_GRAPHQL=off to always
+use REST.
+
+"""
+import os
+import json
+
+from cirrus.logger import get_logger
+
+LOGGER = get_logger()
+GRAPHQL_URL = "https://api.github.com/graphql"
+REST_URL = "https://api.github.com/repos/{owner}/{repo}"
+
+PR_FIELDS = """
+    number
+    title
+    url
+    state
+    author { login }
+    headRefName
+    headRefOid
+    baseRefName
+    reviewDecision
+    commits(last: 1) {
+      nodes {
+        commit {
+          status {
+            state
+            contexts { context state description }
+          }
+        }
+      }
+    }
+"""
+
+PULL_REQUESTS_QUERY = """
+query($owner: String!, $repo: String!, $first: Int!, $cursor: String) {
+  repository(owner: $owner, name: $repo) {
+    pullRequests(states: OPEN, first: $first, after: $cursor) {
+      pageInfo { hasNextPage endCursor }
+      nodes { %s }
+    }
+  }
+}
+""" % PR_FIELDS
+
+PULL_REQUEST_QUERY = """
+query($owner: String!, $repo: String!, $number: Int!) {
+  repository(owner: $owner, name: $repo) {
+    pullRequest(number: $number) { %s }
+  }
+}
+""" % PR_FIELDS
+
+PULL_REQUESTS_BY_NUMBER_QUERY = """
+query($owner: String!, $repo: String!) {
+  repository(owner: $owner, name: $repo) {
+    %s
+  }
+}
+"""
+PULL_REQUEST_ALIAS = "pr{0}: pullRequest(number: {0}) {{ {1} }}"
+
+
+class GraphQLUnavailable(RuntimeError):
+    """
+    raised when a GraphQL query can't be served and the
+    caller should fall back to the REST API
+    """
+    pass
+
+
+def graphql_enabled():
+    """check the CIRRUS_GITHUB_GRAPHQL env var switch"""
+    value = os.environ.get('CIRRUS_GITHUB_GRAPHQL', 'on')
+    return value.lower() not in ('off', 'false', '0')
+
+
+def normalise_pull_request(owner, repo, node):
+    """
+    convert a GraphQL pull request node into the REST
+    pull request json layout used elsewhere in cirrus
+    """
+    rest_url = REST_URL.format(owner=owner, repo=repo)
+    sha = node['headRefOid']
+    status = None
+    commits = (node.get('commits') or {}).get('nodes') or []
+    if commits:
+        status = commits[-1]['commit'].get('status')
+    status = status or {}
+    return {
+        'number': node['number'],
+        'title': node['title'],
+        'html_url': node['url'],
+        'state': node['state'].lower(),
+        'user': {'login': (node.get('author') or {}).get('login')},
+        'head': {'ref': node['headRefName'], 'sha': sha},
+        'base': {'ref': node['baseRefName']},
+        'issue_url': "{0}/issues/{1}".format(rest_url, node['number']),
+        'statuses_url': "{0}/statuses/{1}".format(rest_url, sha),
+        'combined_status': {
+            'state': (status.get('state') or 'pending').lower(),
+            'statuses': [
+                {
+                    'context': ctx['context'],
+                    'state': ctx['state'].lower(),
+                    'description': ctx.get('description'),
+                }
+                for ctx in status.get('contexts') or []
+            ]
+        },
+        'review_decision': node.get('reviewDecision'),
+    }
+
+
+class GraphQLClient(object):
+    """
+    _GraphQLClient_
+
+    Runs queries against the GitHub GraphQL endpoint using
+    an authenticated requests session
+
+    """
+    def __init__(self, session, url=GRAPHQL_URL):
+        self.session = session
+        self.url = url
+
+    def query(self, query, variables):
+        """
+        run a query, returns the data payload or raises
+        GraphQLUnavailable
+        """
+        if not graphql_enabled():
+            raise GraphQLUnavailable("GraphQL disabled by CIRRUS_GITHUB_GRAPHQL")
+        resp = self.session.post(
+            self.url,
+            data=json.dumps({'query': query, 'variables': variables})
+        )
+        if resp.status_code != 200:
+            msg = "GraphQL request failed with status {0}".format(
+                resp.status_code
+            )
+            LOGGER.debug(msg)
+            raise GraphQLUnavailable(msg)
+        payload = resp.json()
+        if payload.get('errors'):
+            msg = "GraphQL errors: {0}".format(
+                '; '.join(e.get('message', '') for e in payload['errors'])
+            )
+            LOGGER.debug(msg)
+            raise GraphQLUnavailable(msg)
+        return payload['data']
+
+    def pull_requests(self, owner, repo, page_size=50):
+        """
+        iterate over the open pull requests, one request
+        per page of page_size PRs
+        """
+        cursor = None
+        while True:
+            data = self.query(
+                PULL_REQUESTS_QUERY,
+                {
+                    'owner': owner, 'repo': repo,
+                    'first': page_size, 'cursor': cursor
+                }
+            )
+            prs = data['repository']['pullRequests']
+            for node in prs['nodes']:
+                yield normalise_pull_request(owner, repo, node)
+            if not prs['pageInfo']['hasNextPage']:
+                break
+            cursor = prs['pageInfo']['endCursor']
+
+    def pull_request(self, owner, repo, number):
+        """get a single normalised pull request"""
+        data = self.query(
+            PULL_REQUEST_QUERY,
+            {'owner': owner, 'repo': repo, 'number': int(number)}
+        )
+        node = data['repository']['pullRequest']
+        if node is None:
+            raise RuntimeError("No pull request {0} found".format(number))
+        return normalise_pull_request(owner, repo, node)
+
+    def pull_requests_by_number(self, owner, repo, numbers):
+        """
+        map of number: normalised pull request for the given PR
+        numbers, fetched with one query aliasing a pullRequest
+        field per number
+        """
+        numbers = sorted(set(int(x) for x in numbers))
+        query = PULL_REQUESTS_BY_NUMBER_QUERY % '\n    '.join(
+            PULL_REQUEST_ALIAS.format(number, PR_FIELDS) for number in numbers
+        )
+        data = self.query(query, {'owner': owner, 'repo': repo})
+        result = {}
+        for number in numbers:
+            node = data['repository'].get('pr{0}'.format(number))
+            if node is None:
+                raise RuntimeError("No pull request {0} found".format(number))
+            result[number] = normalise_pull_request(owner, repo, node)
+        return result
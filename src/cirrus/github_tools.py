@@ -2,22 +2,51 @@
 Contains class for handling the creation of pull requests
 '''
 import os
-import git
 import json
+import re
 import time
-import arrow
-import requests
+import random
 import itertools
-from git.exc import GitCommandError
+from multiprocessing.pool import ThreadPool
 
 from cirrus.configuration import get_github_auth, load_configuration
 from cirrus.git_tools import get_active_branch
-from cirrus.git_tools import push
+from cirrus.git_tools import get_repo
+from cirrus.git_tools import release_index
+from cirrus.git_tools import fetch_branches, merge_tracking_branch, push_refs
+from cirrus.git_tools import publish_commits, unpublish_commits
+from cirrus.lazy_import import lazy_import
 from cirrus._2to3 import unicode_
 from cirrus.logger import get_logger
+from cirrus.environment import invalidate_git_environment
+from cirrus.http_cache import cached_session
+from cirrus.github_graphql import GraphQLClient, GraphQLUnavailable
+
+git = lazy_import('git')
+git_exc = lazy_import('git.exc')
+arrow = lazy_import('arrow')
+requests = lazy_import('requests')
 
 
 LOGGER = get_logger()
+PUSH_DEADLINE = 120
+PUSH_MAX_INTERVAL = 30
+STATUS_POOL_SIZE = 4
+
+
+def require_ci_success(states):
+    """
+    raise RuntimeError unless every state in the
+    ref: state dict from wait_on_gh_statuses is success
+    """
+    failed = [
+        "{0} is {1}".format(ref, state)
+        for ref, state in sorted(states.items()) if state != 'success'
+    ]
+    if failed:
+        msg = "CI Test status is not success: {0}".format(', '.join(failed))
+        LOGGER.error(msg)
+        raise RuntimeError(msg)
 
 
 class GitHubContext(object):
@@ -30,7 +59,7 @@ class GitHubContext(object):
     """
     def __init__(self, repo_dir, package_dir=None):
         self.repo_dir = repo_dir
-        self.repo = git.Repo(repo_dir)
+        self.repo = get_repo(repo_dir, git.Repo)
         self.config = load_configuration(package_dir)
         self.gh_user, self.token = get_github_auth()
         self.auth_headers = {
@@ -45,12 +74,14 @@ class GitHubContext(object):
 
     def __enter__(self):
         """start context, establish session"""
-        self.session = requests.Session()
-        self.session.headers.update(self.auth_headers)
+        session = requests.Session()
+        session.headers.update(self.auth_headers)
+        self.session = cached_session(session)
         return self
 
     def __exit__(self, *args):
-        pass
+        if os.environ.get('CIRRUS_HTTP_CACHE_STATS'):
+            self.session.log_stats()
 
     def branch_state(self, branch=None):
         """
@@ -65,12 +96,7 @@ class GitHubContext(object):
         """
         if branch is None:
             branch = self.active_branch_name
-        url = "https://api.github.com/repos/{org}/{repo}/commits/{branch}/status".format(
-            org=self.config.organisation_name(),
-            repo=self.config.package_name(),
-            branch=branch
-        )
-        resp = self.session.get(url)
+        resp = self._status_response(branch)
         resp.raise_for_status()
         state = resp.json()['state']
         return state
@@ -86,10 +112,11 @@ class GitHubContext(object):
             repo=self.config.package_name(),
             branch=branch
         )
-        resp = self.session.get(url)
-        resp.raise_for_status()
-        data = resp.json()
-        for d in data:
+        def get(page_url, params):
+            return self.session.get(
+                page_url, params=params, endpoint='branch_status_list'
+            )
+        for d in paginate(get, url, {'per_page': 100}):
             yield d
 
     def commit_files_optional_push(self, commit_msg, push=True, *filenames):
@@ -127,9 +154,9 @@ class GitHubContext(object):
 
     def set_branch_state(self, state, context, branch=None):
         """
-        _current_branch_mark_status_
+        _set_branch_state_
 
-        Mark the CI status of the current branch.
+        Mark the CI status of a branch.
 
         :param state: state of the last test run, such as "success" or "failure"
         :param context: The GH context string to use for the state, eg
@@ -141,20 +168,11 @@ class GitHubContext(object):
         """
         if branch is None:
             branch = self.repo.active_branch.name
-
         LOGGER.info(u"Setting CI status for branch {} to {}".format(branch, state))
+        self.set_commit_states(state, [(branch, context)])
 
-        sha = self.repo.head.commit.hexsha
-
-        try:
-            # @HACK: Do a push that we expect will fail -- we just want to
-            # tell the server about our sha. A more elegant solution would
-            # probably be to push a detached head.
-            push(self.repo_dir)
-        except RuntimeError as ex:
-            if "rejected" not in unicode_(ex):
-                raise
-
+    def _post_status(self, sha, state, context):
+        """POST a single commit status"""
         url = "https://api.github.com/repos/{org}/{repo}/statuses/{sha}".format(
             org=self.config.organisation_name(),
             repo=self.config.package_name(),
@@ -170,6 +188,107 @@ class GitHubContext(object):
         resp = self.session.post(url, data=data)
         resp.raise_for_status()
 
+    def set_commit_states(self, state, statuses, pool_size=STATUS_POOL_SIZE):
+        """
+        _set_commit_states_
+
+        Set the same state for a list of (branch or sha, context)
+        pairs. Commits the remote doesnt have yet are pushed once
+        to temporary refs (see publish_commits) and the status
+        POSTs are sent concurrently.
+
+        """
+        statuses = [
+            (self.repo.commit(ref).hexsha, context)
+            for ref, context in statuses
+        ]
+        if not statuses:
+            return
+        shas = []
+        for sha, _ in statuses:
+            if sha not in shas:
+                shas.append(sha)
+        temp_refs = publish_commits(self.repo, shas)
+        try:
+            pool = ThreadPool(max(1, min(pool_size, len(statuses))))
+            try:
+                pool.map(
+                    lambda status: self._post_status(
+                        status[0], state, status[1]
+                    ),
+                    statuses
+                )
+            finally:
+                pool.close()
+                pool.join()
+        finally:
+            unpublish_commits(self.repo, temp_refs)
+
+    def _status_response(self, ref):
+        """GET the combined status response for a branch or sha"""
+        url = "https://api.github.com/repos/{org}/{repo}/commits/{branch}/status".format(
+            org=self.config.organisation_name(),
+            repo=self.config.package_name(),
+            branch=ref
+        )
+        return self.session.get(url, endpoint='branch_state')
+
+    def wait_on_gh_statuses(
+            self, refs, timeout=600, interval=2, max_interval=60):
+        """
+        _wait_on_gh_statuses_
+
+        Wait for CI checks to complete on several branches or shas
+        from one polling loop. While any ref is pending the poll
+        interval backs off exponentially with jitter, up to
+        max_interval, and the GitHub Retry-After and rate limit
+        headers are honoured.
+
+        :param refs: list of branch names or shas to watch
+        :param timeout: max wait time in seconds
+        :param interval: initial pause between checks in seconds
+        :param max_interval: largest pause between checks in seconds
+        :returns: dict of ref: last seen state, states are not
+           checked, see require_ci_success
+
+        """
+        deadline = time.time() + timeout
+        states = dict((ref, 'pending') for ref in refs)
+        attempt = 0
+        LOGGER.info("Waiting on CI status of {}...".format(', '.join(refs)))
+        while True:
+            delay = 0
+            for ref in refs:
+                if states[ref] != 'pending':
+                    continue
+                resp = self._status_response(ref)
+                delay = max(delay, rate_limit_delay(resp.headers))
+                if resp.status_code in (403, 429) and delay:
+                    LOGGER.info(
+                        "Rate limited checking {}, waiting {}s".format(ref, delay)
+                    )
+                    continue
+                resp.raise_for_status()
+                states[ref] = resp.json()['state']
+
+            pending = [ref for ref in refs if states[ref] == 'pending']
+            if not pending:
+                break
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                LOGGER.error(
+                    "Exceeded timeout for branch status {}".format(
+                        ', '.join(pending)
+                    )
+                )
+                break
+            delay = max(delay, backoff_delay(attempt, interval, max_interval))
+            # never sleep past the deadline, the loop polls once more
+            # at the deadline before giving up
+            time.sleep(min(delay, remaining))
+            attempt += 1
+        return states
+
     def wait_on_gh_status(self, branch_name=None, timeout=600, interval=2):
         """
         _wait_on_gh_status_
@@ -179,39 +298,49 @@ class GitHubContext(object):
         :param branch_name: name of branch to watch
         :param timeout: max wait time in seconds
         :param interval: pause between checks interval in seconds
+        :returns: the last seen state, raises RuntimeError if it
+           isnt success, including on timeout
 
         """
         if branch_name is None:
             branch_name = self.active_branch_name
-
-        time_spent = 0
-        status = self.branch_state(branch_name)
-        LOGGER.info("Waiting on CI status of {}...".format(branch_name))
-        while status == 'pending':
-            if time_spent > timeout:
-                LOGGER.error("Exceeded timeout for branch status {}".format(branch_name))
-                break
-            status = branch_status(branch_name)
-            time.sleep(interval)
-            time_spent += interval
-
-        if status != 'success':
-            msg = "CI Test status is not success: {} is {}".format(branch_name, status)
-            LOGGER.error(msg)
-            raise RuntimeError(msg)
+        states = self.wait_on_gh_statuses(
+            [branch_name], timeout=timeout, interval=interval
+        )
+        require_ci_success(states)
+        return states[branch_name]
 
     def pull_branch(self, branch_name=None, remote=True):
         """
         _pull_branch_
 
         Pull the named branch from origin, if it isnt
-        the current active branch, it will be checked out
+        the current active branch, it will be checked out.
+        Raises RuntimeError if the branch doesnt exist on origin
         """
         if branch_name is not None:
             self.repo.git.checkout(branch_name)
+            invalidate_git_environment()
+        else:
+            branch_name = self.active_branch_name
         if remote:
-            ref = "refs/heads/{0}:refs/remotes/origin/{0}".format(branch_name)
-            return self.repo.remotes.origin.pull(ref)
+            # no round trip if fetch_branches already got it
+            if not self.fetch_branches([branch_name])[branch_name]:
+                msg = "Unable to pull {0}: branch not found on origin".format(
+                    branch_name
+                )
+                LOGGER.error(msg)
+                raise RuntimeError(msg)
+            return merge_tracking_branch(self.repo, branch_name)
+
+    def fetch_branches(self, branches):
+        """
+        _fetch_branches_
+
+        Fetch all the named branches from origin in one
+        round trip, see git_tools.fetch_branches
+        """
+        return fetch_branches(self.repo, branches)
 
     def push_branch(self, branch_name=None):
         """
@@ -222,9 +351,10 @@ class GitHubContext(object):
         """
         if branch_name is not None:
             self.repo.git.checkout(branch_name)
+            invalidate_git_environment()
         try:
             ret = self.repo.remotes.origin.push(self.repo.head)
-        except GitCommandError as ex:
+        except git_exc.GitCommandError as ex:
             msg = "GitCommandError during push: {}".format(ex)
             LOGGER.error(msg)
             raise RuntimeError(msg)
@@ -234,31 +364,45 @@ class GitHubContext(object):
                 raise RuntimeError(unicode_(r.summary))
         return ret
 
-    def push_branch_with_retry(self, branch_name=None, attempts=300, cooloff=2):
+    def push_branch_with_retry(
+            self, branch_name=None, attempts=300, cooloff=2,
+            max_interval=PUSH_MAX_INTERVAL, deadline=PUSH_DEADLINE):
         """
         _push_branch_with_retry_
 
-        Work around intermittent push failures with a dumb exception retry loop
+        Work around intermittent push failures by retrying with
+        exponential backoff starting at cooloff seconds, giving
+        up after attempts tries or deadline seconds
 
         """
-        count = 0
-        error_flag = None
-        while count < attempts:
-            try:
-                error_flag = None
-                self.push_branch(branch_name=branch_name)
-                break
-            except RuntimeError as ex:
-                msg = "Error pushing branch {}: {}".format(branch_name, str(ex))
-                LOGGER.info(msg)
-                count += 1
-                error_flag = ex
-                time.sleep(cooloff)
-        if error_flag is not None:
-            msg = "Unable to push branch {} due to repeated failures: {}".format(
-                self.active_branch_name, str(error_flag)
-            )
-            raise RuntimeError(msg)
+        PushCoordinator(
+            "branch {}".format(branch_name or self.active_branch_name),
+            lambda: self.push_branch(branch_name=branch_name),
+            attempts=attempts,
+            interval=cooloff,
+            max_interval=max_interval,
+            deadline=deadline
+        ).run()
+
+    def push_refs_with_retry(
+            self, refs, attempts=300, cooloff=2,
+            max_interval=PUSH_MAX_INTERVAL, deadline=PUSH_DEADLINE):
+        """
+        _push_refs_with_retry_
+
+        Push branches and tags to origin in a single atomic push,
+        retrying the whole push with exponential backoff, see
+        PushCoordinator
+
+        """
+        PushCoordinator(
+            ' '.join(refs),
+            lambda: push_refs(self.repo, refs),
+            attempts=attempts,
+            interval=cooloff,
+            max_interval=max_interval,
+            deadline=deadline
+        ).run()
 
     def merge_branch(self, branch_name):
         """
@@ -268,7 +412,7 @@ class GitHubContext(object):
         """
         try:
             result = self.repo.git.merge('--no-ff', branch_name)
-        except GitCommandError as ex:
+        except git_exc.GitCommandError as ex:
             LOGGER.error(
                 "Error merging branch {} onto {}".format(
                     branch_name, self.active_branch_name
@@ -293,15 +437,20 @@ class GitHubContext(object):
                     found_a_conflict = True
         return found_a_conflict
 
-    def tag_release(self, tag, master='master', push=True, attempts=1, cooloff=2):
+    def tag_release(
+            self, tag, master='master', push=True, attempts=1, cooloff=2,
+            max_interval=PUSH_MAX_INTERVAL, deadline=PUSH_DEADLINE,
+            ref=None):
         """
         _tag_release_
 
         Tag the release on the master branch and, if push is True
-        push the tag to the remote
+        push the tag to the remote. If ref is provided that commit
+        is tagged without checking out master
         """
-        if self.active_branch_name != master:
+        if ref is None and self.active_branch_name != master:
             self.repo.git.checkout(master)
+            invalidate_git_environment()
 
         exists = any(existing_tag.name == tag for existing_tag in self.repo.tags)
         if exists:
@@ -311,39 +460,41 @@ class GitHubContext(object):
                 "{1} but tag exists already"
             ).format(tag, master)
             raise RuntimeError(msg)
-        self.repo.create_tag(tag)
+        if ref is None:
+            self.repo.create_tag(tag)
+        else:
+            self.repo.create_tag(tag, ref=ref)
         if push:
-            count = 0
-            error_flag = None
-            while count < attempts:
-                error_flag = None
-                try:
-                    self.repo.remotes.origin.push(self.repo.head, tags=True)
-                    break
-                except Exception as ex:
-                    msg = "Error pushing tags: {}".format(ex)
-                    LOGGER.warning(msg)
-                    error_flag = ex
-                    time.sleep(cooloff)
-                count += 1
-            if error_flag is not None:
-                msg = "Unable to push tags {} due to repeated failures: {}".format(
-                    tag, str(error_flag)
-                )
-                raise RuntimeError(msg)
+            PushCoordinator(
+                "tag {}".format(tag),
+                lambda: self.repo.remotes.origin.push(self.repo.head, tags=True),
+                attempts=attempts,
+                interval=cooloff,
+                max_interval=max_interval,
+                deadline=deadline,
+                retry_on=(Exception,)
+            ).run()
 
     def delete_branch(self, branch_name, remote=True):
         """
         _delete_branch_
 
-        Delete the local and (if remote is True) branch
+        Delete the local and (if remote is True) branch, a
+        branch already gone from origin isnt an error
         """
         if self.active_branch_name == branch_name:
             msg = "Cant delete branch {} because it is active".format(branch_name)
             raise RuntimeError(msg)
         self.repo.git.branch('-D', branch_name)
         if remote:
-            self.repo.git.push('origin', '--delete', branch_name)
+            try:
+                self.repo.git.push('origin', '--delete', branch_name)
+            except git_exc.GitCommandError as ex:
+                if 'remote ref does not exist' not in unicode_(ex):
+                    raise
+                LOGGER.info(
+                    "{} not found on origin, nothing to delete".format(branch_name)
+                )
 
     def iter_github_branches(self):
         """
@@ -357,20 +508,10 @@ class GitHubContext(object):
             org=self.config.organisation_name(),
             repo=self.config.package_name()
         )
-        params = {'per_page': 100}
-        resp = self.session.get(url, params=params)
-        resp.raise_for_status()
-        data = resp.json()
-        for row in data:
+        def get(page_url, params):
+            return self.session.get(page_url, params=params, endpoint='branches')
+        for row in paginate(get, url, {'per_page': 100}):
             yield row['name']
-        next_page = resp.links.get('next')
-        while next_page is not None:
-            resp = self.session.get(next_page['url'], params=params)
-            resp.raise_for_status()
-            data = resp.json()
-            for row in data:
-                yield row['name']
-            next_page = resp.links.get('next')
 
     def iter_git_branches(self, merged=False):
         """
@@ -419,14 +560,16 @@ class GitHubContext(object):
         )
         params = {
             'state': 'open',
+            'per_page': 100,
         }
 
-        resp = self.session.get(url, params=params)
-        resp.raise_for_status()
-        data = resp.json()
-        gen = iter(data)
+        def get(page_url, page_params):
+            return self.session.get(
+                page_url, params=page_params, endpoint='pull_requests'
+            )
+        gen = paginate(get, url, params)
         if user:
-            gen = itertools.ifilter(lambda x: x['user']['login'] == user, gen)
+            gen = (x for x in gen if x['user']['login'] == user)
         for row in gen:
             yield row
 
@@ -447,11 +590,100 @@ class GitHubContext(object):
             number=pr
         )
 
-        resp = self.session.get(url)
+        resp = self.session.get(url, endpoint='pull_request_details')
         resp.raise_for_status()
         data = resp.json()
         return data
 
+    def _rest_pull_request_summary(self, pr_data):
+        """add combined status to REST pr json, one extra call per PR"""
+        result = dict(pr_data)
+        resp = self._status_response(pr_data['head']['sha'])
+        resp.raise_for_status()
+        status = resp.json()
+        result['combined_status'] = {
+            'state': status['state'],
+            'statuses': [
+                {
+                    'context': x['context'],
+                    'state': x['state'],
+                    'description': x.get('description'),
+                }
+                for x in status.get('statuses', [])
+            ]
+        }
+        result['review_decision'] = None
+        return result
+
+    def pull_request_summaries(self, user=None):
+        """
+        _pull_request_summaries_
+
+        List the open pull requests with their head sha, combined
+        status and review decision. Uses one GraphQL query per page
+        of PRs, falling back to the REST API (a list call plus a
+        status call per PR) if GraphQL isnt available.
+
+        :param user: GH username to filter on
+        :returns: list of pull request dicts in the REST layout
+           plus combined_status and review_decision keys
+
+        """
+        org = self.config.organisation_name()
+        repo = self.config.package_name()
+        try:
+            result = list(GraphQLClient(self.session).pull_requests(org, repo))
+        except GraphQLUnavailable as ex:
+            LOGGER.info("Using REST API for pull requests: {}".format(ex))
+            result = [
+                self._rest_pull_request_summary(pr)
+                for pr in self.pull_requests()
+            ]
+        if user:
+            result = [x for x in result if x['user']['login'] == user]
+        return result
+
+    def pull_request_summary(self, pr):
+        """
+        _pull_request_summary_
+
+        Get a single pull request with head sha, combined status
+        and review decision, via GraphQL with REST fallback
+
+        """
+        return self.pull_requests_by_number([pr])[int(pr)]
+
+    def pull_requests_by_number(self, numbers, status=True):
+        """
+        _pull_requests_by_number_
+
+        Get the pull requests with the given numbers, all of them
+        in one GraphQL query, falling back to a REST details call per
+        PR, plus a status call per PR if status is True.
+
+        :param numbers: list of PR numbers
+        :param status: include combined_status for the REST fallback,
+           GraphQL results always include it
+        :returns: dict of PR number: pull request dict in the REST
+           layout
+
+        """
+        org = self.config.organisation_name()
+        repo = self.config.package_name()
+        try:
+            return GraphQLClient(self.session).pull_requests_by_number(
+                org, repo, numbers
+            )
+        except GraphQLUnavailable as ex:
+            LOGGER.info("Using REST API for pull requests: {}".format(ex))
+        result = {}
+        for number in numbers:
+            pr_data = self.pull_request_details(number)
+            if status:
+                pr_data = self._rest_pull_request_summary(pr_data)
+            result[int(number)] = pr_data
+        return result
+
     def plus_one_pull_request(self, pr_id=None, pr_data=None, context='+1'):
         """
         _plus_one_pull_request_
@@ -547,15 +779,210 @@ class GitHubContext(object):
         details = self.repo.git.show(commit)
         return str(details)
 
+    def release_index(self, prune=False):
+        """
+        ReleaseIndex of the local and remote release branches
+        in this repo, see git_tools.release_index. If prune is
+        True remote tracking branches deleted from origin are
+        pruned first so they dont show up as releases
+        """
+        if prune:
+            try:
+                self.repo.git.remote('prune', 'origin')
+            except git_exc.GitCommandError as ex:
+                LOGGER.warning(
+                    "Unable to prune origin branches: {}".format(ex)
+                )
+        return release_index(
+            self.repo_dir,
+            self.config.gitflow_release_prefix(),
+            self.config.gitflow_branch_name()
+        )
+
     def unmerged_releases(self, version_only=False):
-        develop_branch = self.config.gitflow_branch_name()
-        release_pfix = self.config.gitflow_release_prefix()
-        outp = str(self.repo.git.branch('--no-merged', develop_branch))
-        lines = outp.split()
-        result = [l.strip() for l in lines if l.strip().startswith(release_pfix)]
-        if version_only:
-            result = [x.replace(release_pfix, '') for x in result]
-        return result
+        """
+        release branches (or versions if version_only is True)
+        not merged into develop, ordered by version
+        """
+        return self.release_index(prune=True).unmerged(version_only)
+
+
+def backoff_delay(attempt, interval, max_interval):
+    """
+    exponential backoff with jitter: a random delay between
+    interval and interval * 2 ** attempt, capped at max_interval
+    """
+    ceiling = min(max_interval, interval * (2 ** attempt))
+    return random.uniform(min(interval, ceiling), ceiling)
+
+
+def rate_limit_delay(headers):
+    """
+    seconds to wait before the next GitHub request based on the
+    Retry-After and X-RateLimit-* response headers, 0 if no wait
+    is needed
+    """
+    headers = headers or {}
+    retry_after = headers.get('Retry-After')
+    if retry_after is not None:
+        try:
+            return max(0, int(retry_after))
+        except ValueError:
+            pass
+    remaining = headers.get('X-RateLimit-Remaining')
+    reset = headers.get('X-RateLimit-Reset')
+    if remaining is not None and reset is not None:
+        try:
+            if int(remaining) <= 0:
+                return max(0, int(reset) - int(time.time()))
+        except ValueError:
+            pass
+    return 0
+
+
+class PushCoordinator(object):
+    """
+    _PushCoordinator_
+
+    Run a push, retrying failures with exponential backoff until
+    it succeeds, the attempts run out or the total deadline passes.
+    The latency and outcome of each attempt is recorded and logged
+    so slow or flaky pushes show up in the release logs.
+
+    :param description: what is being pushed, for log messages
+    :param push: callable that performs one push attempt
+    :param attempts: max number of attempts
+    :param interval: initial backoff in seconds
+    :param max_interval: cap on the backoff between attempts
+    :param deadline: total seconds allowed for all attempts
+    :param retry_on: exception types that trigger a retry
+
+    """
+    def __init__(
+            self, description, push, attempts=5, interval=1,
+            max_interval=PUSH_MAX_INTERVAL, deadline=PUSH_DEADLINE,
+            retry_on=(RuntimeError,)):
+        self.description = description
+        self.push = push
+        self.attempts = max(1, attempts)
+        self.interval = interval
+        self.max_interval = max_interval
+        self.deadline = deadline
+        self.retry_on = retry_on
+        self.history = []
+
+    def report(self):
+        """one line per attempt with its latency and outcome"""
+        return [
+            "push {0} attempt {1}: {2:.2f}s {3}".format(
+                self.description, attempt, latency,
+                'ok' if error is None else 'failed: {0}'.format(error)
+            )
+            for attempt, latency, error in self.history
+        ]
+
+    def run(self):
+        """
+        push until success, returns the result of the push
+        callable or raises RuntimeError with the last error
+        """
+        start = time.time()
+        error = None
+        for attempt in range(self.attempts):
+            attempt_start = time.time()
+            try:
+                result = self.push()
+            except self.retry_on as ex:
+                error = ex
+                self.history.append(
+                    (attempt + 1, time.time() - attempt_start, ex)
+                )
+                LOGGER.info(self.report()[-1])
+            else:
+                self.history.append(
+                    (attempt + 1, time.time() - attempt_start, None)
+                )
+                LOGGER.info(self.report()[-1])
+                return result
+            if attempt + 1 == self.attempts:
+                break
+            remaining = self.deadline - (time.time() - start)
+            if remaining <= 0:
+                break
+            delay = backoff_delay(attempt, self.interval, self.max_interval)
+            time.sleep(min(delay, remaining))
+        msg = (
+            "Unable to push {0} due to repeated failures, {1} attempts "
+            "in {2:.1f}s: {3}"
+        ).format(
+            self.description, len(self.history), time.time() - start, error
+        )
+        LOGGER.error(msg)
+        raise RuntimeError(msg)
+
+
+PAGINATION_POOL_SIZE = 4
+
+
+def _page_url(last_url, page):
+    """rewrite the page number in a GitHub pagination url"""
+    return re.sub(r'([?&])page=\d+', r'\g<1>page={0}'.format(page), last_url)
+
+
+def _page_rows(resp):
+    resp.raise_for_status()
+    return resp.json()
+
+
+def paginate(get, url, params=None, pool_size=PAGINATION_POOL_SIZE):
+    """
+    _paginate_
+
+    Iterate over all rows from a paginated GitHub list endpoint.
+    The last page number is read from the Link header of the first
+    response and the remaining pages are fetched concurrently with
+    a bounded thread pool. Rows are yielded in page order.
+    If there is no last link, next links are followed one at a time.
+
+    :param get: function taking (url, params) that returns a response
+    :param url: url of the list endpoint
+    :param params: query params for the first request, eg per_page
+    :param pool_size: max number of concurrent page requests
+
+    """
+    resp = get(url, params)
+    for row in _page_rows(resp):
+        yield row
+    links = getattr(resp, 'links', None)
+    if not isinstance(links, dict):
+        return
+    last_page = links.get('last')
+    if last_page is not None:
+        match = re.search(r'[?&]page=(\d+)', last_page['url'])
+        if match is not None:
+            page_urls = [
+                _page_url(last_page['url'], page)
+                for page in range(2, int(match.group(1)) + 1)
+            ]
+            pool = ThreadPool(max(1, min(pool_size, len(page_urls))))
+            try:
+                pages = pool.imap(
+                    lambda page_url: _page_rows(get(page_url, None)),
+                    page_urls
+                )
+                for rows in pages:
+                    for row in rows:
+                        yield row
+            finally:
+                pool.terminate()
+            return
+    next_page = links.get('next')
+    while next_page is not None:
+        resp = get(next_page['url'], None)
+        for row in _page_rows(resp):
+            yield row
+        links = getattr(resp, 'links', None) or {}
+        next_page = links.get('next')
 
 
 def unmerged_releases(repo_dir, version_only=False):
@@ -606,16 +1033,9 @@ def current_branch_mark_status(repo_dir, state):
 
     config = load_configuration()
     token = get_github_auth()[1]
-    sha = git.Repo(repo_dir).head.commit.hexsha
-
-    try:
-        # @HACK: Do a push that we expect will fail -- we just want to
-        # tell the server about our sha. A more elegant solution would
-        # probably be to push a detached head.
-        push(repo_dir)
-    except RuntimeError as ex:
-        if "rejected" not in unicode_(ex):
-            raise
+    repo = get_repo(repo_dir, git.Repo)
+    sha = repo.head.commit.hexsha
+    temp_refs = publish_commits(repo, [sha])
 
     url = "https://api.github.com/repos/{org}/{repo}/statuses/{sha}".format(
         org=config.organisation_name(),
@@ -639,8 +1059,11 @@ def current_branch_mark_status(repo_dir, state):
             "context": "continuous-integration/travis-ci"
         }
     )
-    resp = requests.post(url, headers=headers, data=data)
-    resp.raise_for_status()
+    try:
+        resp = requests.post(url, headers=headers, data=data)
+        resp.raise_for_status()
+    finally:
+        unpublish_commits(repo, temp_refs)
 
 
 def create_pull_request(
@@ -730,8 +1153,8 @@ def get_releases(owner, repo, token=None):
         'Authorization': 'token %s' % token
     }
 
-    resp = requests.get(url, headers=headers)
-    resp.raise_for_status()
+    def get(page_url, params):
+        return requests.get(page_url, params=params, headers=headers)
 
-    releases = [release for release in resp.json()]
+    releases = [release for release in paginate(get, url, {'per_page': 100})]
     return releases
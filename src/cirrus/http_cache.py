@@ -0,0 +1,272 @@
+#!/usr/bin/env python
+"""
+_http_cache_
+
+Persistent conditional request cache for GitHub API GETs.
+
+Responses carrying an ETag or Last-Modified header are stored on
+disk, subsequent GETs for the same url send If-None-Match and
+If-Modified-Since and a 304 Not Modified is served from the stored
+response. GitHub does not count 304s against the rate limit, so
+polling loops like wait_on_gh_status get much cheaper.
+
+The cache lives in http_cache under the cirrus home dir, override
+with the CIRRUS_HTTP_CACHE env var, set it to "off" to disable it.
+The cache is size bounded, least recently used entries are evicted.
+
+Per endpoint hit/miss counters are kept on the session and are
+logged when a GitHubContext exits if CIRRUS_HTTP_CACHE_STATS is set.
+
+"""
+import os
+import json
+import hashlib
+import threading
+
+from cirrus.environment import cirrus_home
+from cirrus.logger import get_logger
+from cirrus.lazy_import import lazy_attribute
+
+parse_header_links = lazy_attribute('requests.utils', 'parse_header_links')
+
+LOGGER = get_logger()
+CACHE_DIR = 'http_cache'
+MAX_CACHE_BYTES = 20 * 1024 * 1024
+CACHED_HEADERS = ('ETag', 'Last-Modified', 'Link', 'Content-Type')
+LIVE_HEADERS = (
+    'Retry-After', 'X-RateLimit-Remaining', 'X-RateLimit-Reset'
+)
+
+
+def cache_directory():
+    """
+    path to the http cache directory or None if
+    caching is disabled or cirrus home cant be found
+    """
+    override = os.environ.get('CIRRUS_HTTP_CACHE')
+    if override is not None:
+        if override.lower() in ('off', 'false', '0', ''):
+            return None
+        return override
+    try:
+        return os.path.join(cirrus_home(), CACHE_DIR)
+    except RuntimeError:
+        return None
+
+
+class ResponseCache(object):
+    """
+    _ResponseCache_
+
+    On disk store of GET responses, one json file per request key.
+    File mtimes are used as the LRU clock, reading an entry touches
+    it and writes evict the oldest entries once the total size of
+    the cache exceeds max_bytes
+
+    """
+    def __init__(self, directory, max_bytes=MAX_CACHE_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+    def _path(self, key):
+        return os.path.join(self.directory, "{0}.json".format(key))
+
+    def get(self, key):
+        """return the stored entry for key or None"""
+        path = self._path(key)
+        try:
+            with open(path, 'r') as handle:
+                entry = json.load(handle)
+            os.utime(path, None)
+        except (IOError, OSError, ValueError):
+            return None
+        return entry
+
+    def put(self, key, entry):
+        """store entry under key, evicting old entries if needed"""
+        try:
+            if not os.path.exists(self.directory):
+                os.makedirs(self.directory)
+            path = self._path(key)
+            tmp_file = "{0}.tmp".format(path)
+            with open(tmp_file, 'w') as handle:
+                json.dump(entry, handle)
+            os.rename(tmp_file, path)
+        except (IOError, OSError) as ex:
+            LOGGER.debug("Unable to write http cache entry: {0}".format(ex))
+            return
+        self.evict()
+
+    def entries(self):
+        """list of (mtime, size, path) for the cache files, oldest first"""
+        result = []
+        for name in os.listdir(self.directory):
+            if not name.endswith('.json'):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            result.append((stat.st_mtime, stat.st_size, path))
+        result.sort()
+        return result
+
+    def evict(self):
+        """remove least recently used entries until under max_bytes"""
+        entries = self.entries()
+        total = sum(e[1] for e in entries)
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+
+    def clear(self):
+        """remove all entries"""
+        if not os.path.exists(self.directory):
+            return
+        for _, _, path in self.entries():
+            os.remove(path)
+
+
+class CachedResponse(object):
+    """
+    _CachedResponse_
+
+    Minimal stand in for a requests Response rebuilt from
+    a cache entry when the server replies 304 Not Modified
+    """
+    def __init__(self, entry, live_headers=None):
+        self.url = entry['url']
+        self.status_code = entry['status_code']
+        self.headers = dict(entry['headers'])
+        for name in LIVE_HEADERS:
+            if live_headers and live_headers.get(name) is not None:
+                self.headers[name] = live_headers.get(name)
+        self.text = entry['body']
+        self.content = self.text.encode('utf-8')
+        self.from_cache = True
+
+    def json(self):
+        return json.loads(self.text)
+
+    @property
+    def links(self):
+        """parsed Link header, keyed on rel as requests does"""
+        header = self.headers.get('Link')
+        result = {}
+        if header:
+            for link in parse_header_links(header):
+                result[link.get('rel') or link.get('url')] = link
+        return result
+
+    def raise_for_status(self):
+        pass
+
+
+class CachedSession(object):
+    """
+    _CachedSession_
+
+    Wrapper for a requests Session that makes GETs conditional
+    using the ResponseCache. Everything apart from get is passed
+    through to the wrapped session
+
+    """
+    def __init__(self, session, cache=None):
+        self.session = session
+        self.cache = cache
+        self.stats = {}
+        self._lock = threading.Lock()
+
+    def __getattr__(self, attr):
+        return getattr(self.session, attr)
+
+    def _key(self, url, params):
+        auth = dict(self.session.headers).get('Authorization', '')
+        data = json.dumps([url, sorted((params or {}).items()), auth])
+        return hashlib.sha1(data.encode('utf-8')).hexdigest()
+
+    def _count(self, endpoint, result):
+        with self._lock:
+            counts = self.stats.setdefault(endpoint, {'hit': 0, 'miss': 0})
+            counts[result] += 1
+
+    def get(self, url, params=None, endpoint=None, **kwargs):
+        """
+        conditional GET, returns a CachedResponse if the server
+        says the stored response is still valid
+
+        :param endpoint: name to record hit/miss counts under,
+           defaults to the url
+        """
+        if endpoint is None:
+            endpoint = url
+        if self.cache is None:
+            self._count(endpoint, 'miss')
+            return self.session.get(url, params=params, **kwargs)
+
+        key = self._key(url, params)
+        entry = self.cache.get(key)
+        headers = dict(kwargs.pop('headers', None) or {})
+        if entry is not None:
+            if entry['headers'].get('ETag'):
+                headers['If-None-Match'] = entry['headers']['ETag']
+            if entry['headers'].get('Last-Modified'):
+                headers['If-Modified-Since'] = entry['headers']['Last-Modified']
+
+        resp = self.session.get(url, params=params, headers=headers, **kwargs)
+        if resp.status_code == 304 and entry is not None:
+            self._count(endpoint, 'hit')
+            return CachedResponse(entry, resp.headers)
+
+        self._count(endpoint, 'miss')
+        if resp.status_code == 200:
+            stored = dict(
+                (k, resp.headers.get(k)) for k in CACHED_HEADERS
+                if resp.headers.get(k) is not None
+            )
+            if 'ETag' in stored or 'Last-Modified' in stored:
+                self.cache.put(
+                    key,
+                    {
+                        'url': url,
+                        'status_code': resp.status_code,
+                        'headers': stored,
+                        'body': resp.text
+                    }
+                )
+        return resp
+
+    def report(self):
+        """list of per endpoint hit/miss summary lines"""
+        result = []
+        for endpoint in sorted(self.stats):
+            counts = self.stats[endpoint]
+            result.append(
+                "{0}: {1} hits, {2} misses".format(
+                    endpoint, counts['hit'], counts['miss']
+                )
+            )
+        return result
+
+    def log_stats(self):
+        """log the hit/miss counts"""
+        for line in self.report():
+            LOGGER.info("HTTP cache {0}".format(line))
+
+
+def cached_session(session):
+    """
+    wrap a requests Session in a CachedSession using the
+    default cache location
+    """
+    directory = cache_directory()
+    cache = None
+    if directory is not None:
+        cache = ResponseCache(directory)
+    return CachedSession(session, cache)
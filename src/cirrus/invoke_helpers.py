@@ -3,9 +3,11 @@
 invoke_helpers
 
 """
-from invoke import Context
-from invoke.exceptions import UnexpectedExit
 from .logger import get_logger
+from .lazy_import import lazy_import, lazy_attribute
+
+Context = lazy_attribute('invoke', 'Context')
+invoke_exceptions = lazy_import('invoke.exceptions')
 
 
 LOGGER = get_logger()
@@ -22,7 +24,7 @@ def local(command):
     LOGGER.info("local({})".format(command))
     try:
         result = c.run(command)
-    except UnexpectedExit as ex:
+    except invoke_exceptions.UnexpectedExit as ex:
         msg = "Error running command:\n{}".format(ex)
         LOGGER.error(msg)
         raise
@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+"""
+_lazy_import_
+
+Deferred imports for heavy third party libraries so that
+each cirrus command only pays for the modules its code
+path actually uses.
+
+Use at module level in place of a normal import:
+
+git = lazy_import('git')
+Context = lazy_attribute('invoke', 'Context')
+
+The real module is imported on first attribute access.
+Since the proxy is a module attribute it can still be
+mocked with mock.patch('cirrus.somemodule.git') in tests.
+
+"""
+import importlib
+
+
+class LazyModule(object):
+    """
+    _LazyModule_
+
+    Proxy for a module that is imported on first attribute
+    access. Attribute sets/deletes are forwarded to the module
+    so that mock.patch of module attributes works as normal
+    """
+    def __init__(self, module_name):
+        self.__dict__['_lazy_name'] = module_name
+        self.__dict__['_lazy_module'] = None
+
+    def _lazy_load(self):
+        module = self.__dict__['_lazy_module']
+        if module is None:
+            module = importlib.import_module(self.__dict__['_lazy_name'])
+            self.__dict__['_lazy_module'] = module
+        return module
+
+    def __getattr__(self, attr):
+        return getattr(self._lazy_load(), attr)
+
+    def __setattr__(self, attr, value):
+        setattr(self._lazy_load(), attr, value)
+
+    def __delattr__(self, attr):
+        delattr(self._lazy_load(), attr)
+
+    def __repr__(self):
+        return "<LazyModule {0} loaded={1}>".format(
+            self.__dict__['_lazy_name'],
+            self.__dict__['_lazy_module'] is not None
+        )
+
+
+class LazyAttribute(object):
+    """
+    _LazyAttribute_
+
+    Proxy for a callable (usually a class or function) that is
+    looked up in its module on first use. Attribute sets are
+    forwarded to the real object
+    """
+    def __init__(self, module_name, attr):
+        self._lazy_module = LazyModule(module_name)
+        self._lazy_attr = attr
+
+    def resolve(self):
+        """import the module and return the real object"""
+        return getattr(self._lazy_module, self._lazy_attr)
+
+    def __call__(self, *args, **kwargs):
+        return self.resolve()(*args, **kwargs)
+
+    def __getattr__(self, attr):
+        if attr.startswith('_lazy'):
+            raise AttributeError(attr)
+        return getattr(self.resolve(), attr)
+
+    def __setattr__(self, attr, value):
+        if attr.startswith('_lazy'):
+            object.__setattr__(self, attr, value)
+        else:
+            setattr(self.resolve(), attr, value)
+
+
+def lazy_import(module_name):
+    """
+    return a proxy for the named module that defers
+    the import until it is used
+    """
+    return LazyModule(module_name)
+
+
+def lazy_attribute(module_name, attr):
+    """
+    return a proxy for module_name.attr that defers
+    the import until it is used
+    """
+    return LazyAttribute(module_name, attr)
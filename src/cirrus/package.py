@@ -16,13 +16,12 @@ package sublime-project - Assistant to set up a sublime project for a cirrus
 """
 import contextlib
 import inspect
-import requests
 import os
 import sys
 
-import pystache
 from cirrus._2to3 import ConfigParser, to_str
-import pluggage.registry
+from cirrus.registry_cache import get_factory
+from cirrus.lazy_import import lazy_import
 
 import cirrus.templates
 
@@ -47,6 +46,9 @@ from cirrus.git_tools import (
 )
 
 
+pystache = lazy_import('pystache')
+requests = lazy_import('requests')
+
 DEFAULT_HISTORY_SENTINEL = "\nCIRRUS_HISTORY_SENTINEL\n"
 LOGGER = get_logger()
 
@@ -97,7 +99,7 @@ def get_plugin(plugin_name):
 
     Get the editor plugin
     """
-    factory = pluggage.registry.get_factory(
+    factory = get_factory(
         'editors',
         load_modules=['cirrus.plugins.editors']
     )
@@ -105,7 +107,7 @@ def get_plugin(plugin_name):
 
 
 def list_plugins():
-    factory = pluggage.registry.get_factory(
+    factory = get_factory(
         'editors',
         load_modules=['cirrus.plugins.editors']
     )
@@ -9,9 +9,9 @@ templates for docker-image command
 import sys
 import os
 import json
-import pystache
 
 from cirrus.logger import get_logger
+from cirrus.lazy_import import lazy_import
 from cirrus.templates import find_template
 from cirrus.utils import working_dir
 from cirrus.configuration import load_configuration
@@ -21,6 +21,7 @@ from cirrus.git_tools import (
     has_unstaged_changes
 )
 
+pystache = lazy_import('pystache')
 LOGGER = get_logger()
 
 
@@ -12,9 +12,10 @@ from cirrus.builder_plugin import Builder
 from cirrus.logger import get_logger
 from cirrus.invoke_helpers import local
 from cirrus.pypirc import build_pip_command
-from virtualenvapi.manage import VirtualEnvironment
+from cirrus.lazy_import import lazy_attribute
 
 
+VirtualEnvironment = lazy_attribute('virtualenvapi.manage', 'VirtualEnvironment')
 LOGGER = get_logger()
 
 
@@ -7,7 +7,7 @@ your .gitconfig.
 
 """
 import os
-from cirrus.gitconfig import load_gitconfig
+from cirrus.gitconfig import load_gitconfig, can_parse_natively
 from cirrus.creds_plugin import CredsPlugin
 
 
@@ -30,7 +30,10 @@ class Default(CredsPlugin):
         """
         if self.gitconfig_file is None:
             self.gitconfig_file = os.path.join(os.environ['HOME'], '.gitconfig')
-        self.config = load_gitconfig(self.gitconfig_file)
+        self.config = load_gitconfig(
+            self.gitconfig_file,
+            native=can_parse_natively(self.gitconfig_file)
+        )
 
     def github_credentials(self):
         github_user = self.config.get_param('cirrus', 'github-user')
@@ -41,8 +44,9 @@ class Default(CredsPlugin):
         }
 
     def set_github_credentials(self, username, token):
-        self.config.set_param('cirrus', 'github-user', username)
-        self.config.set_param('cirrus', 'github-token', token)
+        with self.config.batch():
+            self.config.set_param('cirrus', 'github-user', username)
+            self.config.set_param('cirrus', 'github-token', token)
 
     def pypi_credentials(self):
         pypi_user = self.config.get_param('cirrus', 'pypi-user')
@@ -53,8 +57,9 @@ class Default(CredsPlugin):
         }
 
     def set_pypi_credentials(self, username, token):
-        self.config.set_param('cirrus', 'pypi-user', username)
-        self.config.set_param('cirrus', 'pypi-token', token)
+        with self.config.batch():
+            self.config.set_param('cirrus', 'pypi-user', username)
+            self.config.set_param('cirrus', 'pypi-token', token)
 
     def ssh_credentials(self):
         pypi_ssh_user = self.config.get_param('cirrus', 'ssh-user')
@@ -65,8 +70,9 @@ class Default(CredsPlugin):
         }
 
     def set_ssh_credentials(self, user, keyfile):
-        self.config.set_param('cirrus', 'ssh-user', user)
-        self.config.set_param('cirrus', 'ssh-key', keyfile)
+        with self.config.batch():
+            self.config.set_param('cirrus', 'ssh-user', user)
+            self.config.set_param('cirrus', 'ssh-key', keyfile)
 
     def buildserver_credentials(self):
         """
@@ -78,8 +84,9 @@ class Default(CredsPlugin):
         }
 
     def set_buildserver_credentials(self, user, token):
-        self.config.set_param('cirrus', 'buildserver-user', user)
-        self.config.set_param('cirrus', 'buildserver-token', token)
+        with self.config.batch():
+            self.config.set_param('cirrus', 'buildserver-user', user)
+            self.config.set_param('cirrus', 'buildserver-token', token)
 
     def chef_credentials(self):
         """
@@ -99,11 +106,12 @@ class Default(CredsPlugin):
         if client_key is None:
             client_key = keyfile
 
-        self.config.set_param('cirrus', 'chef-server', server)
-        self.config.set_param('cirrus', 'chef-username', username)
-        self.config.set_param('cirrus', 'chef-keyfile', keyfile)
-        self.config.set_param('cirrus', 'chef-client-user', client_user)
-        self.config.set_param('cirrus', 'chef-client-keyfile', client_key)
+        with self.config.batch():
+            self.config.set_param('cirrus', 'chef-server', server)
+            self.config.set_param('cirrus', 'chef-username', username)
+            self.config.set_param('cirrus', 'chef-keyfile', keyfile)
+            self.config.set_param('cirrus', 'chef-client-user', client_user)
+            self.config.set_param('cirrus', 'chef-client-keyfile', client_key)
 
     def dockerhub_credentials(self):
         return {
@@ -113,9 +121,10 @@ class Default(CredsPlugin):
         }
 
     def set_dockerhub_credentials(self, email, user, password):
-        self.config.set_param('cirrus', 'docker-login-username', user)
-        self.config.set_param('cirrus', 'docker-login-email', email)
-        self.config.set_param('cirrus', 'docker-login-password', password)
+        with self.config.batch():
+            self.config.set_param('cirrus', 'docker-login-username', user)
+            self.config.set_param('cirrus', 'docker-login-email', email)
+            self.config.set_param('cirrus', 'docker-login-password', password)
 
     def file_server_credentials(self):
         return {
@@ -124,5 +133,6 @@ class Default(CredsPlugin):
         }
 
     def set_file_server_credentials(self, username, keyfile):
-        self.config.set_param('cirrus', 'file-server-username', username)
-        self.config.set_param('cirrus', 'file-server-keyfile', keyfile)
+        with self.config.batch():
+            self.config.set_param('cirrus', 'file-server-username', username)
+            self.config.set_param('cirrus', 'file-server-keyfile', keyfile)
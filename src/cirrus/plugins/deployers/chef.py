@@ -21,14 +21,15 @@ attributes=thing.application.version
 """
 import os
 
-from fabric.operations import run
 from cirrus.fabric_helpers import FabricHelper
 from cirrus.logger import get_logger
+from cirrus.lazy_import import lazy_attribute
 from cirrus.deploy_plugins import Deployer
 import cirrus.chef_tools as ct
 from cirrus.configuration import get_chef_auth
 
 
+run = lazy_attribute('fabric.operations', 'run')
 LOGGER = get_logger()
 
 
@@ -9,13 +9,14 @@ virtualenv
 """
 import os
 import inspect
-import pystache
 
 import cirrus.templates
 from cirrus.editor_plugin import EditorPlugin
 from cirrus.logger import get_logger
+from cirrus.lazy_import import lazy_import
 
 
+pystache = lazy_import('pystache')
 LOGGER = get_logger()
 
 
@@ -1,6 +1,8 @@
-import requests
 from cirrus.configuration import get_buildserver_auth
 from cirrus.logger import get_logger
+from cirrus.lazy_import import lazy_import
+
+requests = lazy_import('requests')
 
 LOGGER = get_logger()
 
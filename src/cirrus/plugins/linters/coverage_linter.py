@@ -2,11 +2,12 @@
 """
 coverage linter plugin
 """
-import coverage
 
 from cirrus.linter_plugin import Linter
 from cirrus.logger import get_logger
+from cirrus.lazy_import import lazy_import
 
+coverage = lazy_import('coverage')
 LOGGER = get_logger()
 
 
@@ -4,11 +4,12 @@ pep8/pycodestyle linter
 
 """
 
-import pycodestyle
 
 from cirrus.linter_plugin import Linter
 from cirrus.logger import get_logger
+from cirrus.lazy_import import lazy_import
 
+pycodestyle = lazy_import('pycodestyle')
 LOGGER = get_logger()
 
 
@@ -3,13 +3,14 @@
 pyflakes linter plugin
 """
 import sys
-from pyflakes.api import checkPath
-from pyflakes import reporter
 from cirrus._2to3 import StringIO
 
 from cirrus.linter_plugin import Linter
 from cirrus.logger import get_logger
+from cirrus.lazy_import import lazy_import, lazy_attribute
 
+checkPath = lazy_attribute('pyflakes.api', 'checkPath')
+reporter = lazy_import('pyflakes.reporter')
 LOGGER = get_logger()
 
 
@@ -7,9 +7,10 @@ import re
 from cirrus.linter_plugin import Linter
 from cirrus._2to3 import redirect_stdout, StringIO
 from cirrus.logger import get_logger
-from pylint.lint import Run
+from cirrus.lazy_import import lazy_attribute
 
 
+Run = lazy_attribute('pylint.lint', 'Run')
 LOGGER = get_logger()
 
 SCORE_MATCH = re.compile("[\-]*\d.\d\d")
@@ -8,13 +8,13 @@ Publisher plugin that uses jenkins to handle publishing documentation
 import json
 import os
 
-from requests_toolbelt import MultipartEncoder
-
 from cirrus.logger import get_logger
 from cirrus.plugins.jenkins import JenkinsClient
 from cirrus.publish_plugins import Publisher
 from cirrus._2to3 import builtins
+from cirrus.lazy_import import lazy_attribute
 
+MultipartEncoder = lazy_attribute('requests_toolbelt', 'MultipartEncoder')
 LOGGER = get_logger()
 
 
@@ -6,12 +6,16 @@ repo/cirrus independent util for flagging PRs in github as plusone'd
 
 """
 import os
-import git
 import sys
 import json
 import argparse
-import requests
 from cirrus.configuration import get_github_auth
+from cirrus.git_tools import fetch_branches, merge_tracking_branch
+from cirrus.github_graphql import GraphQLClient, GraphQLUnavailable
+from cirrus.lazy_import import lazy_import
+
+git = lazy_import('git')
+requests = lazy_import('requests')
 
 
 class GitHubHelper(object):
@@ -35,8 +39,13 @@ class GitHubHelper(object):
         """
         _get_pr_
 
-        grab the PR details
+        grab the PR details, via GraphQL when available
+        to include the combined status, REST otherwise
         """
+        try:
+            return GraphQLClient(self.session).pull_request(org, repo, pr_id)
+        except GraphQLUnavailable:
+            pass
         url = "https://api.github.com/repos/{org}/{repo}/pulls/{id}".format(
             org=org,
             repo=repo,
@@ -67,9 +76,9 @@ class GitHubHelper(object):
         if branch is None:
             branch = git_repo.active_branch.name
 
-        # pull branch_from from remote
-        ref = "refs/heads/{0}:refs/remotes/origin/{0}".format(branch)
-        git_repo.remotes.origin.pull(ref)
+        # update branch from remote
+        if fetch_branches(git_repo, [branch])[branch]:
+            merge_tracking_branch(git_repo, branch)
 
         sha = git_repo.head.commit.hexsha
         url = "https://api.github.com/repos/{org}/{repo}/statuses/{sha}".format(
@@ -18,33 +18,34 @@ carburetor==0.1.2
 then it will check out that tag in the local repo clone prior to installing
 
 
+A clone cache under the cirrus home dir keeps shallow, partial
+clones of the prestaged repos, so repeat runs only fetch tags they
+havent seen before. Repos are cloned in parallel.
+
 """
 import os
-import shutil
 import subprocess
+from multiprocessing.pool import ThreadPool
 
 from pip.req import parse_requirements
 
 from cirrus.configuration import load_configuration
 from cirrus.configuration import get_github_auth
+from cirrus import clone_cache
+
+CLONE_POOL_SIZE = 4
 
 
 def git_clone_repo(repo_url, dirname, tag=None):
     """
     _git_clone_repo_
 
-    Get a local clone of the repo so that we can install
-    it locally via pip -e into the virtualenv
+    Get a local checkout of the repo at tag so that we can
+    install it locally via pip -e into the virtualenv
     """
     gh_user, gh_tok = get_github_auth()
-    if os.path.exists(dirname):
-        shutil.rmtree(dirname)
     clone_url = 'https://{0}:{1}@{2}'.format(gh_user, gh_tok, repo_url)
-    clone_comm = 'git clone {0} {1}'.format(clone_url, dirname)
-    subprocess.check_call(clone_comm, shell=True)
-    if tag is not None:
-        comm = 'cd {0} && git checkout {1}'.format(dirname, tag)
-        subprocess.check_call(comm, shell=True)
+    clone_cache.checkout(repo_url, dirname, tag=tag, clone_url=clone_url)
 
 
 def install_from_repo(venv, local_repo):
@@ -91,15 +92,25 @@ def main():
                 reqs[req.name] = versions[0]
 
     # prestage section contains a map of package name: repo
-    for req, repo in prestage_params.iteritems():
+    prestage = []
+    for req, repo in prestage_params.items():
         msg = "Prestaging repo for requirement {req} from {repo}"
         tag = reqs.get(req)
         if tag is not None:
             msg += " with tag {tag}"
-        msg.format(req=req, repo=repo, tag=tag)
-        print msg
-        local_repo = os.path.join(repo_cache, req)
-        git_clone_repo(repo, local_repo, tag=reqs.get(req))
+        print(msg.format(req=req, repo=repo, tag=tag))
+        prestage.append((repo, os.path.join(repo_cache, req), tag))
+
+    if prestage:
+        pool = ThreadPool(min(CLONE_POOL_SIZE, len(prestage)))
+        try:
+            pool.map(lambda args: git_clone_repo(*args), prestage)
+        finally:
+            pool.close()
+            pool.join()
+
+    # installs share the virtualenv so run them one at a time
+    for _, local_repo, _ in prestage:
         install_from_repo(venv_command, local_repo)
 
 
@@ -4,7 +4,7 @@ _quality_control_
 Command to run quality control via pylint, pep8, pyflakes
 '''
 import sys
-import pluggage
+from cirrus.registry_cache import get_factory
 
 from argparse import ArgumentParser
 
@@ -14,7 +14,7 @@ from cirrus.logger import get_logger
 
 LOGGER = get_logger()
 
-FACTORY = pluggage.registry.get_factory(
+FACTORY = get_factory(
     'linter',
     load_modules=['cirrus.plugins.linters']
 )
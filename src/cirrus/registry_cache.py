@@ -0,0 +1,349 @@
+#!/usr/bin/env python
+"""
+_registry_cache_
+
+Precomputed registry of cirrus commands and plugins so that
+the delegate command and plugin factories can start without
+scanning setuptools entry points or importing every plugin module.
+
+The cache is a json file in the cirrus virtualenv, stamped with
+the installed cirrus version, the mtime of the cirrus package
+directory and the entry_points.txt metadata of every installed
+distribution, so installing, upgrading or removing cirrus or a
+package providing cirrus_commands invalidates it.
+
+The cache is written at install (selfsetup) and selfupdate time,
+or by running:
+
+python -m cirrus.registry_cache
+
+"""
+import os
+import sys
+import json
+import importlib
+
+import cirrus
+from cirrus.environment import virtualenv_home
+from cirrus.logger import get_logger
+
+
+LOGGER = get_logger()
+CACHE_FILE = 'cirrus_registry.json'
+
+#
+# factory name: package containing the plugins for that factory
+#
+PLUGIN_PACKAGES = {
+    'builder': 'cirrus.plugins.builders',
+    'credentials': 'cirrus.plugins.creds',
+    'deploy': 'cirrus.plugins.deployers',
+    'editors': 'cirrus.plugins.editors',
+    'linter': 'cirrus.plugins.linters',
+    'publish': 'cirrus.plugins.publishers',
+    'upload': 'cirrus.plugins.uploaders',
+}
+
+
+def cache_file():
+    """
+    path to the registry cache file, can be overridden
+    with the CIRRUS_REGISTRY_CACHE env var
+    """
+    if os.environ.get('CIRRUS_REGISTRY_CACHE') is not None:
+        return os.environ['CIRRUS_REGISTRY_CACHE']
+    return os.path.join(virtualenv_home(), CACHE_FILE)
+
+
+def install_stamp():
+    """
+    build the stamp identifying the installed cirrus
+    distribution, used to invalidate the cache on upgrade
+    """
+    package_dir = os.path.dirname(os.path.abspath(cirrus.__file__))
+    return {
+        'version': cirrus.__version__,
+        'mtime': os.path.getmtime(package_dir),
+        'distributions': distribution_stamp()
+    }
+
+
+def distribution_stamp():
+    """
+    map of entry_points.txt path: mtime for the distributions
+    on sys.path. The dist-info/egg-info directory names carry the
+    distribution versions. The working directory is skipped so
+    the stamp doesnt change with the package cirrus is run in.
+    """
+    result = {}
+    cwd = os.getcwd()
+    for path in sys.path:
+        if not path or os.path.abspath(path) == cwd:
+            continue
+        try:
+            names = os.listdir(path)
+        except OSError:
+            continue
+        for name in names:
+            if not name.endswith(('.dist-info', '.egg-info')):
+                continue
+            entry_points = os.path.join(path, name, 'entry_points.txt')
+            try:
+                result[entry_points] = os.path.getmtime(entry_points)
+            except OSError:
+                continue
+    return result
+
+
+def scan_commands(group='cirrus_commands'):
+    """
+    scan the entry points for cirrus commands, returns
+    a map of command name: module:attr string
+    """
+    import pkg_resources
+    return {
+        ep.name: "{0}:{1}".format(ep.module_name, '.'.join(ep.attrs))
+        for ep in pkg_resources.iter_entry_points(group=group)
+    }
+
+
+def scan_plugins():
+    """
+    import the cirrus plugin packages and return a map of
+    factory name: {plugin name: module:class string}
+
+    Packages that cannot be imported, eg due to a missing optional
+    dependency, are skipped
+    """
+    import pluggage.registry
+    result = {}
+    for factory_name, package in PLUGIN_PACKAGES.items():
+        try:
+            factory = pluggage.registry.get_factory(
+                factory_name, load_modules=[package]
+            )
+        except ImportError as ex:
+            LOGGER.warning(
+                "Unable to load plugins from {0}: {1}".format(package, ex)
+            )
+            continue
+        result[factory_name] = {
+            name: "{0}:{1}".format(cls.__module__, cls.__name__)
+            for name, cls in factory.registry.items()
+        }
+    return result
+
+
+def build_registry():
+    """
+    scan commands and plugins and build the cache content
+    """
+    return {
+        'stamp': install_stamp(),
+        'commands': scan_commands(),
+        'plugins': scan_plugins()
+    }
+
+
+def write_registry(filename=None, registry=None):
+    """
+    _write_registry_
+
+    Write the registry cache file, building the registry
+    content if not provided. Returns the registry content.
+
+    """
+    if filename is None:
+        filename = cache_file()
+    if registry is None:
+        registry = build_registry()
+    tmp_file = "{0}.tmp".format(filename)
+    try:
+        with open(tmp_file, 'w') as handle:
+            json.dump(registry, handle, indent=2, sort_keys=True)
+        os.rename(tmp_file, filename)
+    except (IOError, OSError) as ex:
+        LOGGER.warning(
+            "Unable to write registry cache {0}: {1}".format(filename, ex)
+        )
+    return registry
+
+
+def load_registry(filename=None):
+    """
+    _load_registry_
+
+    Read the registry cache file, returns None if it is
+    missing, unreadable or stale
+
+    """
+    if filename is None:
+        filename = cache_file()
+    if not os.path.exists(filename):
+        return None
+    try:
+        with open(filename, 'r') as handle:
+            registry = json.load(handle)
+    except (IOError, OSError, ValueError):
+        return None
+    if registry.get('stamp') != install_stamp():
+        return None
+    return registry
+
+
+_REGISTRY = {}
+
+
+def cached_registry():
+    """
+    process level accessor for the cache content, reads the
+    cache file once. Returns None if there is no valid cache
+    """
+    if 'content' not in _REGISTRY:
+        try:
+            _REGISTRY['content'] = load_registry()
+        except RuntimeError:
+            # cant work out where cirrus is installed
+            _REGISTRY['content'] = None
+    return _REGISTRY['content']
+
+
+def resolve(target):
+    """
+    import and return the object described by a
+    module:attr string
+    """
+    module_name, attrs = target.split(':', 1)
+    result = importlib.import_module(module_name)
+    for attr in attrs.split('.'):
+        result = getattr(result, attr)
+    return result
+
+
+class CachedEntryPoint(object):
+    """
+    _CachedEntryPoint_
+
+    Stand in for a pkg_resources EntryPoint built from
+    the registry cache
+    """
+    def __init__(self, name, target):
+        self.name = name
+        self.target = target
+
+    def load(self):
+        return resolve(self.target)
+
+
+def command_entry_points():
+    """
+    return name: entry point map from the cache or
+    None if the cache is not valid
+    """
+    registry = cached_registry()
+    if registry is None:
+        return None
+    return {
+        name: CachedEntryPoint(name, target)
+        for name, target in registry['commands'].items()
+    }
+
+
+class LazyRegistry(object):
+    """
+    _LazyRegistry_
+
+    Stand in for a pluggage Registry that defers importing plugin
+    modules (and pluggage itself) until a plugin is requested.
+    When the registry cache knows the module:class providing a
+    plugin, that class is imported directly without going through
+    the pluggage registry, otherwise all the load_modules are
+    imported and the plugin is looked up in pluggage.
+
+    """
+    def __init__(self, factory_name, load_modules=None, plugin_targets=None):
+        self.factory_name = factory_name
+        self.load_modules = load_modules or []
+        self._plugin_targets = plugin_targets
+        self._loaded = False
+
+    @property
+    def plugin_targets(self):
+        """plugin name: module:class map from the registry cache"""
+        if self._plugin_targets is None:
+            registry = cached_registry()
+            if registry is None:
+                self._plugin_targets = {}
+            else:
+                self._plugin_targets = registry['plugins'].get(
+                    self.factory_name, {}
+                )
+        return self._plugin_targets
+
+    def _plugins(self):
+        import pluggage.registry
+        return pluggage.registry.Registry(self.factory_name).registry
+
+    def _load_all(self):
+        if not self._loaded:
+            for module_name in self.load_modules:
+                importlib.import_module(module_name)
+            self._loaded = True
+
+    @property
+    def registry(self):
+        """the full plugin map, loads all plugin modules"""
+        self._load_all()
+        return self._plugins()
+
+    def get(self, plugin, default=None):
+        """get the named plugin class, importing its module if needed"""
+        target = self.plugin_targets.get(plugin)
+        if target is not None and ':' in target:
+            try:
+                return resolve(target)
+            except AttributeError:
+                # class moved since the cache was written
+                LOGGER.debug("Stale registry cache entry {0}".format(target))
+        current = self._plugins()
+        if plugin not in current:
+            self._load_all()
+        return current.get(plugin, default)
+
+    def __call__(self, plugin, *args, **kwargs):
+        cls = self.get(plugin)
+        if cls is None:
+            from pluggage.errors import FactoryError
+            msg = (
+                "No plugin registered with {} for name {}"
+            ).format(self.factory_name, plugin)
+            raise FactoryError(
+                msg, factory=self.factory_name, plugin=plugin
+            )
+        return cls(*args, **kwargs)
+
+
+def get_factory(factory_name, load_modules=None):
+    """
+    _get_factory_
+
+    Drop in for pluggage.registry.get_factory that returns a
+    LazyRegistry, nothing is imported until a plugin is requested
+
+    """
+    return LazyRegistry(factory_name, load_modules=load_modules)
+
+
+def main():
+    """write the registry cache for this cirrus install"""
+    filename = sys.argv[1] if len(sys.argv) > 1 else cache_file()
+    registry = write_registry(filename)
+    LOGGER.info(
+        "Wrote registry cache {0} with {1} commands".format(
+            filename, len(registry['commands'])
+        )
+    )
+
+
+if __name__ == '__main__':
+    main()
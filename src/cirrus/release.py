@@ -8,25 +8,37 @@ Implement git cirrus release command
 """
 import os
 import sys
+import glob
+import codecs
+import shutil
+import hashlib
+import tempfile
 import datetime
 import itertools
+import argparse
+import functools
 from cirrus.invoke_helpers import local
-import pluggage.registry
+from cirrus.registry_cache import get_factory
 
 from argparse import ArgumentParser
 from cirrus.configuration import load_configuration
-from cirrus.environment import repo_directory
-from cirrus.git_tools import build_release_notes
+from cirrus.environment import repo_directory, active_branch_name
+from cirrus.git_tools import write_release_notes
 from cirrus.git_tools import has_unstaged_changes, current_branch
 from cirrus.git_tools import branch, checkout_and_pull
 from cirrus.git_tools import remote_branch_exists
+from cirrus.git_tools import release_index
 from cirrus.git_tools import commit_files_optional_push
-from cirrus.github_tools import GitHubContext, unmerged_releases
-from cirrus.utils import update_file, update_version, max_version
+from cirrus.git_tools import get_repo, push_refs, ref_shas
+from cirrus.github_tools import GitHubContext, require_ci_success
+from cirrus.utils import update_file_with
 from cirrus.logger import get_logger
 from cirrus.plugins.jenkins import JenkinsClient
-from cirrus.req_utils import bump_package
-from cirrus.release_status import release_status
+from cirrus.version_edits import VersionEdits, VERSION_FIELDS
+from cirrus.version_edits import bump_version, version_key
+from cirrus.release_status import release_status, release_status_all
+from cirrus.release_pipeline import Pipeline, Checkpoint, checkpoint_file
+from cirrus.release_batch import release_batch, BATCH_POOL_SIZE
 import cirrus.release_utils as rel_utils
 
 LOGGER = get_logger()
@@ -51,12 +63,7 @@ def parse_version(version):
     as integers
 
     """
-    split = version.split('.', 2)
-    return {
-        'major': int(split[0]),
-        'minor': int(split[1]),
-        'micro': int(split[2]),
-    }
+    return dict(zip(VERSION_FIELDS, version_key(version)))
 
 
 def bump_version_field(version, field='major'):
@@ -65,15 +72,64 @@ def bump_version_field(version, field='major'):
     version specified by field
     Return the updated version string
     """
-    vers_params = parse_version(version)
-    vers_params[field] += 1
-    if field == 'major':
-        vers_params['minor'] = 0
-        vers_params['micro'] = 0
-    elif field == 'minor':
-        vers_params['micro'] = 0
+    return bump_version(version, field)
+
 
-    return "{major}.{minor}.{micro}".format(**vers_params)
+def version_edits(config, repo_dir, new_version, bumps=None):
+    """
+    _version_edits_
+
+    The VersionEdits for a new version: cirrus.conf, the
+    version_file if configured and the requirements.txt pins
+    listed in bumps as (package, version) pairs
+
+    """
+    edits = VersionEdits()
+    edits.set_config_version(config.config_file, new_version)
+    if bumps:
+        reqs_file = os.path.join(repo_dir, 'requirements.txt')
+        for pkg, version in bumps:
+            LOGGER.info("Bumping dependency {} to {}".format(pkg, version))
+            edits.bump_requirement(reqs_file, pkg, version)
+
+    # update __version__ or equivalent
+    version_file, version_attr = config.version_file()
+    if version_file is not None:
+        LOGGER.info('Updating {0} attribute in {1}'.format(version_file, version_attr))
+        edits.set_version_attribute(version_file, new_version, version_attr)
+    return edits
+
+
+def next_free_version(config, repo_dir, current_version, field):
+    """
+    _next_free_version_
+
+    Bump field of the highest of current_version and the unmerged
+    release branches, skipping versions that already have a
+    release branch locally or on a remote
+
+    """
+    index = release_index(
+        repo_dir,
+        config.gitflow_release_prefix(),
+        config.gitflow_branch_name()
+    )
+    unmerged = index.unmerged(version_only=True)
+    if unmerged:
+        LOGGER.info(
+            (
+                "Skipping Existing Versions found "
+                "unmerged_releases: {}"
+            ).format(
+                ' '.join(unmerged)
+            )
+        )
+    new_version = index.next_free_version(
+        current_version,
+        lambda v: bump_version_field(v, field)
+    )
+    LOGGER.info("selected next free version as {}".format(new_version))
+    return new_version
 
 
 def artifact_name(config):
@@ -92,14 +148,17 @@ def artifact_name(config):
     )
     return build_artifact
 
+
 def egg_artifact_name(config):
     """
     given cirrus config, build the expected
-    artifact name
+    egg artifact name for the running python
     """
-    artifact_name = "{0}-{1}.tar.gz".format(
-        config.package_name(),
-        config.package_version()
+    artifact_name = "{0}-{1}-py{2}.{3}.egg".format(
+        config.package_name().replace('-', '_'),
+        config.package_version(),
+        sys.version_info[0],
+        sys.version_info[1]
     )
     build_artifact = os.path.join(
         os.getcwd(),
@@ -108,13 +167,15 @@ def egg_artifact_name(config):
     )
     return build_artifact
 
+
 def wheel_artifact_name(config):
     """
-    given cirrus config, build the expected
-    artifact name
+    given cirrus config, build the expected wheel artifact
+    name, the python, abi and platform tags depend on the
+    package so they are left as a * glob pattern
     """
-    artifact_name = "{0}-{1}.tar.gz".format(
-        config.package_name(),
+    artifact_name = "{0}-{1}-*.whl".format(
+        config.package_name().replace('-', '_'),
         config.package_version()
     )
     build_artifact = os.path.join(
@@ -125,6 +186,34 @@ def wheel_artifact_name(config):
     return build_artifact
 
 
+#
+# setup.py commands for each release format, run with their own
+# egg-info, build and dist dirs so that formats can build at once
+#
+BUILD_COMMANDS = {
+    'sdist': 'sdist',
+    'wheel': (
+        'build --build-base {build_dir}/build '
+        'bdist_wheel --bdist-dir {build_dir}/bdist'
+    ),
+    'egg': (
+        'build --build-base {build_dir}/build '
+        'bdist_egg --bdist-dir {build_dir}/bdist'
+    ),
+}
+ARTIFACT_NAMES = {
+    'sdist': artifact_name,
+    'wheel': wheel_artifact_name,
+    'egg': egg_artifact_name,
+}
+BUILD_POOL_SIZE = 4
+#
+# left out of the per format copies of the source tree,
+# top level only, egg-info and bytecode at any depth
+#
+BUILD_TREE_IGNORE = ('.git', '.tox', 'build', 'dist')
+
+
 parse_to_list = lambda s: [x.strip() for x in s.split(',') if x.strip()]
 
 
@@ -157,7 +246,7 @@ def get_plugin(plugin_name):
 
     Get the deploy plugin requested from the factory
     """
-    factory = pluggage.registry.get_factory(
+    factory = get_factory(
         'upload',
         load_modules=['cirrus.plugins.uploaders']
     )
@@ -177,8 +266,11 @@ def release_config(config, opts):
         'wait_on_ci_master': False,
         'wait_on_ci_timeout': 600,
         'wait_on_ci_interval': 2,
+        'wait_on_ci_max_interval': 60,
         'push_retry_attempts': 1,
         'push_retry_cooloff': 0,
+        'push_retry_max_interval': 30,
+        'push_retry_deadline': 120,
         'github_context_string': None,
         'update_github_context': False,
         'develop_github_context_string': None,
@@ -222,6 +314,9 @@ def release_config(config, opts):
     release_config['wait_on_ci_interval'] = int(
         release_config['wait_on_ci_interval']
     )
+    release_config['wait_on_ci_max_interval'] = int(
+        release_config['wait_on_ci_max_interval']
+    )
     release_config['update_github_context'] = convert_bool(
         release_config['update_github_context']
     )
@@ -231,6 +326,12 @@ def release_config(config, opts):
     release_config['push_retry_cooloff'] = int(
         release_config['push_retry_cooloff']
     )
+    release_config['push_retry_max_interval'] = int(
+        release_config['push_retry_max_interval']
+    )
+    release_config['push_retry_deadline'] = int(
+        release_config['push_retry_deadline']
+    )
 
     if release_config['update_github_context']:
         # require context string
@@ -312,6 +413,12 @@ def build_parser(argslist):
         default=False,
         help="dont push release branch to remote"
     )
+    new_command.add_argument(
+        '--commit-cache',
+        action='store_true',
+        default=False,
+        help="use the release notes commit cache in .git/cirrus"
+    )
 
     # borrow --micro/minor/major options from "new" command.
     subparsers.add_parser('trigger', parents=[new_command], add_help=False)
@@ -332,7 +439,30 @@ def build_parser(argslist):
         action='store_true'
     )
 
-    subparsers.add_parser('build')
+    build_command = subparsers.add_parser('build')
+    build_command.add_argument(
+        '--formats',
+        nargs='+',
+        choices=sorted(BUILD_COMMANDS),
+        default=None,
+        help='artifact formats to build, defaults to [build] release_formats or sdist'
+    )
+    build_command.add_argument(
+        '--resume',
+        action='store_true',
+        default=False,
+        help='continue a failed build from its journal instead of starting again'
+    )
+
+    resume_command = subparsers.add_parser(
+        'resume',
+        help='continue a release command that failed part way through'
+    )
+    resume_command.add_argument(
+        '--version', '-v',
+        help='release version to resume, defaults to the latest journal',
+        default=None
+    )
 
     status_command = subparsers.add_parser('status')
     status_command.add_argument(
@@ -340,6 +470,13 @@ def build_parser(argslist):
         help='check status of the provided release, defaults to current branch',
         default=None
     )
+    status_command.add_argument(
+        '--all',
+        action='store_true',
+        dest='all',
+        default=False,
+        help='report the status of every release branch and tag as a table'
+    )
 
     merge_command = subparsers.add_parser('merge')
     merge_command.add_argument(
@@ -402,6 +539,12 @@ def build_parser(argslist):
         default=False,
         action='store_true'
     )
+    merge_command.add_argument(
+        '--resume',
+        action='store_true',
+        default=False,
+        help='continue a failed merge from its journal instead of starting again'
+    )
 
     upload_command = subparsers.add_parser('upload')
     upload_command.add_argument(
@@ -434,8 +577,74 @@ def build_parser(argslist):
         dest='pypi_sudo',
         help='do not use sudo to upload build artifact to pypi'
     )
+    upload_command.add_argument(
+        '--resume',
+        action='store_true',
+        default=False,
+        help='continue a failed upload from its journal instead of starting again'
+    )
     upload_command.set_defaults(pypi_sudo=True)
 
+    batch_command = subparsers.add_parser(
+        'batch',
+        help='release the interdependent repos listed in a manifest'
+    )
+    batch_command.add_argument(
+        'manifest',
+        help='file listing the repo paths to release, one per line'
+    )
+    batch_command.add_argument('--micro', action='store_true', dest='micro')
+    batch_command.add_argument('--minor', action='store_true', dest='minor')
+    batch_command.add_argument('--major', action='store_true', dest='major')
+    batch_command.add_argument(
+        '--workers',
+        type=int,
+        default=BATCH_POOL_SIZE,
+        help='max number of packages to release at once'
+    )
+    batch_command.add_argument(
+        '--build',
+        action='store_true',
+        default=False,
+        help='build each package after creating its release'
+    )
+    batch_command.add_argument(
+        '--upload',
+        action='store_true',
+        default=False,
+        help='build and upload each package after creating its release'
+    )
+    batch_command.add_argument(
+        '--plugin',
+        dest='plugin',
+        default='pypi',
+        help='Uploader plugin to use with --upload'
+    )
+    batch_command.add_argument(
+        '--merge',
+        action='store_true',
+        default=False,
+        help='merge and clean up each release once it is done'
+    )
+    batch_command.add_argument(
+        '--no-remote',
+        action='store_true',
+        default=False,
+        help="dont push release branches to remote"
+    )
+    batch_command.add_argument(
+        '--dry-run',
+        action='store_true',
+        default=False,
+        help='print the release order and exit'
+    )
+    batch_command.add_argument(
+        '--resume',
+        action='store_true',
+        default=False,
+        help='continue a failed batch from its journal instead of starting again'
+    )
+
     opts = parser.parse_args(argslist)
     return opts
 
@@ -471,46 +680,20 @@ def make_new_version(opts):
     #
     if opts.skip_existing:
         # skip any existing unmerged branches
-        unmerged = unmerged_releases(repo_dir, version_only=True)
-        if unmerged:
-            LOGGER.info(
-                (
-                    "Skipping Existing Versions found "
-                    "unmerged_releases: {}"
-                ).format(
-                    ' '.join(unmerged)
-                )
-            )
-            unmerged.append(current_version)
-            current_version = max_version(*unmerged)
-            LOGGER.info(
-                "selected current version as {}".format(current_version)
-            )
-
-    new_version = bump_version_field(current_version, field)
+        new_version = next_free_version(
+            config, repo_dir, current_version, field
+        )
+    else:
+        new_version = bump_version_field(current_version, field)
     msg = "Bumping version from {prev} to {new} on branch {branch}".format(
         prev=current_version,
         new=new_version,
         branch=curr_branch
     )
     LOGGER.info(msg)
-    # update cirrus conf
-    config.update_package_version(new_version)
-    changes = ['cirrus.conf']
-
-    if opts.bump:
-        reqs_file = os.path.join(repo_dir, 'requirements.txt')
-        for pkg, version in opts.bump:
-            LOGGER.info("Bumping dependency {} to {}".format(pkg, version))
-            bump_package(reqs_file, pkg, version)
-        changes.append(reqs_file)
-
-    # update __version__ or equivalent
-    version_file, version_attr = config.version_file()
-    if version_file is not None:
-        LOGGER.info('Updating {0} attribute in {1}'.format(version_file, version_attr))
-        update_version(version_file, new_version, version_attr)
-        changes.append(version_file)
+    # update cirrus conf, version file and pins in one pass
+    changes = version_edits(config, repo_dir, new_version, opts.bump).apply()
+    config.set_package_version(new_version)
 
     # update files changed
     msg = "cirrus release: version bumped for {0}".format(curr_branch)
@@ -519,7 +702,17 @@ def make_new_version(opts):
     commit_files_optional_push(repo_dir, msg, not opts.no_remote, *changes)
 
 
-def new_release(opts):
+def release_notes_written(relnotes_file, version):
+    """check if the release notes already have an entry for version"""
+    marker = u"Release: {0} Created:".format(version)
+    try:
+        with codecs.open(relnotes_file, 'r', encoding='utf-8') as handle:
+            return any(line.startswith(marker) for line in handle)
+    except (IOError, OSError):
+        return False
+
+
+def new_release(opts, resume=None):
     """
     _new_release_
 
@@ -527,6 +720,10 @@ def new_release(opts):
     - Edit the conf to bump the version
     - Edit the history file with release notes
 
+    Progress is journaled in .git/cirrus/release-<version>.json,
+    resume is the release details from the journal when the
+    command is continued by release resume
+
     """
     LOGGER.info("Creating new release...")
     config = load_configuration()
@@ -534,7 +731,11 @@ def new_release(opts):
      # need to be on the latest develop
     repo_dir = repo_directory()
 
-    if opts.nightly:
+    if resume is not None:
+        new_version = resume['version']
+        current_version = resume['previous']
+        field = resume['field']
+    elif opts.nightly:
         msg = "creating new nightly release..."
         new_version = rel_utils.new_nightly()
         field = 'nightly'
@@ -547,26 +748,13 @@ def new_release(opts):
         fields = ['major', 'minor', 'micro']
         mask = [opts.major, opts.minor, opts.micro]
         field = [x for x in itertools.compress(fields, mask)][0]
-        curr = current_version
         if opts.skip_existing:
             # skip any existing unmerged branches
-            unmerged = unmerged_releases(repo_dir, version_only=True)
-            if unmerged:
-                LOGGER.info(
-                    (
-                        "Skipping Existing Versions found "
-                        "unmerged_releases: {}"
-                    ).format(
-                        ' '.join(unmerged)
-                    )
-                )
-                unmerged.append(current_version)
-                curr = max_version(*unmerged)
-                LOGGER.info(
-                    "selected current version as {}".format(curr)
-                )
-
-        new_version = bump_version_field(curr, field)
+            new_version = next_free_version(
+                config, repo_dir, current_version, field
+            )
+        else:
+            new_version = bump_version_field(current_version, field)
 
 
     # release branch
@@ -575,73 +763,111 @@ def new_release(opts):
         new_version
     )
     LOGGER.info('release branch is {0}'.format(branch_name))
-
-
-    # make sure the branch doesnt already exist on remote
-    if remote_branch_exists(repo_dir, branch_name):
-        msg = (
-            "Error: branch {branch_name} already exists on the remote repo "
-            "Please clean up that branch before proceeding\n"
-            "git branch -d {branch_name}\n"
-            "git push origin --delete {branch_name}\n"
-            ).format(branch_name=branch_name)
-        LOGGER.error(msg)
-        raise RuntimeError(msg)
-
-    # make sure repo is clean
-    if has_unstaged_changes(repo_dir):
-        msg = (
-            "Error: Unstaged changes are present on the branch "
-            "Please commit them or clean up before proceeding"
-        )
-        LOGGER.error(msg)
-        raise RuntimeError(msg)
-
     main_branch = config.gitflow_branch_name()
-    checkout_and_pull(repo_dir,  main_branch, pull=not opts.no_remote)
+    branch_ref = "refs/heads/{0}".format(branch_name)
 
-    # create release branch
-    branch(repo_dir, branch_name, main_branch)
+    def check(results):
+        # make sure the branch doesnt already exist on remote
+        if remote_branch_exists(repo_dir, branch_name):
+            msg = (
+                "Error: branch {branch_name} already exists on the remote repo "
+                "Please clean up that branch before proceeding\n"
+                "git branch -d {branch_name}\n"
+                "git push origin --delete {branch_name}\n"
+                ).format(branch_name=branch_name)
+            LOGGER.error(msg)
+            raise RuntimeError(msg)
 
-    # update cirrus conf
-    config.update_package_version(new_version)
-    changes = ['cirrus.conf']
+        # make sure repo is clean
+        if has_unstaged_changes(repo_dir):
+            msg = (
+                "Error: Unstaged changes are present on the branch "
+                "Please commit them or clean up before proceeding"
+            )
+            LOGGER.error(msg)
+            raise RuntimeError(msg)
 
-    if opts.bump:
-        reqs_file = os.path.join(repo_dir, 'requirements.txt')
-        for pkg, version in opts.bump:
-            LOGGER.info("Bumping dependency {} to {}".format(pkg, version))
-            bump_package(reqs_file, pkg, version)
-        changes.append(reqs_file)
-
-    # update release notes file
-    relnotes_file, relnotes_sentinel = config.release_notes()
-    if (relnotes_file is not None) and (relnotes_sentinel is not None):
-        LOGGER.info('Updating release notes in {0}'.format(relnotes_file))
-        relnotes = "Release: {0} Created: {1}\n".format(
-            new_version,
-            datetime.datetime.utcnow().isoformat()
-        )
-        relnotes += build_release_notes(
-            repo_dir,
-            current_version,
-            config.release_notes_format()
-        )
-        update_file(relnotes_file, relnotes_sentinel, relnotes)
-        changes.append(relnotes_file)
+    def create_branch(results):
+        checkout_and_pull(repo_dir,  main_branch, pull=not opts.no_remote)
+        develop_sha = ref_shas(
+            repo_dir, "refs/heads/{0}".format(main_branch)
+        ).get("refs/heads/{0}".format(main_branch))
+        # create release branch
+        branch(repo_dir, branch_name, main_branch)
+        return develop_sha
+
+    def commit(results):
+        branch_sha = ref_shas(repo_dir, branch_ref).get(branch_ref)
+        if branch_sha is not None and branch_sha != results['create_branch']:
+            LOGGER.info(
+                "{0} already has the release commit".format(branch_name)
+            )
+            return branch_sha
+
+        # update cirrus conf, version file and pins in one pass
+        changes = version_edits(config, repo_dir, new_version, opts.bump).apply()
+        config.set_package_version(new_version)
+
+        # update release notes file
+        relnotes_file, relnotes_sentinel = config.release_notes()
+        if (relnotes_file is not None) and (relnotes_sentinel is not None) \
+                and release_notes_written(relnotes_file, new_version):
+            # a previous attempt got this far before failing
+            LOGGER.info('Release notes in {0} already updated'.format(relnotes_file))
+            changes.append(relnotes_file)
+        elif (relnotes_file is not None) and (relnotes_sentinel is not None):
+            LOGGER.info('Updating release notes in {0}'.format(relnotes_file))
+            relnotes = u"Release: {0} Created: {1}\n".format(
+                new_version,
+                datetime.datetime.utcnow().isoformat()
+            )
 
-    # update __version__ or equivalent
-    version_file, version_attr = config.version_file()
-    if version_file is not None:
-        LOGGER.info('Updating {0} attribute in {1}'.format(version_file, version_attr))
-        update_version(version_file, new_version, version_attr)
-        changes.append(version_file)
+            def write_relnotes(handle):
+                handle.write(relnotes)
+                write_release_notes(
+                    repo_dir,
+                    current_version,
+                    config.release_notes_format(),
+                    handle,
+                    cache=opts.commit_cache
+                )
 
-    # update files changed
-    msg = "cirrus release: new release created for {0}".format(branch_name)
-    LOGGER.info('Committing files: {0}'.format(','.join(changes)))
-    LOGGER.info(msg)
-    commit_files_optional_push(repo_dir, msg, not opts.no_remote, *changes)
+            update_file_with(relnotes_file, relnotes_sentinel, write_relnotes)
+            changes.append(relnotes_file)
+
+        # update files changed
+        msg = "cirrus release: new release created for {0}".format(branch_name)
+        LOGGER.info('Committing files: {0}'.format(','.join(changes)))
+        LOGGER.info(msg)
+        commit_files_optional_push(repo_dir, msg, False, *changes)
+        return ref_shas(repo_dir, branch_ref).get(branch_ref)
+
+    def push(results):
+        remote_ref = "refs/remotes/origin/{0}".format(branch_name)
+        shas = ref_shas(repo_dir, branch_ref, remote_ref)
+        if shas.get(remote_ref) is not None and \
+                shas.get(remote_ref) == shas.get(branch_ref):
+            LOGGER.info("{0} already pushed".format(branch_name))
+            return
+        push_refs(get_repo(repo_dir), [branch_name])
+
+    checkpoint = Checkpoint(checkpoint_file(repo_dir, new_version), 'new')
+    checkpoint.begin(
+        opts,
+        resume=resume is not None,
+        release={
+            'version': new_version,
+            'previous': current_version,
+            'field': field
+        }
+    )
+    pipeline = Pipeline(checkpoint=checkpoint)
+    pipeline.add('check', check)
+    pipeline.add('create_branch', create_branch, requires=('check',))
+    pipeline.add('commit', commit, requires=('create_branch',))
+    if not opts.no_remote:
+        pipeline.add('push', push, requires=('commit',))
+    pipeline.run()
     return (new_version, field)
 
 
@@ -734,7 +960,15 @@ def upload_release(opts):
         LOGGER.info("Uploading {} to pypi disabled by test or option...".format(tag))
         return
 
-    plugin.upload(opts, build_artifact)
+    checkpoint = Checkpoint(checkpoint_file(repo_directory(), tag), 'upload')
+    checkpoint.begin(opts, resume=resume_requested(opts))
+    pipeline = Pipeline(checkpoint=checkpoint)
+
+    def upload(results):
+        plugin.upload(opts, build_artifact)
+
+    pipeline.add('upload', upload)
+    pipeline.run()
     return
 
 
@@ -763,6 +997,243 @@ def cleanup_release(opts):
         ghc.delete_branch(branch_name, not opts.no_remote)
 
 
+class ReleaseMerge(object):
+    """
+    _ReleaseMerge_
+
+    The steps of release merge as a Pipeline. Steps using the
+    local repo hold the repo resource so only one runs at a time,
+    CI polling holds nothing, so eg develop is merged and pushed
+    while master CI is still being polled.
+
+    Each step returns a json friendly result that is recorded
+    in the checkpoint, a rerun skips the completed steps.
+
+    """
+    REPO = ('repo',)
+
+    def __init__(self, ghc, config, rel_conf, opts):
+        self.ghc = ghc
+        self.rel_conf = rel_conf
+        self.opts = opts
+        self.tag = config.package_version()
+        self.master = config.gitflow_master_name()
+        self.develop = config.gitflow_branch_name()
+        self.expected_branch = release_branch_name(config)
+        self.remote = not opts.no_remote
+
+    def wait_on_ci(self, sha):
+        """poll CI for a single sha, raises unless it succeeds"""
+        states = self.ghc.wait_on_gh_statuses(
+            [sha],
+            timeout=self.rel_conf['wait_on_ci_timeout'],
+            interval=self.rel_conf['wait_on_ci_interval'],
+            max_interval=self.rel_conf['wait_on_ci_max_interval']
+        )
+        require_ci_success(states)
+
+    def branch(self, label):
+        """configured branch name for master or develop"""
+        return self.master if label == 'master' else self.develop
+
+    def contexts(self, label):
+        """the github context strings to set on master or develop"""
+        contexts = []
+        if self.rel_conf['update_github_context']:
+            contexts.extend(self.rel_conf['github_context_string'])
+        if self.rel_conf['update_{0}_github_context'.format(label)]:
+            contexts.extend(
+                self.rel_conf['github_{0}_context_string'.format(label)]
+            )
+        return contexts
+
+    def push(self, refs):
+        """single atomic push of refs to origin"""
+        LOGGER.info(u"Pushing {}".format(' '.join(refs)))
+        self.ghc.push_refs_with_retry(
+            refs,
+            attempts=self.rel_conf['push_retry_attempts'],
+            cooloff=self.rel_conf['push_retry_cooloff'],
+            max_interval=self.rel_conf['push_retry_max_interval'],
+            deadline=self.rel_conf['push_retry_deadline']
+        )
+
+    def check_branch(self, results):
+        """make sure we start on the release branch"""
+        release_branch = self.ghc.active_branch_name
+        if release_branch != self.expected_branch:
+            msg = (
+                u"Not on the expected release branch according "
+                u"to cirrus.conf\n Expected:{0} but on {1}"
+            ).format(self.expected_branch, release_branch)
+            LOGGER.error(msg)
+            raise RuntimeError(msg)
+        return {
+            'branch': release_branch,
+            'sha': self.ghc.repo.head.ref.commit.hexsha
+        }
+
+    def wait_release_ci(self, results):
+        LOGGER.info(
+            u"Waiting on CI build for {0}".format(
+                results['check_branch']['branch']
+            )
+        )
+        self.wait_on_ci(results['check_branch']['sha'])
+
+    def fetch(self, results):
+        # fetch master and develop in one round trip, the
+        # merges then update them from the fetched refs
+        self.ghc.fetch_branches(
+            [b for b, skip in ((self.master, self.opts.skip_master),
+                               (self.develop, self.opts.skip_develop))
+             if not skip]
+        )
+
+    def merge(self, label, results):
+        """
+        merge the release branch into master or develop,
+        returns the merge commit sha
+        """
+        branch = self.branch(label)
+        release_branch = results['check_branch']['branch']
+        if self.opts.log_status:
+            self.ghc.log_branch_status(branch)
+        LOGGER.info(u"Merging {} into {}".format(release_branch, branch))
+        self.ghc.pull_branch(branch, remote=self.remote)
+        self.ghc.merge_branch(release_branch)
+        if label == 'develop' and rel_utils.is_nightly(self.tag):
+            rel_utils.remove_nightly(self.ghc)
+        return self.ghc.repo.head.ref.commit.hexsha
+
+    def branch_ci(self, label, results):
+        LOGGER.info(u"Waiting on CI build for {0}".format(self.branch(label)))
+        self.wait_on_ci(results['merge_{0}'.format(label)])
+
+    def branch_status(self, label, results):
+        sha = results['merge_{0}'.format(label)]
+        statuses = []
+        for ctx in self.contexts(label):
+            LOGGER.info(u"Setting {} for {}".format(ctx, sha))
+            statuses.append((sha, ctx))
+        # one push of the merge commit, statuses posted concurrently
+        self.ghc.set_commit_states('success', statuses)
+
+    def tag_master(self, results):
+        sha = results['merge_master']
+        tag_ref = "refs/tags/{0}".format(self.tag)
+        if ref_shas(self.ghc.repo_dir, tag_ref).get(tag_ref) == sha:
+            LOGGER.info(u"{} already tagged as {}".format(sha, self.tag))
+            return
+        LOGGER.info(u"Tagging {} as {}".format(self.master, self.tag))
+        self.ghc.tag_release(self.tag, self.master, push=False, ref=sha)
+
+    def pushed(self, branch):
+        """True if origin is known to be at the local branch sha"""
+        local_ref = "refs/heads/{0}".format(branch)
+        remote_ref = "refs/remotes/origin/{0}".format(branch)
+        shas = ref_shas(self.ghc.repo_dir, local_ref, remote_ref)
+        return shas.get(local_ref) is not None and \
+            shas.get(local_ref) == shas.get(remote_ref)
+
+    def push_master(self, results):
+        # branch and tag go in one atomic push, so if the
+        # branch made it to origin the tag did too
+        if self.pushed(self.master):
+            LOGGER.info(u"{} already pushed".format(self.master))
+            return
+        self.push([self.master, "refs/tags/{0}".format(self.tag)])
+
+    def push_develop(self, results):
+        if self.pushed(self.develop):
+            LOGGER.info(u"{} already pushed".format(self.develop))
+            return
+        self.push([self.develop])
+
+    def cleanup(self, results):
+        self.ghc.delete_branch(
+            results['check_branch']['branch'], remote=self.remote
+        )
+
+    def pipeline(self, checkpoint=None):
+        """
+        _pipeline_
+
+        Build the step graph for the options and release config,
+        steps that arent needed are left out
+
+        """
+        pipeline = Pipeline(checkpoint=checkpoint)
+        pipeline.add('check_branch', self.check_branch, resources=self.REPO)
+        if self.opts.skip_master:
+            LOGGER.info(u'Skipping merging to {}'.format(self.master))
+        elif self.rel_conf['wait_on_ci']:
+            pipeline.add(
+                'wait_release_ci', self.wait_release_ci,
+                requires=('check_branch',)
+            )
+        if self.opts.skip_develop:
+            LOGGER.info(u'Skipping merging to {}'.format(self.develop))
+        if self.remote and not (self.opts.skip_master and self.opts.skip_develop):
+            pipeline.add(
+                'fetch', self.fetch,
+                requires=('check_branch',), resources=self.REPO
+            )
+
+        for label, skip in (('master', self.opts.skip_master),
+                            ('develop', self.opts.skip_develop)):
+            if skip:
+                continue
+            merge_step = 'merge_{0}'.format(label)
+            ci_step = 'wait_{0}_ci'.format(label)
+            status_step = '{0}_status'.format(label)
+            pipeline.add(
+                merge_step, functools.partial(self.merge, label),
+                requires=('check_branch', 'wait_release_ci', 'fetch'),
+                resources=self.REPO
+            )
+            if self.rel_conf['wait_on_ci_{0}'.format(label)]:
+                pipeline.add(
+                    ci_step, functools.partial(self.branch_ci, label),
+                    requires=(merge_step,)
+                )
+            if self.contexts(label):
+                pipeline.add(
+                    status_step, functools.partial(self.branch_status, label),
+                    requires=(merge_step, ci_step),
+                    resources=self.REPO
+                )
+            if label == 'master':
+                pipeline.add(
+                    'tag_master', self.tag_master,
+                    requires=(merge_step, ci_step, status_step),
+                    resources=self.REPO
+                )
+                if self.remote:
+                    pipeline.add(
+                        'push_master', self.push_master,
+                        requires=('tag_master',),
+                        resources=self.REPO
+                    )
+            elif self.remote:
+                pipeline.add(
+                    'push_develop', self.push_develop,
+                    requires=(merge_step, ci_step, status_step),
+                    resources=self.REPO
+                )
+
+        if self.opts.cleanup:
+            pipeline.add(
+                'cleanup', self.cleanup,
+                requires=(
+                    'merge_master', 'merge_develop',
+                    'push_master', 'push_develop'
+                ),
+                resources=self.REPO
+            )
+        return pipeline
+
+
 def merge_release(opts):
     """
     _merge_release_
@@ -771,182 +1242,257 @@ def merge_release(opts):
     branches (or those configured for this package) and tag
     master.
 
+    The merge runs as a pipeline of steps with progress recorded
+    in .git/cirrus/release-<version>.json, rerunning after a
+    failure picks up from the failed step.
+
     """
     config = load_configuration()
     rel_conf = release_config(config, opts)
     repo_dir = os.getcwd()
-    tag = config.package_version()
-    master = config.gitflow_master_name()
-    develop = config.gitflow_branch_name()
 
     with GitHubContext(repo_dir) as ghc:
+        release_merge = ReleaseMerge(ghc, config, rel_conf, opts)
+        LOGGER.info(u"Tagging and pushing {0}".format(release_merge.tag))
+        checkpoint = Checkpoint(
+            checkpoint_file(repo_dir, release_merge.tag), 'merge'
+        )
+        checkpoint.begin(opts, resume=resume_requested(opts))
+        release_merge.pipeline(checkpoint).run()
 
-        release_branch = ghc.active_branch_name
-        expected_branch = release_branch_name(config)
-        if release_branch != expected_branch:
-            msg = (
-                u"Not on the expected release branch according "
-                u"to cirrus.conf\n Expected:{0} but on {1}"
-            ).format(expected_branch, release_branch)
-            LOGGER.error(msg)
-            raise RuntimeError(msg)
 
-        # merge release branch into master
-        LOGGER.info(u"Tagging and pushing {0}".format(tag))
-        if opts.skip_master:
-            LOGGER.info(u'Skipping merging to {}'.format(master))
-        if opts.skip_develop:
-            LOGGER.info(u'Skipping merging to {}'.format(develop))
-
-        if opts.log_status:
-            ghc.log_branch_status(master)
-        if not opts.skip_master:
-            sha = ghc.repo.head.ref.commit.hexsha
-
-            if rel_conf['wait_on_ci']:
-                #
-                # wait on release branch CI success
-                #
-                LOGGER.info(u"Waiting on CI build for {0}".format(release_branch))
-                ghc.wait_on_gh_status(
-                    sha,
-                    timeout=rel_conf['wait_on_ci_timeout'],
-                    interval=rel_conf['wait_on_ci_interval']
-                )
+RELEASE_COMMANDS = ('new', 'build', 'upload', 'merge')
 
-            LOGGER.info(u"Merging {} into {}".format(release_branch, master))
-            ghc.pull_branch(master, remote=not opts.no_remote)
-            ghc.merge_branch(release_branch)
-            sha = ghc.repo.head.ref.commit.hexsha
-
-
-            if rel_conf['wait_on_ci_master']:
-                #
-                # wait on release branch CI success
-                #
-                LOGGER.info(u"Waiting on CI build for {0}".format(master))
-                ghc.wait_on_gh_status(
-                    sha,
-                    timeout=rel_conf['wait_on_ci_timeout'],
-                    interval=rel_conf['wait_on_ci_interval']
-                )
-            if rel_conf['update_github_context']:
-                for ctx in rel_conf['github_context_string']:
-                    LOGGER.info(u"Setting {} for {}".format(
-                        ctx,
-                        sha)
-                    )
-                    ghc.set_branch_state(
-                        'success',
-                        ctx,
-                        branch=sha
-                    )
 
-            if rel_conf['update_master_github_context']:
-                for ctx in rel_conf['github_master_context_string']:
-                    LOGGER.info(u"Setting {} for {}".format(
-                        ctx,
-                        sha)
-                    )
-                    ghc.set_branch_state(
-                        'success',
-                        ctx,
-                        branch=sha
-                    )
-            if not opts.no_remote:
-                ghc.push_branch_with_retry(
-                    attempts=rel_conf['push_retry_attempts'],
-                    cooloff=rel_conf['push_retry_cooloff']
-                )
-                LOGGER.info(u"Tagging {} as {}".format(master, tag))
-            ghc.tag_release(
-                tag,
-                master,
-                push=not opts.no_remote,
-                attempts=rel_conf['push_retry_attempts'],
-                cooloff=rel_conf['push_retry_cooloff']
-            )
+def resume_requested(opts):
+    """
+    True if the command was run with --resume or by release
+    resume, so it should continue its journal section
+    """
+    return getattr(opts, 'resume', False) is True
 
-        LOGGER.info(u"Merging {} into {}".format(release_branch, develop))
-        if opts.log_status:
-            ghc.log_branch_status(develop)
-        if not opts.skip_develop:
-            ghc.pull_branch(develop, remote=not opts.no_remote)
-            ghc.merge_branch(release_branch)
-            if rel_utils.is_nightly(tag):
-                rel_utils.remove_nightly(ghc)
-            sha = ghc.repo.head.ref.commit.hexsha
-
-            if rel_conf['wait_on_ci_develop']:
-                #
-                # wait on release branch CI success
-                #
-                LOGGER.info(u"Waiting on CI build for {0}".format(develop))
-                ghc.wait_on_gh_status(
-                    sha,
-                    timeout=rel_conf['wait_on_ci_timeout'],
-                    interval=rel_conf['wait_on_ci_interval']
-                )
-            if rel_conf['update_github_context']:
-                for ctx in rel_conf['github_context_string']:
-                    LOGGER.info(u"Setting {} for {}".format(
-                        ctx,
-                        sha)
-                    )
-                    ghc.set_branch_state(
-                        'success',
-                        ctx,
-                        branch=sha
-                    )
 
-            if rel_conf['update_develop_github_context']:
-                for ctx in rel_conf['github_develop_context_string']:
-                    LOGGER.info(u"Setting {} for {}".format(
-                        ctx,
-                        sha)
-                    )
-                    ghc.set_branch_state(
-                        'success',
-                        ctx,
-                        branch=sha
-                    )
-            if not opts.no_remote:
-                ghc.push_branch_with_retry(
-                    attempts=rel_conf['push_retry_attempts'],
-                    cooloff=rel_conf['push_retry_cooloff']
-                )
-        if opts.cleanup:
-            ghc.delete_branch(release_branch, remote=not opts.no_remote)
+def latest_journal(repo_dir):
+    """the most recently updated release journal, or None"""
+    directory = os.path.dirname(checkpoint_file(repo_dir, 'VERSION'))
+    if not os.path.exists(directory):
+        return None
+    journals = [
+        os.path.join(directory, name) for name in os.listdir(directory)
+        if name.startswith('release-') and name.endswith('.json')
+    ]
+    if not journals:
+        return None
+    return max(journals, key=os.path.getmtime)
+
+
+def resume_release(opts):
+    """
+    _resume_release_
+
+    Continue the release command that didnt finish, according
+    to the journal for opts.version, or the most recently
+    updated journal. The command is rerun with the options it
+    was first run with and skips the steps already completed.
+
+    """
+    repo_dir = repo_directory()
+    if opts.version is not None:
+        journal = checkpoint_file(repo_dir, opts.version)
+    else:
+        journal = latest_journal(repo_dir)
+    if journal is None or not os.path.exists(journal):
+        msg = "No release journal found to resume"
+        LOGGER.error(msg)
+        raise RuntimeError(msg)
+
+    for command in RELEASE_COMMANDS:
+        checkpoint = Checkpoint(journal, command)
+        if checkpoint.status != 'running':
+            continue
+        section = checkpoint.load()[command]
+        options = argparse.Namespace(**section['options'])
+        options.resume = True
+        LOGGER.info(
+            "Resuming release {0} from {1}, completed steps: {2}".format(
+                command, journal,
+                ', '.join(sorted(section.get('completed', {}))) or 'none'
+            )
+        )
+        if command == 'new':
+            return new_release(options, resume=section['release'])
+        if command == 'build':
+            return build_release(options)
+        if command == 'upload':
+            return upload_release(options)
+        return merge_release(options)
+    LOGGER.info("Nothing to resume in {0}".format(journal))
 
 
 def show_release_status(opts):
     """check release status"""
-    release = opts.release
-    if release is None:
-        release = current_branch(repo_directory())
-    result = release_status(release)
+    if opts.all:
+        result, table = release_status_all()
+        for line in table:
+            print(line)
+    else:
+        release = opts.release
+        if release is None:
+            release = active_branch_name()
+        result = release_status(release)
     if not result:
         # unmerged/tagged release => exit as error status
         sys.exit(1)
 
 
+def artifact_hash(filename):
+    """sha256 hex digest of a build artifact"""
+    digest = hashlib.sha256()
+    with open(filename, 'rb') as handle:
+        for chunk in iter(functools.partial(handle.read, 65536), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def copy_source_tree(source_dir, dest, ignore=()):
+    """
+    _copy_source_tree_
+
+    Copy the package source in source_dir to dest for building one
+    release format, so setup.py runs for several formats at once
+    dont share the sdist staging dir, MANIFEST or egg-info. Build
+    output, bytecode and the names in ignore (eg the virtualenv) are
+    left out. .git is linked rather than copied, so VCS based file
+    finders still see the repo
+
+    """
+    source_dir = os.path.abspath(source_dir)
+    top_level = set(BUILD_TREE_IGNORE).union(ignore)
+
+    def ignored(directory, names):
+        result = [
+            name for name in names
+            if name.endswith(('.egg-info', '.pyc')) or name == '__pycache__'
+        ]
+        if os.path.abspath(directory) == source_dir:
+            result.extend(name for name in names if name in top_level)
+        return result
+
+    shutil.copytree(source_dir, dest, symlinks=True, ignore=ignored)
+    git_dir = os.path.join(source_dir, '.git')
+    if os.path.exists(git_dir):
+        os.symlink(git_dir, os.path.join(dest, '.git'))
+
+
 def build_release(opts):
     """
     _build_release_
 
-    run python setup.py sdist to create the release artifact
+    Build the release artifacts, python setup.py sdist by default
+    or each format in [build] release_formats or --formats.
+
+    Formats are built at once with the same python, each from its
+    own temporary copy of the source tree with its own egg-info, build
+    and dist dirs. Every expected artifact is checked for and moved to
+    dist/ and their sha256 hashes are logged and written to
+    dist/<name>-<version>.sha256
+
+    A failed build is only continued by release resume (or --resume)
+    and only if HEAD hasnt moved since, otherwise every format is
+    built again.
+
+    Returns the sdist artifact, or the first format built if no sdist
 
     """
     LOGGER.info("Building release...")
     config = load_configuration()
-    local('python setup.py sdist')
-    build_artifact = artifact_name(config)
-    if not os.path.exists(build_artifact):
-        msg = "Expected build artifact: {0} Not Found".format(build_artifact)
+    formats = getattr(opts, 'formats', None) or config.release_formats()
+    unknown = [x for x in formats if x not in BUILD_COMMANDS]
+    if unknown:
+        msg = "Unknown release formats: {0}, valid are {1}".format(
+            ', '.join(unknown), ', '.join(sorted(BUILD_COMMANDS))
+        )
         LOGGER.error(msg)
         raise RuntimeError(msg)
-    LOGGER.info("Release artifact created: {0}".format(build_artifact))
-    return build_artifact
+    source_dir = os.getcwd()
+    build_root = tempfile.mkdtemp(prefix='cirrus-build-')
+
+    def build_format(release_format):
+        def step(results):
+            build_dir = os.path.join(build_root, release_format)
+            os.makedirs(build_dir)
+            copy_source_tree(
+                source_dir, os.path.join(build_dir, 'src'),
+                ignore=(config.venv_name(),)
+            )
+            local(
+                "cd {build_dir}/src && "
+                "python setup.py egg_info --egg-base {build_dir} "
+                "{command} --dist-dir {build_dir}/dist".format(
+                    build_dir=build_dir,
+                    command=BUILD_COMMANDS[release_format].format(
+                        build_dir=build_dir
+                    )
+                )
+            )
+            build_artifact = ARTIFACT_NAMES[release_format](config)
+            built = glob.glob(
+                os.path.join(build_dir, 'dist', os.path.basename(build_artifact))
+            )
+            if not built:
+                msg = "Expected build artifact: {0} Not Found".format(build_artifact)
+                LOGGER.error(msg)
+                raise RuntimeError(msg)
+            dist_dir = os.path.dirname(build_artifact)
+            if not os.path.exists(dist_dir):
+                os.makedirs(dist_dir)
+            build_artifact = os.path.join(dist_dir, os.path.basename(built[0]))
+            shutil.move(built[0], build_artifact)
+            return build_artifact
+        return step
+
+    def hashes(results):
+        digests = {}
+        for release_format in formats:
+            digests[results[release_format]] = artifact_hash(results[release_format])
+        hash_file = "{0}.sha256".format(
+            artifact_name(config)[:-len('.tar.gz')]
+        )
+        with open(hash_file, 'w') as handle:
+            for build_artifact, digest in sorted(digests.items()):
+                LOGGER.info("sha256 {0} {1}".format(digest, build_artifact))
+                handle.write(
+                    "{0}  {1}\n".format(digest, os.path.basename(build_artifact))
+                )
+        return digests
+
+    repo_dir = repo_directory()
+    source = None
+    if repo_dir is not None and get_repo(repo_dir).head.is_valid():
+        source = get_repo(repo_dir).head.commit.hexsha
+    checkpoint = Checkpoint(
+        checkpoint_file(repo_dir, config.package_version()), 'build'
+    )
+    resume = resume_requested(opts)
+    if resume and checkpoint.load().get('build', {}).get('source') != source:
+        LOGGER.info("HEAD has moved since the failed build, not resuming it")
+        resume = False
+    checkpoint.begin(opts, resume=resume, source=source)
+    pipeline = Pipeline(checkpoint=checkpoint, pool_size=BUILD_POOL_SIZE)
+    for release_format in formats:
+        pipeline.add(release_format, build_format(release_format))
+    pipeline.add('hashes', hashes, requires=formats)
+    try:
+        results = pipeline.run()
+    finally:
+        shutil.rmtree(build_root, ignore_errors=True)
+    for release_format in formats:
+        LOGGER.info(
+            "Release artifact created: {0}".format(results[release_format])
+        )
+    if 'sdist' in formats:
+        return results['sdist']
+    return results[formats[0]]
 
 
 def main():
@@ -975,6 +1521,12 @@ def main():
     if opts.command == 'cleanup':
         cleanup_release(opts)
 
+    if opts.command == 'resume':
+        resume_release(opts)
+
+    if opts.command == 'batch':
+        release_batch(opts)
+
 
 if __name__ == '__main__':
 
@@ -0,0 +1,377 @@
+#!/usr/bin/env python
+"""
+_release_batch_
+
+Release a set of interdependent cirrus packages in one go.
+
+The manifest lists the repo paths, one per line, relative to the
+manifest file, blank lines and # comments are ignored. Each repo
+must have a cirrus.conf and may have a requirements.txt. A package
+that requires another package in the batch is released after it,
+with its requirements pin bumped to the version just released.
+Packages that dont depend on each other are released concurrently
+on a worker pool.
+
+Each package is released with the usual git cirrus release commands
+run in its repo, so a batch behaves the same as releasing the repos
+by hand. The version each package is being released as and each
+command run for a package are recorded in a journal next to the
+manifest, commands done are skipped when a failed batch is rerun
+with --resume. A release new that failed part way is continued with
+git cirrus release resume for that version so it isnt bumped twice.
+
+"""
+import os
+import sys
+import glob
+import subprocess
+
+from cirrus.configuration import load_configuration
+from cirrus.logger import get_logger
+from cirrus.release_pipeline import Checkpoint, Pipeline, checkpoint_file
+from cirrus.req_utils import ReqFile
+from cirrus.version_edits import bump_version
+from cirrus._2to3 import unicode_
+
+LOGGER = get_logger()
+BATCH_POOL_SIZE = 4
+
+
+def normalise_name(name):
+    """compare package names the way pip does"""
+    return name.strip().lower().replace('_', '-')
+
+
+def read_manifest(filename):
+    """
+    _read_manifest_
+
+    List of absolute repo paths from the manifest file
+
+    """
+    base = os.path.dirname(os.path.abspath(filename))
+    result = []
+    with open(filename, 'r') as handle:
+        for line in handle:
+            line = line.split('#', 1)[0].strip()
+            if not line:
+                continue
+            result.append(os.path.normpath(os.path.join(base, line)))
+    return result
+
+
+class BatchPackage(object):
+    """
+    _BatchPackage_
+
+    A repo in the batch, its package name, version and the
+    names of the packages it requires as written in its
+    requirements.txt
+
+    """
+    def __init__(self, path):
+        self.path = path
+        config = load_configuration(package_dir=path, cached=False)
+        self.name = config.package_name()
+        self.version = config.package_version()
+        self.requirements = []
+        reqs_file = os.path.join(path, 'requirements.txt')
+        if os.path.exists(reqs_file):
+            reqs = ReqFile(reqs_file)
+            reqs.parse()
+            self.requirements = list(reqs)
+        self.requires = []
+
+    @property
+    def key(self):
+        return normalise_name(self.name)
+
+
+def dependency_order(packages):
+    """
+    _dependency_order_
+
+    Link each package to the batch packages in its requirements
+    and return the packages sorted so that every package comes
+    after the ones it requires. Raises RuntimeError on a cycle.
+
+    """
+    by_key = {}
+    for package in packages:
+        if package.key in by_key:
+            msg = "Package {0} appears more than once: {1} and {2}".format(
+                package.name, by_key[package.key].path, package.path
+            )
+            raise RuntimeError(msg)
+        by_key[package.key] = package
+
+    for package in packages:
+        package.requires = [
+            (req, by_key[normalise_name(req)])
+            for req in package.requirements
+            if normalise_name(req) in by_key
+        ]
+
+    ordered = []
+    state = {}
+
+    def visit(package, chain):
+        if state.get(package.key) == 'done':
+            return
+        if state.get(package.key) == 'visiting':
+            cycle = chain[chain.index(package.name):] + [package.name]
+            msg = "Dependency cycle in batch: {0}".format(' -> '.join(cycle))
+            raise RuntimeError(msg)
+        state[package.key] = 'visiting'
+        for _, upstream in package.requires:
+            visit(upstream, chain + [package.name])
+        state[package.key] = 'done'
+        ordered.append(package)
+
+    for package in packages:
+        visit(package, [])
+    return ordered
+
+
+def run_release_command(path, *args):
+    """
+    run git cirrus release <args> in the repo at path,
+    raises RuntimeError with the command output on failure
+    """
+    command = [sys.executable, '-m', 'cirrus.release'] + list(args)
+    LOGGER.info("{0}: git cirrus release {1}".format(path, ' '.join(args)))
+    process = subprocess.Popen(
+        command, cwd=path,
+        stdout=subprocess.PIPE, stderr=subprocess.STDOUT
+    )
+    output = process.communicate()[0]
+    if process.returncode:
+        msg = "git cirrus release {0} failed in {1}:\n{2}".format(
+            ' '.join(args), path, unicode_(output.decode('utf-8', 'replace'))
+        )
+        raise RuntimeError(msg)
+    return output
+
+
+class ReleaseBatch(object):
+    """
+    _ReleaseBatch_
+
+    Release the packages of a manifest in dependency order
+
+    :param packages: list of BatchPackage
+    :param opts: batch command options
+    :param runner: callable(path, *args) running a release command
+       in a repo, run_release_command by default
+
+    """
+    def __init__(self, packages, opts, runner=run_release_command):
+        self.packages = dependency_order(packages)
+        self.opts = opts
+        self.runner = runner
+        self.versions = {}
+
+    def field(self):
+        if self.opts.major:
+            return '--major'
+        if self.opts.minor:
+            return '--minor'
+        return '--micro'
+
+    def commands(self):
+        """the release commands run for each package, in order"""
+        commands = ['new']
+        if self.opts.build or self.opts.upload:
+            commands.append('build')
+        if self.opts.upload:
+            commands.append('upload')
+        if self.opts.merge:
+            commands.append('merge')
+        return commands
+
+    def command_args(self, package, command, results):
+        """git cirrus release arguments for command"""
+        if command == 'new':
+            args = ['new', self.field()]
+            for req, upstream in package.requires:
+                args.extend([
+                    '--bump', req, results[step_name(upstream, 'new')]
+                ])
+        elif command == 'upload':
+            args = ['upload', '--plugin', self.opts.plugin]
+        elif command == 'merge':
+            args = ['merge', '--cleanup']
+        else:
+            args = [command]
+        if self.opts.no_remote and command in ('new', 'merge'):
+            args.append('--no-remote')
+        if self.opts.resume and command != 'new':
+            args.append('--resume')
+        return args
+
+    def release_versions(self, versions=None):
+        """
+        package name: version released map, the versions recorded
+        in the journal of the run being resumed, or the package
+        version bumped by the release field
+        """
+        self.versions = dict(versions or {})
+        for package in self.packages:
+            self.versions.setdefault(
+                package.name, bump_version(package.version, self.field()[2:])
+            )
+        return self.versions
+
+    def release_step(self, package, command):
+        """
+        step running one release command in the repo. When resuming,
+        a release new left part done for the version this batch is
+        releasing is continued with release resume rather than run
+        again. Returns the package version
+        """
+        def step(results):
+            version = self.versions.get(package.name)
+            resume = (
+                self.opts.resume and command == 'new' and
+                running_release(package.path, command, version)
+            )
+            if resume:
+                LOGGER.info(
+                    "Resuming release {0} of {1} {2}".format(
+                        command, package.name, version
+                    )
+                )
+                self.runner(package.path, 'resume', '--version', version)
+            else:
+                self.runner(
+                    package.path, *self.command_args(package, command, results)
+                )
+            version = load_configuration(
+                package_dir=package.path, cached=False
+            ).package_version()
+            if command == self.commands()[-1]:
+                LOGGER.info("Released {0} {1}".format(package.name, version))
+            return version
+        return step
+
+    def pipeline(self, checkpoint=None):
+        """
+        the Pipeline with a step for each release command of
+        each package, a package starts once the packages it
+        requires have run all their commands
+        """
+        pipeline = Pipeline(
+            checkpoint=checkpoint, pool_size=self.opts.workers
+        )
+        commands = self.commands()
+        for package in self.packages:
+            previous = [
+                step_name(upstream, commands[-1])
+                for _, upstream in package.requires
+            ]
+            for command in commands:
+                name = step_name(package, command)
+                pipeline.add(
+                    name, self.release_step(package, command),
+                    requires=previous
+                )
+                previous = [name]
+        return pipeline
+
+    def run(self, checkpoint=None):
+        """release the packages, returns the package: new version map"""
+        if checkpoint is None:
+            self.release_versions()
+        else:
+            section = checkpoint.load().get(checkpoint.section, {})
+            checkpoint.update(
+                versions=self.release_versions(section.get('versions'))
+            )
+        results = self.pipeline(checkpoint).run()
+        return dict(
+            (package.name, results[step_name(package, 'new')])
+            for package in self.packages
+        )
+
+    def plan(self):
+        """lines describing the release order"""
+        result = []
+        for package in self.packages:
+            line = "{0} {1} ({2})".format(
+                package.name, package.version, package.path
+            )
+            if package.requires:
+                line += " after {0}".format(
+                    ', '.join(upstream.name for _, upstream in package.requires)
+                )
+            result.append(line)
+        return result
+
+
+def step_name(package, command):
+    """batch pipeline step name for a release command of package"""
+    return "{0}:{1}".format(package.name, command)
+
+
+def running_release(path, command, version):
+    """
+    True if the release journal for version in the repo at path
+    has command left running by a failed run. Raises RuntimeError
+    if the journal of another release has command left running,
+    rather than guess which release to continue
+    """
+    journal = checkpoint_file(path, version)
+    if Checkpoint(journal, command).status == 'running':
+        return True
+    pattern = os.path.join(os.path.dirname(journal), 'release-*.json')
+    others = [
+        filename for filename in sorted(glob.glob(pattern))
+        if filename != journal
+        and Checkpoint(filename, command).status == 'running'
+    ]
+    if others:
+        msg = (
+            "Release {0} left running in {1}, the batch is releasing {2}. "
+            "Resume or remove it before resuming the batch"
+        ).format(command, ', '.join(others), version)
+        LOGGER.error(msg)
+        raise RuntimeError(msg)
+    return False
+
+
+def journal_file(manifest):
+    """path to the batch journal for manifest"""
+    return "{0}.cirrus-batch.json".format(os.path.abspath(manifest))
+
+
+def release_batch(opts, runner=run_release_command):
+    """
+    _release_batch_
+
+    Entry point for git cirrus release batch, releases the
+    repos in opts.manifest and returns the package: new version map
+
+    """
+    if len([x for x in (opts.major, opts.minor, opts.micro) if x]) > 1:
+        msg = "Can only specify one of --major, --minor or --micro"
+        LOGGER.error(msg)
+        raise RuntimeError(msg)
+    paths = read_manifest(opts.manifest)
+    if not paths:
+        msg = "No repos listed in {0}".format(opts.manifest)
+        LOGGER.error(msg)
+        raise RuntimeError(msg)
+    batch = ReleaseBatch(
+        [BatchPackage(path) for path in paths], opts, runner=runner
+    )
+    if opts.dry_run:
+        for line in batch.plan():
+            print(line)
+        return {}
+
+    checkpoint = Checkpoint(journal_file(opts.manifest), 'batch')
+    checkpoint.begin(opts, resume=opts.resume)
+    results = batch.run(checkpoint)
+    for package in batch.packages:
+        LOGGER.info("{0}: {1}".format(package.name, results[package.name]))
+    return results
@@ -0,0 +1,294 @@
+#!/usr/bin/env python
+"""
+_release_pipeline_
+
+Small dependency graph executor for the release steps.
+
+Each step names the steps it requires and the resources it uses.
+A step starts as soon as everything it requires has completed and
+no running step holds one of its resources, so steps that only talk
+to GitHub, eg polling CI, run alongside the steps working on the
+local repo.
+
+Completed steps and their results are recorded in a checkpoint
+file under .git/cirrus. The file is a journal of the release, one
+section per release command, which also keeps the command options
+so git cirrus release resume (or the command rerun with --resume)
+can skip the completed steps and carry on from where the failed
+run stopped. A plain rerun starts the command afresh.
+
+"""
+import os
+import json
+import time
+from multiprocessing.pool import ThreadPool
+
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+from cirrus.git_tools import get_repo
+from cirrus.logger import get_logger
+
+LOGGER = get_logger()
+PIPELINE_POOL_SIZE = 4
+
+
+def checkpoint_file(repo_dir, version):
+    """path to the checkpoint file for a release version"""
+    return os.path.join(
+        get_repo(repo_dir).git_dir,
+        'cirrus',
+        'release-{0}.json'.format(version)
+    )
+
+
+def journal_options(options):
+    """
+    the json friendly attributes of an argparse namespace,
+    used to rerun a command on resume
+    """
+    result = {}
+    for key, value in vars(options).items():
+        if key.startswith('_'):
+            continue
+        try:
+            json.dumps(value)
+        except (TypeError, ValueError):
+            continue
+        result[key] = value
+    return result
+
+
+class Checkpoint(object):
+    """
+    _Checkpoint_
+
+    Record of the completed steps of a release command and
+    their results, stored in one section of a json file so
+    that several commands can share a file
+
+    :param filename: path to the checkpoint json file
+    :param section: name of the command the steps belong to
+
+    """
+    def __init__(self, filename, section):
+        self.filename = filename
+        self.section = section
+
+    def load(self):
+        """the whole checkpoint file content, {} if missing"""
+        try:
+            with open(self.filename, 'r') as handle:
+                return json.load(handle)
+        except (IOError, OSError, ValueError):
+            return {}
+
+    def save(self, content):
+        """write the checkpoint file content"""
+        directory = os.path.dirname(self.filename)
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+        tmp_file = "{0}.tmp".format(self.filename)
+        with open(tmp_file, 'w') as handle:
+            json.dump(content, handle, indent=2, sort_keys=True)
+        os.rename(tmp_file, self.filename)
+
+    @property
+    def completed(self):
+        """step name: result map for the completed steps"""
+        return self.load().get(self.section, {}).get('completed', {})
+
+    def record(self, name, result):
+        """mark step name as completed with result"""
+        content = self.load()
+        section = content.setdefault(self.section, {})
+        section.setdefault('completed', {})[name] = result
+        self.save(content)
+
+    @property
+    def status(self):
+        """running, done or None if the command hasnt started"""
+        return self.load().get(self.section, {}).get('status')
+
+    def begin(self, options, resume=False, **details):
+        """
+        _begin_
+
+        Start or resume the command. A section left running by a
+        failed run is resumed if resume is True, otherwise its
+        progress is dropped and the command starts afresh.
+        The json friendly command options and any details are
+        stored so that release resume can rerun the command.
+
+        """
+        content = self.load()
+        section = content.get(self.section, {})
+        if section.get('status') == 'running' and not resume:
+            LOGGER.warning(
+                "Dropping the progress of the unfinished release {0} "
+                "in {1}, completed steps: {2}. Use git cirrus release "
+                "resume to continue a failed command".format(
+                    self.section, self.filename,
+                    ', '.join(sorted(section.get('completed', {}))) or 'none'
+                )
+            )
+        if section.get('status') != 'running' or not resume:
+            section = {'completed': {}}
+        section['status'] = 'running'
+        section['options'] = journal_options(options)
+        section.update(details)
+        content[self.section] = section
+        self.save(content)
+
+    def update(self, **details):
+        """store details in the section alongside the options"""
+        content = self.load()
+        content.setdefault(self.section, {}).update(details)
+        self.save(content)
+
+    def finish(self):
+        """mark the command as done"""
+        content = self.load()
+        content.setdefault(self.section, {})['status'] = 'done'
+        self.save(content)
+
+    def clear(self):
+        """forget the completed steps for this section"""
+        content = self.load()
+        if content.pop(self.section, None) is not None:
+            self.save(content)
+
+
+class Step(object):
+    """
+    _Step_
+
+    A named unit of work in a Pipeline, func is called with
+    the dict of results of the completed steps and its return
+    value is recorded as the result for the step, so it must
+    be json serialisable
+    """
+    def __init__(self, name, func, requires=(), resources=()):
+        self.name = name
+        self.func = func
+        self.requires = tuple(requires)
+        self.resources = frozenset(resources)
+
+
+class Pipeline(object):
+    """
+    _Pipeline_
+
+    Runs a graph of Steps on a thread pool. Requirements naming
+    steps that are not in the pipeline are ignored, which lets
+    optional steps be left out without rewiring the graph.
+
+    :param checkpoint: optional Checkpoint to skip completed
+       steps and record progress in
+    :param pool_size: max number of steps to run at once
+
+    """
+    def __init__(self, checkpoint=None, pool_size=PIPELINE_POOL_SIZE):
+        self.checkpoint = checkpoint
+        self.pool_size = pool_size
+        self.steps = []
+
+    def add(self, name, func, requires=(), resources=()):
+        """add a step, steps are started in the order they are added"""
+        self.steps.append(Step(name, func, requires, resources))
+
+    def _run_step(self, step, results, done):
+        start = time.time()
+        LOGGER.info("Starting release step {0}".format(step.name))
+        try:
+            result = step.func(results)
+        except Exception as ex:
+            LOGGER.error(
+                "Release step {0} failed after {1:.1f}s: {2}".format(
+                    step.name, time.time() - start, ex
+                )
+            )
+            done.put((step.name, None, ex))
+            return
+        LOGGER.info(
+            "Completed release step {0} in {1:.1f}s".format(
+                step.name, time.time() - start
+            )
+        )
+        done.put((step.name, result, None))
+
+    def run(self):
+        """
+        _run_
+
+        Run the steps that havent completed yet, returns the
+        step name: result map. If a step fails its exception is
+        re-raised once the running steps finish.
+
+        """
+        names = set(step.name for step in self.steps)
+        results = {}
+        if self.checkpoint is not None:
+            results.update(
+                (name, result)
+                for name, result in self.checkpoint.completed.items()
+                if name in names
+            )
+        pending = []
+        for step in self.steps:
+            if step.name in results:
+                LOGGER.info(
+                    "Skipping release step {0}, already completed".format(
+                        step.name
+                    )
+                )
+            else:
+                pending.append(step)
+
+        running = {}
+        held = set()
+        failed = None
+        done = queue.Queue()
+        pool = ThreadPool(max(1, self.pool_size))
+        try:
+            while pending or running:
+                if failed is None:
+                    for step in list(pending):
+                        ready = all(
+                            name in results or name not in names
+                            for name in step.requires
+                        )
+                        if ready and not held.intersection(step.resources):
+                            pending.remove(step)
+                            held.update(step.resources)
+                            running[step.name] = step
+                            pool.apply_async(
+                                self._run_step, (step, dict(results), done)
+                            )
+                if not running:
+                    break
+                name, result, error = done.get()
+                held.difference_update(running.pop(name).resources)
+                if error is not None:
+                    if failed is None:
+                        failed = error
+                    continue
+                results[name] = result
+                if self.checkpoint is not None:
+                    self.checkpoint.record(name, result)
+        finally:
+            pool.close()
+            pool.join()
+
+        if failed is not None:
+            raise failed
+        if pending:
+            msg = "Release steps {0} have unmet requirements".format(
+                ', '.join(step.name for step in pending)
+            )
+            raise RuntimeError(msg)
+        if self.checkpoint is not None:
+            self.checkpoint.finish()
+        return results
@@ -6,7 +6,14 @@ Helper function to determine release status
 
 """
 
+from cirrus.configuration import load_configuration
 from cirrus.environment import repo_directory
+from cirrus.git_tools import commit_parents
+from cirrus.git_tools import merged_refs
+from cirrus.git_tools import reachable_commits
+from cirrus.git_tools import release_index
+from cirrus.git_tools import release_version_key
+from cirrus.git_tools import tag_index
 from cirrus.github_tools import GitHubContext
 from cirrus.logger import get_logger
 
@@ -143,3 +150,140 @@ def release_status(release):
             LOGGER.info(msg)
             result = True
     return result
+
+
+def release_status_rows(repo_dir, config):
+    """
+    _release_status_rows_
+
+    Work out the status of every release in the repo in one pass.
+    Releases are the release branches (local or on origin) plus the
+    X.Y.Z tags. All refs are resolved with for-each-ref, containment
+    in develop and master is answered with for-each-ref --merged, and
+    releases whose branch has been deleted are checked against develop
+    via the release commit the tag merged, found by piping the tag
+    commits to one git log --stdin.
+
+    Returns a list of dicts ordered by version with release, branch,
+    tag, develop, master and ok keys
+
+    """
+    rel_pfix = config.gitflow_release_prefix()
+    develop_branch = config.gitflow_branch_name()
+    master_branch = config.gitflow_master_name()
+    origin_name = config.gitflow_origin_name()
+
+    branches = release_index(repo_dir, rel_pfix, develop_branch)
+    tags = tag_index(repo_dir)
+    versions = set(branches.releases)
+    versions.update(x for x in tags.shas if release_version_key(x))
+
+    patterns = ('refs/tags', 'refs/heads', 'refs/remotes')
+    on_master = merged_refs(repo_dir, master_branch, *patterns)
+    on_master.update(
+        merged_refs(
+            repo_dir,
+            "{0}/{1}".format(origin_name, master_branch),
+            *patterns
+        )
+    )
+
+    # for releases that only have a tag, the release commit is the
+    # last parent of the tagged merge commit on master, or the tagged
+    # commit itself if it isnt a merge (fast forwarded or tagged directly)
+    tag_only = [
+        tags.sha(v) for v in versions
+        if v not in branches and v in tags
+    ]
+    parents = commit_parents(repo_dir, tag_only)
+    tips = {}
+    for sha in tag_only:
+        shas = parents.get(sha) or []
+        tips[sha] = shas[-1] if len(shas) > 1 else sha
+    on_develop = reachable_commits(repo_dir, develop_branch, tips.values())
+
+    rows = []
+    for version in versions:
+        branch = branches.get(version)
+        tag_sha = tags.sha(version)
+        tag_ref = "refs/tags/{0}".format(version)
+        tagged = tag_ref in on_master
+        if branch is not None:
+            branch_refs = ["refs/heads/{0}".format(branch['branch'])]
+            branch_refs.extend(
+                "refs/remotes/{0}/{1}".format(remote, branch['branch'])
+                for remote in branch['remotes']
+            )
+            merged_master = tagged or any(
+                ref in on_master for ref in branch_refs
+            )
+            merged_develop = branch['merged']
+        else:
+            merged_master = tagged
+            merged_develop = tips.get(tag_sha) in on_develop
+        rows.append({
+            'release': version,
+            'key': release_version_key(version),
+            'branch': branch is not None,
+            'tag': tag_sha is not None,
+            'tagged': tagged,
+            'develop': merged_develop,
+            'master': merged_master,
+            'ok': tagged and merged_develop and merged_master
+        })
+    rows.sort(key=lambda r: (r['key'] is not None, r['key'] or (), r['release']))
+    return rows
+
+
+def format_status_table(rows):
+    """
+    format release status rows as a list of table lines
+    """
+    columns = [
+        ('Release', 'release'),
+        ('Branch', 'branch'),
+        ('Tag', 'tagged'),
+        ('Develop', 'develop'),
+        ('Master', 'master'),
+        ('Status', 'ok'),
+    ]
+
+    def cell(row, field):
+        value = row[field]
+        if field == 'release':
+            return value
+        if field == 'ok':
+            return 'released' if value else 'incomplete'
+        if field == 'tagged' and not value and row['tag']:
+            return 'off master'
+        return 'yes' if value else '-'
+
+    table = [[title for title, _ in columns]]
+    table.extend([cell(row, field) for _, field in columns] for row in rows)
+    widths = [max(len(line[i]) for line in table) for i in range(len(columns))]
+    return [
+        '  '.join(x.ljust(w) for x, w in zip(line, widths)).rstrip()
+        for line in table
+    ]
+
+
+def release_status_all():
+    """
+    _release_status_all_
+
+    Check the status of every release in the current repo.
+
+    returns a tuple of True if all releases look to be merged
+    and tagged, and the lines of the status table for the
+    caller to print
+
+    """
+    repo_dir = repo_directory()
+    config = load_configuration()
+    rows = release_status_rows(repo_dir, config)
+    incomplete = [r['release'] for r in rows if not r['ok']]
+    if incomplete:
+        LOGGER.info(
+            "Incomplete releases: {}".format(' '.join(incomplete))
+        )
+    return (not incomplete, format_status_table(rows))
@@ -36,6 +36,13 @@ def build_parser(argslist):
         dest='user',
         help='Filter by username'
     )
+    list_command.add_argument(
+        '--status', '-s',
+        action='store_true',
+        default=False,
+        dest='status',
+        help='Include CI status and review decision for each PR'
+    )
 
     detail_command = subparsers.add_parser('details')
     detail_command.add_argument(
@@ -79,8 +86,9 @@ def build_parser(argslist):
         '--id', '-i',
         required=True,
         type=int,
+        nargs='+',
         dest='id',
-        help='ID of pull request to approve/+1'
+        help='ID(s) of pull requests to approve/+1'
     )
     plusone_command.add_argument(
         '--plus-one-context', '-c',
@@ -102,9 +110,22 @@ def list_prs(opts):
     """
     repo_dir = os.getcwd()
     with GitHubContext(repo_dir) as ghc:
-        print "  ID,  User, Title"
-        for pr in ghc.pull_requests(user=opts.user):
-            print pr['number'], pr['user']['login'], pr['title']
+        if not opts.status:
+            print("  ID,  User, Title")
+            for pr in ghc.pull_requests(user=opts.user):
+                print(u"{0} {1} {2}".format(
+                    pr['number'], pr['user']['login'], pr['title']
+                ))
+            return
+        print("  ID,  User, CI Status, Review, Title")
+        for pr in ghc.pull_request_summaries(user=opts.user):
+            print(u"{0} {1} {2} {3} {4}".format(
+                pr['number'],
+                pr['user']['login'],
+                pr['combined_status']['state'],
+                pr['review_decision'] or '-',
+                pr['title']
+            ))
 
 
 def get_pr(opts):
@@ -116,8 +137,8 @@ def get_pr(opts):
     """
     repo_dir = os.getcwd()
     with GitHubContext(repo_dir) as ghc:
-        pr_data = ghc.pull_request_details(opts.id)
-        pprint.pprint(pr_data, indent=2)
+        pr_data = ghc.pull_requests_by_number([opts.id], status=False)
+        pprint.pprint(pr_data[opts.id], indent=2)
 
 
 def review_pr(opts):
@@ -141,14 +162,18 @@ def plusone_pr(opts):
     """
     _plusone_pr_
 
-    Set the +1 context status for the PR
+    Set the +1 context status for the PR(s), the details of
+    the requested PRs are fetched in one batch
     """
     repo_dir = os.getcwd()
     with GitHubContext(repo_dir) as ghc:
-        ghc.plus_one_pull_request(
-            pr_id=opts.id,
-            context=opts.plus_one_context
-        )
+        prs = ghc.pull_requests_by_number(opts.id, status=False)
+        for pr_id in opts.id:
+            ghc.plus_one_pull_request(
+                pr_id=pr_id,
+                pr_data=prs[pr_id],
+                context=opts.plus_one_context
+            )
 
 
 def main():
@@ -9,13 +9,12 @@ looking up the latest release and using that instead.
 """
 import sys
 import argparse
-import arrow
 import os
-import requests
 import inspect
 import contextlib
 
 from cirrus.invoke_helpers import local
+from cirrus.lazy_import import lazy_import
 
 import cirrus
 from cirrus.configuration import load_configuration
@@ -25,6 +24,8 @@ from cirrus.git_tools import update_to_branch, update_to_tag
 from cirrus.logger import get_logger
 
 
+arrow = lazy_import('arrow')
+requests = lazy_import('requests')
 LOGGER = get_logger()
 PYPI_JSON_URL = "https://pypi.python.org/pypi/cirrus-cli/json"
 
@@ -189,6 +190,16 @@ def pip_install(version, update_setuptools=False):
         )
 
 
+def refresh_registry_cache():
+    """
+    rebuild the command and plugin registry cache using
+    the python from the updated cirrus install
+    """
+    LOGGER.info("refreshing cirrus registry cache...")
+    python = os.path.join(virtualenv_home(), 'bin', 'python')
+    local('{0} -m cirrus.registry_cache'.format(python))
+
+
 def legacy_update(opts):
     """update repo installed cirrus"""
     install = find_cirrus_install()
@@ -202,6 +213,7 @@ def legacy_update(opts):
         if opts.branch is not None:
             update_to_branch(opts.branch, config)
             setup_develop(config)
+            refresh_registry_cache()
             return
 
         if opts.version is not None:
@@ -211,6 +223,7 @@ def legacy_update(opts):
             LOGGER.info("Retrieved latest tag: {0}".format(tag))
         update_to_tag(tag, config)
         setup_develop(config)
+        refresh_registry_cache()
 
 
 def pip_update(opts):
@@ -225,6 +238,7 @@ def pip_update(opts):
             tag = latest_pypi_release()
             LOGGER.info("Retrieved latest tag: {0}".format(tag))
         pip_install(tag, opts.upgrade_setuptools)
+        refresh_registry_cache()
 
 
 def main():
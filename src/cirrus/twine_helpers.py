@@ -7,8 +7,10 @@ Helper functions around the Twine CLI/API
 """
 
 from cirrus.configuration import load_configuration
-from twine.commands.register import register
-from twine.commands.upload import upload
+from cirrus.lazy_import import lazy_attribute
+
+register = lazy_attribute('twine.commands.register', 'register')
+upload = lazy_attribute('twine.commands.upload', 'upload')
 
 
 def register_package(
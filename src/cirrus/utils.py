@@ -6,17 +6,19 @@ General purpose utils
 
 """
 import os
+import shutil
 import contextlib
 import codecs
-from distutils.version import StrictVersion
+from cirrus.version_edits import strict_version_key
 
 
 def max_version(*versions):
     """
-    find largest semantic version
+    find largest version, accepting the versions distutils
+    StrictVersion does, eg 1.2.3, 1.2 and 1.0b1. Returns the
+    version string as given, raises ValueError for others
     """
-    max_version = max([StrictVersion(x) for x in versions])
-    return str(max_version)
+    return max(versions, key=strict_version_key)
 
 
 @contextlib.contextmanager
@@ -62,15 +64,39 @@ def update_file(filename, sentinel, text):
     "
 
     """
-    content = None
+    update_file_with(filename, sentinel, lambda handle: handle.write(text))
+    return
+
+
+def update_file_with(filename, sentinel, writer):
+    """
+    _update_file_with_
+
+    Streaming variant of update_file, writer is called with an
+    open file handle positioned after the sentinel and writes the
+    new text to it incrementally. The file is replaced atomically
+    once the writer has finished. writer is not called if the
+    sentinel is not found.
+
+    """
     with codecs.open(filename, 'r', encoding='utf-8') as handle:
         content = handle.read()
-
-    replacement = u"{0}\n\n{1}".format(sentinel, text)
-    content = content.replace(sentinel, replacement, 1)
-    with codecs.open(filename, 'w', encoding='utf-8') as handle:
-        handle.write(content)
-    return
+    index = content.find(sentinel)
+    if index == -1:
+        return
+    index += len(sentinel)
+    tmp_file = "{0}.tmp".format(filename)
+    try:
+        with codecs.open(tmp_file, 'w', encoding='utf-8') as handle:
+            handle.write(content[:index])
+            handle.write(u"\n\n")
+            writer(handle)
+            handle.write(content[index:])
+        shutil.copymode(filename, tmp_file)
+        os.rename(tmp_file, filename)
+    finally:
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
 
 
 def update_version(filename, new_version, vers_attr='__version__'):
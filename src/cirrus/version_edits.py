@@ -0,0 +1,264 @@
+#!/usr/bin/env python
+"""
+_version_edits_
+
+Version bumps for a release as one set of in memory edits.
+
+Each version bearing file, cirrus.conf, the package version_file
+and requirements.txt, is read once the first time it is edited,
+every edit is applied to its lines in memory and apply() writes
+each file that changed once, atomically. Edits only touch the
+version text on the lines that carry it, so comments, ordering
+and formatting of the rest of the file are preserved.
+
+Version strings are parsed once and the result reused, bumping
+and comparing versions doesnt re-split the same strings.
+
+"""
+import os
+import re
+import codecs
+import shutil
+from collections import OrderedDict
+
+from cirrus.logger import get_logger
+
+LOGGER = get_logger()
+
+VERSION_FIELDS = ('major', 'minor', 'micro')
+REQUIREMENT_OPERATORS = ('===', '~=', '==', '!=', '<=', '>=', '>', '<')
+
+STRICT_VERSION = re.compile(r"^(\d+)\.(\d+)(?:\.(\d+))?(?:([ab])(\d+))?$")
+SECTION_LINE = re.compile(r"^\[(?P<section>[^\]]+)\]")
+OPTION_LINE = re.compile(r"^(?P<key>[^\s=:\[#;][^=:]*?)\s*[=:]")
+
+_VERSION_KEYS = {}
+_VERSION_KEYS_LIMIT = 4096
+
+
+def version_key(version):
+    """
+    _version_key_
+
+    (major, minor, micro) integers for an X.Y.Z version string.
+    Parsed strings are cached, raises ValueError if the version
+    isnt X.Y.Z
+
+    """
+    key = _VERSION_KEYS.get(version)
+    if key is None:
+        split = version.split('.', 2)
+        if len(split) != 3:
+            msg = "Version {0} is not of the form X.Y.Z".format(version)
+            raise ValueError(msg)
+        key = tuple(int(x) for x in split)
+        if len(_VERSION_KEYS) >= _VERSION_KEYS_LIMIT:
+            _VERSION_KEYS.clear()
+        _VERSION_KEYS[version] = key
+    return key
+
+
+def strict_version_key(version):
+    """
+    _strict_version_key_
+
+    Sort key for the versions distutils StrictVersion accepts,
+    X.Y, X.Y.Z and either with an a or b prerelease suffix, which
+    sorts before the release. X.Y.Z versions use the cached
+    version_key. Raises ValueError for other versions
+
+    """
+    try:
+        return version_key(version) + (1, '', 0)
+    except ValueError:
+        pass
+    match = STRICT_VERSION.match(version)
+    if match is None:
+        msg = "Invalid version number {0}".format(version)
+        raise ValueError(msg)
+    major, minor, micro, prerelease, number = match.groups()
+    key = (int(major), int(minor), int(micro or 0))
+    if prerelease is None:
+        return key + (1, '', 0)
+    return key + (0, prerelease, int(number))
+
+
+def bump_version(version, field='major'):
+    """
+    version with field incremented and the fields
+    after it reset to 0
+    """
+    index = VERSION_FIELDS.index(field)
+    key = version_key(version)
+    bumped = key[:index] + (key[index] + 1,) + (0,) * (2 - index)
+    return "{0}.{1}.{2}".format(*bumped)
+
+
+def _line_ending(line):
+    """the newline at the end of line, if any"""
+    return line[len(line.rstrip('\r\n')):]
+
+
+class VersionEdits(object):
+    """
+    _VersionEdits_
+
+    Pending edits to version bearing files. Files are keyed by the
+    path they are edited with, which is also how apply() reports
+    them, so the result can be passed straight to a commit.
+
+    """
+    def __init__(self):
+        self.files = OrderedDict()
+
+    def _lines(self, filename):
+        """lines of filename as read the first time it is edited"""
+        if filename not in self.files:
+            with codecs.open(filename, 'r', encoding='utf-8') as handle:
+                content = handle.read()
+            self.files[filename] = (content, content.splitlines(True))
+        return self.files[filename][1]
+
+    def set_config_version(self, config_file, new_version):
+        """
+        _set_config_version_
+
+        Set the version option in the [package] section of
+        config_file, adding it or the section if missing
+
+        """
+        lines = self._lines(config_file)
+        section = None
+        last_option = None
+        for index, line in enumerate(lines):
+            match = SECTION_LINE.match(line)
+            if match is not None:
+                if section == 'package':
+                    break
+                section = match.group('section').strip()
+                if section == 'package':
+                    last_option = index
+                continue
+            if section != 'package':
+                continue
+            match = OPTION_LINE.match(line)
+            if match is None:
+                if line[:1].isspace() and line.strip() and last_option is not None:
+                    # continuation of the previous option
+                    last_option = index
+                continue
+            last_option = index
+            if match.group('key').strip().lower() == 'version':
+                value_start = match.end()
+                value = line[value_start:].rstrip('\r\n')
+                padding = value[:len(value) - len(value.lstrip())]
+                lines[index] = "{0}{1}{2}{3}".format(
+                    line[:value_start], padding, new_version,
+                    _line_ending(line)
+                )
+                return
+        if last_option is None:
+            if lines and not _line_ending(lines[-1]):
+                lines[-1] += '\n'
+            lines.extend(['\n', '[package]\n', 'version = {0}\n'.format(new_version)])
+            return
+        if not _line_ending(lines[last_option]):
+            lines[last_option] += '\n'
+        lines.insert(last_option + 1, 'version = {0}\n'.format(new_version))
+
+    def set_version_attribute(self, filename, new_version, attribute='__version__'):
+        """
+        _set_version_attribute_
+
+        Replace the quoted value of the first line assigning
+        attribute in filename, appending the line if not found
+
+        """
+        lines = self._lines(filename)
+        pattern = re.compile(
+            r"^(?P<prefix>{0}\s*=\s*)(?P<quote>['\"])"
+            r"(?P<value>.*?)(?P=quote)".format(re.escape(attribute))
+        )
+        for index, line in enumerate(lines):
+            if not line.startswith(attribute):
+                continue
+            match = pattern.match(line)
+            if match is not None:
+                lines[index] = "{0}{1}{2}{1}{3}".format(
+                    match.group('prefix'), match.group('quote'),
+                    new_version, line[match.end():]
+                )
+            else:
+                lines[index] = "{0} = \"{1}\"{2}".format(
+                    attribute, new_version, _line_ending(line) or '\n'
+                )
+            return
+        if lines and not _line_ending(lines[-1]):
+            lines[-1] += '\n'
+        lines.append("{0} = \"{1}\"\n".format(attribute, new_version))
+
+    def bump_requirement(self, filename, package, version):
+        """
+        _bump_requirement_
+
+        Pin package to version in the requirements file, keeping its
+        operator (== if unpinned), extras and anything after the
+        version, eg environment markers and comments. Names match
+        case insensitively with -, _ and . equivalent, as pip does.
+        Raises KeyError if the package isnt in the file.
+
+        """
+        lines = self._lines(filename)
+        operators = '|'.join(re.escape(op) for op in REQUIREMENT_OPERATORS)
+        name = '[-_.]+'.join(
+            re.escape(part) for part in re.split(r'[-_.]+', package)
+        )
+        pattern = re.compile(
+            r"^(?P<name>\s*{0}(?:\s*\[[^\]]*\])?)"
+            r"(?:(?P<op>\s*(?:{1})\s*)(?P<version>[^\s,;#]+))?"
+            r"(?P<rest>(?:\s*[,;#].*)?\s*)$".format(name, operators),
+            re.IGNORECASE
+        )
+        found = False
+        for index, line in enumerate(lines):
+            match = pattern.match(line.rstrip('\r\n'))
+            if match is None:
+                continue
+            found = True
+            lines[index] = "{0}{1}{2}{3}{4}".format(
+                match.group('name'),
+                match.group('op') or '==',
+                version,
+                match.group('rest'),
+                _line_ending(line)
+            )
+        if not found:
+            msg = "Unable to find package {0} in file {1}".format(
+                package, filename
+            )
+            raise KeyError(msg)
+
+    def apply(self):
+        """
+        _apply_
+
+        Write each edited file whose content changed, once, and
+        return the list of edited files for committing
+
+        """
+        for filename, (original, lines) in self.files.items():
+            content = ''.join(lines)
+            if content == original:
+                continue
+            LOGGER.info("Updating versions in {0}".format(filename))
+            tmp_file = "{0}.tmp".format(filename)
+            try:
+                with codecs.open(tmp_file, 'w', encoding='utf-8') as handle:
+                    handle.write(content)
+                shutil.copymode(filename, tmp_file)
+                os.rename(tmp_file, filename)
+            finally:
+                if os.path.exists(tmp_file):
+                    os.remove(tmp_file)
+            self.files[filename] = (content, lines)
+        return list(self.files)
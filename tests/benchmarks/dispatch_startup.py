@@ -0,0 +1,52 @@
+#!/usr/bin/env python
+"""
+dispatch_startup
+
+Compare wall clock time for git cirrus <verb> when the verb
+is dispatched as a subprocess vs in process.
+
+Usage:
+  python tests/benchmarks/dispatch_startup.py [verb] [repeats]
+
+Runs the delegate module with the active python for each dispatch
+mode and reports the mean time per invocation. Requires cirrus
+to be installed in the active environment so that the
+cirrus_commands entry points and console scripts are present.
+
+"""
+import os
+import sys
+import time
+import subprocess
+
+
+def time_dispatch(mode, verb, repeats):
+    """run the verb repeats times with the given mode, return mean secs"""
+    env = os.environ.copy()
+    env['CIRRUS_DISPATCH'] = mode
+    env.setdefault(
+        'VIRTUALENV_HOME',
+        os.path.dirname(os.path.dirname(sys.executable))
+    )
+    command = [sys.executable, '-m', 'cirrus.delegate', verb]
+    with open(os.devnull, 'w') as devnull:
+        start = time.time()
+        for _ in range(repeats):
+            subprocess.call(command, env=env, stdout=devnull, stderr=devnull)
+        elapsed = time.time() - start
+    return elapsed / repeats
+
+
+def main():
+    verb = sys.argv[1] if len(sys.argv) > 1 else 'hello'
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    sub = time_dispatch('subprocess', verb, repeats)
+    inproc = time_dispatch('inprocess', verb, repeats)
+    print("verb={0} repeats={1}".format(verb, repeats))
+    print("subprocess: {0:.3f}s per call".format(sub))
+    print("inprocess:  {0:.3f}s per call".format(inproc))
+    print("saving:     {0:.3f}s per call".format(sub - inproc))
+
+
+if __name__ == '__main__':
+    main()
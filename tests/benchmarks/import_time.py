@@ -0,0 +1,49 @@
+#!/usr/bin/env python
+"""
+import_time
+
+Report the cumulative import time of each cirrus command
+module using python -X importtime (python 3.7+)
+
+Usage:
+  python tests/benchmarks/import_time.py [module ...]
+
+"""
+import sys
+import subprocess
+
+COMMAND_MODULES = [
+    'cirrus.build',
+    'cirrus.delegate',
+    'cirrus.docker',
+    'cirrus.feature',
+    'cirrus.package',
+    'cirrus.quality_control',
+    'cirrus.release',
+    'cirrus.selfupdate',
+]
+
+
+def import_time(module):
+    """return cumulative import time of module in microseconds"""
+    proc = subprocess.Popen(
+        [sys.executable, '-X', 'importtime', '-c', 'import {}'.format(module)],
+        stderr=subprocess.PIPE
+    )
+    _, err = proc.communicate()
+    for line in err.decode('utf-8').splitlines():
+        fields = [x.strip() for x in line.split('|')]
+        if len(fields) == 3 and fields[2] == module:
+            return int(fields[1])
+    return None
+
+
+def main():
+    modules = sys.argv[1:] or COMMAND_MODULES
+    for module in modules:
+        usecs = import_time(module)
+        print("{0:<28} {1:>8.1f} ms".format(module, usecs / 1000.0))
+
+
+if __name__ == '__main__':
+    main()
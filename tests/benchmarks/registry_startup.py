@@ -0,0 +1,55 @@
+#!/usr/bin/env python
+"""
+registry_startup
+
+Cold vs warm startup timing for the git cirrus help output
+with and without the command/plugin registry cache.
+
+Usage:
+  python tests/benchmarks/registry_startup.py [repeats]
+
+Cold runs point CIRRUS_REGISTRY_CACHE at a missing file so the
+entry points are scanned with pkg_resources, warm runs use a
+freshly written cache file.
+
+"""
+import os
+import sys
+import time
+import shutil
+import tempfile
+import subprocess
+
+
+def time_help(cache_file, repeats):
+    """time python -m cirrus.delegate -h, return mean secs"""
+    env = os.environ.copy()
+    env['CIRRUS_REGISTRY_CACHE'] = cache_file
+    command = [sys.executable, '-m', 'cirrus.delegate', '-h']
+    with open(os.devnull, 'w') as devnull:
+        start = time.time()
+        for _ in range(repeats):
+            subprocess.call(command, env=env, stdout=devnull, stderr=devnull)
+        elapsed = time.time() - start
+    return elapsed / repeats
+
+
+def main():
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        cache_file = os.path.join(tmp_dir, 'cirrus_registry.json')
+        cold = time_help(cache_file, repeats)
+        subprocess.check_call(
+            [sys.executable, '-m', 'cirrus.registry_cache', cache_file]
+        )
+        warm = time_help(cache_file, repeats)
+    finally:
+        shutil.rmtree(tmp_dir)
+    print("repeats={0}".format(repeats))
+    print("cold (entry point scan): {0:.3f}s per call".format(cold))
+    print("warm (registry cache):   {0:.3f}s per call".format(warm))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+"""
+release_build
+
+Wall clock time of git cirrus release build for a generated package
+shipping several formats, building the formats one at a time (as
+separate release builds would) and all at once.
+
+Formats default to sdist and egg, pass wheel too if the wheel
+package is installed. Run from anywhere, a throwaway repo is made
+in a temp dir.
+
+Usage:
+  python tests/benchmarks/release_build.py [modules] [format ...]
+
+"""
+import os
+import sys
+import time
+import shutil
+import tempfile
+import argparse
+import subprocess
+
+import mock
+
+from cirrus import release
+from cirrus.utils import working_dir
+
+SETUP_PY = """
+from setuptools import setup, find_packages
+setup(name='bench_pkg', version='1.2.3', packages=find_packages())
+"""
+
+CIRRUS_CONF = """
+[package]
+name = bench_pkg
+version = 1.2.3
+"""
+
+
+def build_package(package_dir, modules):
+    """a git repo with a package of modules python modules"""
+    os.makedirs(os.path.join(package_dir, 'bench_pkg'))
+    with open(os.path.join(package_dir, 'setup.py'), 'w') as handle:
+        handle.write(SETUP_PY)
+    with open(os.path.join(package_dir, 'cirrus.conf'), 'w') as handle:
+        handle.write(CIRRUS_CONF)
+    with open(os.path.join(package_dir, 'bench_pkg', '__init__.py'), 'w') as handle:
+        handle.write("")
+    for i in range(modules):
+        filename = os.path.join(package_dir, 'bench_pkg', 'mod{0}.py'.format(i))
+        with open(filename, 'w') as handle:
+            for j in range(50):
+                handle.write("def func{0}(x):\n    return x + {0}\n\n".format(j))
+    subprocess.check_call(['git', 'init', '-q', package_dir])
+
+
+def timed(package_dir, formats, pool_size):
+    dist_dir = os.path.join(package_dir, 'dist')
+    if os.path.exists(dist_dir):
+        shutil.rmtree(dist_dir)
+    opts = argparse.Namespace(command='build', formats=formats)
+    start = time.time()
+    with mock.patch.object(release, 'BUILD_POOL_SIZE', pool_size):
+        with working_dir(package_dir):
+            release.build_release(opts)
+    return time.time() - start
+
+
+def main():
+    modules = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    formats = sys.argv[2:] or ['sdist', 'egg']
+    tmp_dir = tempfile.mkdtemp()
+    package_dir = os.path.join(tmp_dir, 'bench_pkg')
+    try:
+        build_package(package_dir, modules)
+        sequential_time = timed(package_dir, formats, 1)
+        parallel_time = timed(package_dir, formats, len(formats))
+    finally:
+        shutil.rmtree(tmp_dir)
+    print("{0} modules, formats {1}".format(modules, ' '.join(formats)))
+    print("sequential: {0:.2f}s".format(sequential_time))
+    print("parallel:   {0:.2f}s".format(parallel_time))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+"""
+release_merge
+
+Wall clock time of release merge with simulated GitHub latency,
+running the step graph one step at a time (the previous, strictly
+sequential flow) and with the pipeline overlapping CI polling with
+the develop merge and push.
+
+Usage:
+  python tests/benchmarks/release_merge.py [ci seconds]
+
+"""
+import sys
+import time
+import itertools
+
+import mock
+
+from cirrus.release import ReleaseMerge
+
+
+def fake_context(ci_seconds):
+    """GitHubContext stand in that sleeps instead of talking to GitHub"""
+    ghc = mock.Mock()
+    ghc.active_branch_name = 'release/1.2.3'
+    shas = itertools.count()
+    type(ghc.repo.head.ref).commit = mock.PropertyMock(
+        side_effect=lambda: mock.Mock(hexsha='sha{0}'.format(next(shas)))
+    )
+
+    def wait(shas, **kwargs):
+        time.sleep(ci_seconds)
+        return dict((sha, 'success') for sha in shas)
+    ghc.wait_on_gh_statuses.side_effect = wait
+    ghc.fetch_branches.side_effect = lambda *a, **k: time.sleep(0.3)
+    ghc.pull_branch.side_effect = lambda *a, **k: time.sleep(0.1)
+    ghc.push_refs_with_retry.side_effect = lambda *a, **k: time.sleep(0.5)
+    ghc.set_commit_states.side_effect = lambda *a, **k: time.sleep(0.5)
+    return ghc
+
+
+def release_merge(ci_seconds):
+    config = mock.Mock()
+    config.package_version.return_value = '1.2.3'
+    config.gitflow_master_name.return_value = 'master'
+    config.gitflow_branch_name.return_value = 'develop'
+    config.gitflow_release_prefix.return_value = 'release/'
+    rel_conf = {
+        'wait_on_ci': True,
+        'wait_on_ci_master': True,
+        'wait_on_ci_develop': True,
+        'wait_on_ci_timeout': 600,
+        'wait_on_ci_interval': 2,
+        'wait_on_ci_max_interval': 60,
+        'push_retry_attempts': 1,
+        'push_retry_cooloff': 0,
+        'push_retry_max_interval': 30,
+        'push_retry_deadline': 120,
+        'update_github_context': True,
+        'github_context_string': ['ci/cirrus'],
+        'update_master_github_context': False,
+        'update_develop_github_context': False,
+    }
+    opts = mock.Mock(
+        no_remote=False, skip_master=False, skip_develop=False,
+        log_status=False, cleanup=True
+    )
+    return ReleaseMerge(fake_context(ci_seconds), config, rel_conf, opts)
+
+
+def timed(pipeline):
+    start = time.time()
+    pipeline.run()
+    return time.time() - start
+
+
+@mock.patch('cirrus.release.rel_utils.is_nightly', return_value=False)
+@mock.patch('cirrus.release.ref_shas', return_value={})
+def main(mock_refs, mock_nightly):
+    ci_seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 2.0
+    sequential = release_merge(ci_seconds).pipeline()
+    sequential.pool_size = 1
+    sequential_time = timed(sequential)
+    pipelined_time = timed(release_merge(ci_seconds).pipeline())
+    print("CI wait {0:.1f}s per build".format(ci_seconds))
+    print("sequential: {0:.2f}s".format(sequential_time))
+    print("pipeline:   {0:.2f}s".format(pipelined_time))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,131 @@
+#!/usr/bin/env python
+"""
+release_notes
+
+Time and peak memory for building release notes over a long
+history, comparing GitPython iter_commits plus arrow (the previous
+implementation) with the streaming git log parser.
+
+Usage:
+  python tests/benchmarks/release_notes.py [commits]
+
+A synthetic repo with commits (default 50000) by a handful of
+interleaved authors is generated with git fast-import, tagged at
+the root commit. The streaming parser is run without the commit
+cache and then twice with it, cold and warm.
+
+"""
+import os
+import codecs
+import sys
+import time
+import shutil
+import tempfile
+import itertools
+import subprocess
+import tracemalloc
+
+import git
+import arrow
+
+from cirrus import git_tools
+
+AUTHORS = ['alice', 'bob', 'carol', 'dave', 'erin']
+
+
+def build_repo(repo_dir, commits):
+    """fast-import a linear history of commits touching one file"""
+    subprocess.check_call(['git', 'init', '-q', repo_dir])
+    stream = []
+    start = 1400000000
+    for i in range(commits):
+        author = AUTHORS[i % len(AUTHORS)]
+        message = "commit {0} by {1}\n\nsome detail\n".format(i, author)
+        content = "{0}\n".format(i)
+        stream.append(
+            "commit refs/heads/master\n"
+            "mark :{mark}\n"
+            "committer {author} <{author}@example.com> {date} +0000\n"
+            "data {mlen}\n{message}\n"
+            "{parent}"
+            "M 644 inline file.txt\n"
+            "data {clen}\n{content}\n".format(
+                mark=i + 1, author=author, date=start + i * 60,
+                mlen=len(message), message=message,
+                parent="from :{0}\n".format(i) if i else "",
+                clen=len(content), content=content
+            )
+        )
+    stream.append("reset refs/tags/0.0.0\nfrom :1\n\n")
+    process = subprocess.Popen(
+        ['git', 'fast-import', '--quiet'], cwd=repo_dir, stdin=subprocess.PIPE
+    )
+    process.communicate(''.join(stream).encode('utf-8'))
+    subprocess.check_call(
+        ['git', 'checkout', '-q', 'master'], cwd=repo_dir
+    )
+
+
+def legacy_release_notes(repo_dir, since_tag):
+    """the iter_commits/arrow/groupby implementation"""
+    repo = git.Repo(repo_dir)
+    sha = repo.tags[since_tag].commit.hexsha
+    rev_range = '..'.join([sha, repo.head.commit.hexsha])
+    rows = []
+    for commit in repo.iter_commits(rev_range):
+        rows.append({
+            'committer': commit.committer.name,
+            'message': commit.message,
+            'date': str(arrow.get(commit.committed_date))
+        })
+    result = [u" - Commit History:"]
+    for author, commits in itertools.groupby(rows, lambda x: x['committer']):
+        result.append(u" -- Author: {0}".format(author))
+        result.extend(
+            u' --- {0}: {1}'.format(c['date'], c['message'])
+            for c in sorted(commits, key=lambda x: x['date'], reverse=True)
+        )
+    return '\n'.join(result)
+
+
+def streaming_release_notes(repo_dir, since_tag, cache=False):
+    """stream the notes to a file as release new does"""
+    with codecs.open(os.devnull, 'w', encoding='utf-8') as handle:
+        git_tools.write_release_notes(
+            repo_dir, since_tag, 'plaintext', handle, cache=cache
+        )
+
+
+def measure(func, *args):
+    """returns elapsed secs, peak traced MB"""
+    tracemalloc.start()
+    start = time.time()
+    func(*args)
+    elapsed = time.time() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak / (1024.0 * 1024.0)
+
+
+def main():
+    commits = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        build_repo(tmp_dir, commits)
+        legacy = measure(legacy_release_notes, tmp_dir, '0.0.0')
+        git_tools.close_repos()
+        streaming = measure(streaming_release_notes, tmp_dir, '0.0.0')
+        cold = measure(streaming_release_notes, tmp_dir, '0.0.0', True)
+        warm = measure(streaming_release_notes, tmp_dir, '0.0.0', True)
+        git_tools.close_repos()
+    finally:
+        shutil.rmtree(tmp_dir)
+    print("{0} commits".format(commits))
+    print("iter_commits: {0:.2f}s peak {1:.1f}MB".format(*legacy))
+    print("git log:      {0:.2f}s peak {1:.1f}MB".format(*streaming))
+    print("cache cold:   {0:.2f}s peak {1:.1f}MB".format(*cold))
+    print("cache warm:   {0:.2f}s peak {1:.1f}MB".format(*warm))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+"""
+repo_pool
+
+Timing for the git_tools calls made by git cirrus release new
+with and without the shared git.Repo handle pool.
+
+Usage:
+  python tests/benchmarks/repo_pool.py [repeats] [commits]
+
+A throwaway repo with a tagged history is built in a temp dir,
+then the release new sequence (clean check, current branch, tag
+lookup, release notes, branch creation, commit) is run repeats
+times with CIRRUS_REPO_POOL on and off.
+
+"""
+import os
+import sys
+import time
+import shutil
+import tempfile
+import subprocess
+
+from cirrus import git_tools
+
+
+def run_git(repo_dir, *args):
+    with open(os.devnull, 'w') as devnull:
+        subprocess.check_call(
+            ['git'] + list(args), cwd=repo_dir, stdout=devnull, stderr=devnull
+        )
+
+
+def build_repo(repo_dir, commits):
+    """init a repo with a develop branch and a tag every 10 commits"""
+    run_git(repo_dir, 'init')
+    run_git(repo_dir, 'config', 'user.name', 'bench')
+    run_git(repo_dir, 'config', 'user.email', 'bench@example.com')
+    run_git(repo_dir, 'symbolic-ref', 'HEAD', 'refs/heads/develop')
+    for i in range(commits):
+        with open(os.path.join(repo_dir, 'file.txt'), 'w') as handle:
+            handle.write("{0}\n".format(i))
+        run_git(repo_dir, 'add', 'file.txt')
+        run_git(repo_dir, 'commit', '-m', 'commit {0}'.format(i))
+        if i % 10 == 0:
+            run_git(repo_dir, 'tag', '0.0.{0}'.format(i))
+
+
+def release_new(repo_dir, index):
+    """the git_tools calls made by release new"""
+    branch = git_tools.current_branch(repo_dir)
+    git_tools.has_unstaged_changes(repo_dir)
+    tags = git_tools.get_tags(repo_dir)
+    git_tools.get_tags_with_sha(repo_dir)
+    git_tools.build_release_notes(repo_dir, tags[0], 'plaintext')
+    release = 'release/bench-{0}'.format(index)
+    git_tools.branch(repo_dir, release, branch)
+    with open(os.path.join(repo_dir, 'cirrus.conf'), 'w') as handle:
+        handle.write("[package]\nversion = {0}\n".format(index))
+    git_tools.commit_files_optional_push(
+        repo_dir, 'bump {0}'.format(index), False, 'cirrus.conf'
+    )
+    git_tools.checkout_and_pull(repo_dir, branch, pull=False)
+
+
+def time_release_new(repo_dir, repeats, pooled, offset):
+    os.environ['CIRRUS_REPO_POOL'] = 'on' if pooled else 'off'
+    git_tools.close_repos()
+    start = time.time()
+    for i in range(repeats):
+        release_new(repo_dir, offset + i)
+    elapsed = time.time() - start
+    git_tools.close_repos()
+    return elapsed / repeats
+
+
+def main():
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    commits = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    cwd = os.getcwd()
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        build_repo(tmp_dir, commits)
+        # release new runs from the repo root
+        os.chdir(tmp_dir)
+        unpooled = time_release_new(tmp_dir, repeats, False, 0)
+        pooled = time_release_new(tmp_dir, repeats, True, repeats)
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(tmp_dir)
+    print("release new without pool: {0:.3f}s".format(unpooled))
+    print("release new with pool:    {0:.3f}s".format(pooled))
+    print("speedup: {0:.2f}x".format(unpooled / pooled))
+
+
+if __name__ == '__main__':
+    main()
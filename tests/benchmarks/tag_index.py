@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+"""
+tag_index
+
+get_tags and get_tags_with_sha timing on a repo with many
+nightly style tags, comparing per tag GitPython lookups (the
+previous implementation) with the for-each-ref tag index.
+
+Usage:
+  python tests/benchmarks/tag_index.py [tags]
+
+"""
+import sys
+import time
+import shutil
+import tempfile
+import subprocess
+
+import git
+
+from cirrus import git_tools
+
+
+def build_repo(repo_dir, tags):
+    """one commit per tag, tags written with update-ref --stdin"""
+    subprocess.check_call(['git', 'init', '-q', repo_dir])
+    stream = []
+    for i in range(tags):
+        message = "nightly {0}\n".format(i)
+        stream.append(
+            "commit refs/heads/master\n"
+            "mark :{mark}\n"
+            "committer bench <bench@example.com> {date} +0000\n"
+            "data {mlen}\n{message}\n"
+            "{parent}\n".format(
+                mark=i + 1, date=1400000000 + i * 60,
+                mlen=len(message), message=message,
+                parent="from :{0}\n".format(i) if i else ""
+            )
+        )
+        stream.append(
+            "reset refs/tags/1.0.0-nightly-{0:06d}\nfrom :{1}\n\n".format(
+                i, i + 1
+            )
+        )
+    process = subprocess.Popen(
+        ['git', 'fast-import', '--quiet'], cwd=repo_dir, stdin=subprocess.PIPE
+    )
+    process.communicate(''.join(stream).encode('utf-8'))
+
+
+def legacy_tags(repo_dir):
+    repo = git.Repo(repo_dir)
+    with_sha = {tag.name: tag.commit.hexsha for tag in repo.tags}
+    dates = {tag.name: tag.commit.committed_date for tag in repo.tags}
+    return with_sha, sorted(dates, key=dates.get, reverse=True)
+
+
+def indexed_tags(repo_dir):
+    return (
+        git_tools.get_tags_with_sha(repo_dir), git_tools.get_tags(repo_dir)
+    )
+
+
+def timed(func, *args):
+    start = time.time()
+    result = func(*args)
+    return time.time() - start, result
+
+
+def main():
+    tags = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        build_repo(tmp_dir, tags)
+        legacy, expected = timed(legacy_tags, tmp_dir)
+        cold, result = timed(indexed_tags, tmp_dir)
+        warm, _ = timed(indexed_tags, tmp_dir)
+        assert result == expected
+        git_tools.close_repos()
+    finally:
+        shutil.rmtree(tmp_dir)
+    print("{0} tags".format(tags))
+    print("repo.tags:        {0:.3f}s".format(legacy))
+    print("tag index, cold:  {0:.3f}s".format(cold))
+    print("tag index, warm:  {0:.3f}s".format(warm))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+"""
+version_bump
+
+Time of the version edits for a new release on a package with
+many requirement pins to bump, comparing the previous path
+(cirrus.conf rewritten through ConfigParser, bump_package reparsing
+and rewriting requirements.txt once per pin, update_version) with
+one VersionEdits pass writing each file once.
+
+Usage:
+  python tests/benchmarks/version_bump.py [pins] [bumped pins]
+
+"""
+import os
+import sys
+import time
+import shutil
+import tempfile
+
+from cirrus._2to3 import ConfigParser
+from cirrus.req_utils import bump_package
+from cirrus.utils import update_version
+from cirrus.version_edits import VersionEdits
+
+ROUNDS = 5
+
+
+def build_package(package_dir, pins):
+    """cirrus.conf, version file and a requirements.txt with pins entries"""
+    if os.path.exists(package_dir):
+        shutil.rmtree(package_dir)
+    os.makedirs(package_dir)
+    files = {
+        'cirrus.conf': os.path.join(package_dir, 'cirrus.conf'),
+        'reqs': os.path.join(package_dir, 'requirements.txt'),
+        'version': os.path.join(package_dir, '__init__.py'),
+    }
+    with open(files['cirrus.conf'], 'w') as handle:
+        handle.write(
+            "# bench package\n[package]\nname = bench\nversion = 1.2.3\n"
+            "version_file = __init__.py\n\n[gitflow]\n"
+            "develop_branch = develop\nrelease_branch_prefix = release/\n"
+        )
+    with open(files['reqs'], 'w') as handle:
+        for i in range(pins):
+            handle.write("package{0}==0.0.{0}\n".format(i))
+    with open(files['version'], 'w') as handle:
+        handle.write("__version__ = '1.2.3'\n")
+    return files
+
+
+def previous(files, bumps):
+    parser = ConfigParser.RawConfigParser()
+    parser.read(files['cirrus.conf'])
+    parser.set('package', 'version', '1.2.4')
+    with open(files['cirrus.conf'], 'w') as handle:
+        parser.write(handle)
+    for pkg, version in bumps:
+        bump_package(files['reqs'], pkg, version)
+    update_version(files['version'], '1.2.4')
+
+
+def single_pass(files, bumps):
+    edits = VersionEdits()
+    edits.set_config_version(files['cirrus.conf'], '1.2.4')
+    for pkg, version in bumps:
+        edits.bump_requirement(files['reqs'], pkg, version)
+    edits.set_version_attribute(files['version'], '1.2.4')
+    edits.apply()
+
+
+def timed(func, package_dir, pins, bumps):
+    total = 0.0
+    for _ in range(ROUNDS):
+        files = build_package(package_dir, pins)
+        start = time.time()
+        func(files, bumps)
+        total += time.time() - start
+    return total / ROUNDS
+
+
+def main():
+    pins = int(sys.argv[1]) if len(sys.argv) > 1 else 400
+    bumped = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    bumps = [("package{0}".format(i), "1.0.{0}".format(i)) for i in range(bumped)]
+    tmp_dir = tempfile.mkdtemp()
+    package_dir = os.path.join(tmp_dir, 'bench')
+    try:
+        previous_time = timed(previous, package_dir, pins, bumps)
+        single_time = timed(single_pass, package_dir, pins, bumps)
+    finally:
+        shutil.rmtree(tmp_dir)
+    print("{0} pins, {1} bumped".format(pins, bumped))
+    print("previous:    {0:.3f}s".format(previous_time))
+    print("single pass: {0:.3f}s".format(single_time))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+"""
+tests for clone_cache module
+"""
+import os
+import mock
+import unittest
+import tempfile
+import subprocess
+
+from cirrus.clone_cache import CloneCache
+from cirrus.clone_cache import cache_directory
+from cirrus.clone_cache import checkout
+
+
+class CloneCacheTests(unittest.TestCase):
+    """shallow clones and worktrees from a real remote repo"""
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.remote = os.path.join(self.dir, 'remote')
+        self.url = 'file://{0}'.format(self.remote)
+        self.env = dict(
+            os.environ,
+            GIT_AUTHOR_NAME='unittest', GIT_AUTHOR_EMAIL='unit@test.com',
+            GIT_COMMITTER_NAME='unittest', GIT_COMMITTER_EMAIL='unit@test.com'
+        )
+        os.makedirs(self.remote)
+        self.git('init', '-q')
+        for version in ('0.1.0', '0.2.0'):
+            with open(os.path.join(self.remote, 'VERSION'), 'w') as handle:
+                handle.write(version)
+            self.git('add', 'VERSION')
+            self.git('commit', '-q', '-m', version)
+            self.git('tag', version)
+        self.cache = CloneCache(os.path.join(self.dir, 'cache'))
+        self.checkout_dir = os.path.join(self.dir, 'prestage', 'pkg')
+
+    def tearDown(self):
+        os.system('rm -rf {}'.format(self.dir))
+
+    def git(self, *args):
+        return subprocess.check_output(
+            ('git',) + args, cwd=self.remote, env=self.env
+        ).decode('utf-8').strip()
+
+    def version(self):
+        with open(os.path.join(self.checkout_dir, 'VERSION')) as handle:
+            return handle.read()
+
+    def test_checkout_tags(self):
+        """tags are cloned shallow and reused from the cache"""
+        self.cache.checkout(self.url, self.checkout_dir, tag='0.1.0')
+        self.assertEqual(self.version(), '0.1.0')
+        mirror = self.cache.path(self.url)
+        self.failUnless(os.path.exists(os.path.join(mirror, 'shallow')))
+
+        self.cache.checkout(self.url, self.checkout_dir, tag='0.2.0')
+        self.assertEqual(self.version(), '0.2.0')
+
+        # both tags are now cached, the remote isnt contacted
+        self.cache.checkout(
+            self.url, self.checkout_dir, tag='0.1.0',
+            clone_url='file:///does/not/exist'
+        )
+        self.assertEqual(self.version(), '0.1.0')
+
+    def test_checkout_head(self):
+        """untagged checkouts follow the remote HEAD"""
+        self.cache.checkout(self.url, self.checkout_dir)
+        self.assertEqual(self.version(), '0.2.0')
+        with open(os.path.join(self.remote, 'VERSION'), 'w') as handle:
+            handle.write('0.3.0')
+        self.git('commit', '-q', '-am', '0.3.0')
+        self.cache.checkout(self.url, self.checkout_dir)
+        self.assertEqual(self.version(), '0.3.0')
+
+    def test_replaces_old_clone(self):
+        """a plain directory in the way is replaced with a worktree"""
+        os.makedirs(self.checkout_dir)
+        with open(os.path.join(self.checkout_dir, 'VERSION'), 'w') as handle:
+            handle.write('stale')
+        self.cache.checkout(self.url, self.checkout_dir, tag='0.1.0')
+        self.assertEqual(self.version(), '0.1.0')
+
+    def test_cache_disabled(self):
+        """without a cache dir a shallow clone is made in place"""
+        with mock.patch.dict(os.environ, {'CIRRUS_CLONE_CACHE': 'off'}):
+            self.assertEqual(cache_directory(), None)
+            checkout(self.url, self.checkout_dir, tag='0.1.0')
+        self.assertEqual(self.version(), '0.1.0')
+        self.failUnless(
+            os.path.exists(os.path.join(self.checkout_dir, '.git', 'shallow'))
+        )
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+"""
+tests for commit_cache module
+"""
+import os
+import io
+import mock
+import unittest
+import tempfile
+import subprocess
+
+from cirrus.commit_cache import CommitCache
+from cirrus.commit_cache import cache_directory
+from cirrus.git_tools import close_repos
+from cirrus.git_tools import iter_commit_msgs
+from cirrus.git_tools import write_release_notes
+
+SHA1 = 'a' * 40
+SHA2 = 'b' * 40
+
+
+class CommitCacheTests(unittest.TestCase):
+    """tests for the on disk commit store"""
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.cache_dir = cache_directory(self.dir)
+
+    def tearDown(self):
+        if os.path.exists(self.dir):
+            os.system('rm -rf {}'.format(self.dir))
+
+    def test_put_flush_get(self):
+        cache = CommitCache(self.cache_dir)
+        self.assertEqual(cache.get(SHA1), None)
+        cache.put(SHA1, {'committer': 'bob'})
+        cache.flush()
+        self.failUnless(os.path.exists(os.path.join(self.cache_dir, 'aa.json')))
+
+        cache = CommitCache(self.cache_dir)
+        self.assertEqual(cache.get(SHA1), {'committer': 'bob'})
+        self.assertEqual(cache.get(SHA2), None)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+        cache.clear()
+        self.assertEqual(CommitCache(self.cache_dir).get(SHA1), None)
+
+    def test_evict(self):
+        cache = CommitCache(self.cache_dir)
+        cache.put(SHA1, {'message': 'x' * 100})
+        cache.flush()
+        os.utime(os.path.join(self.cache_dir, 'aa.json'), (1, 1))
+
+        cache = CommitCache(self.cache_dir, max_bytes=250)
+        cache.put(SHA2, {'message': 'y' * 100})
+        cache.flush()
+        self.assertEqual(os.listdir(self.cache_dir), ['bb.json'])
+
+
+class CachedCommitMsgsTests(unittest.TestCase):
+    """release notes built through the cache from a real repo"""
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.git('init', '-q')
+        self.commit('first', 'bob')
+        self.git('tag', '0.0.0')
+        self.commit('second', 'bob')
+        self.commit('third', 'tom')
+
+    def tearDown(self):
+        close_repos()
+        if os.path.exists(self.dir):
+            os.system('rm -rf {}'.format(self.dir))
+
+    def git(self, *args):
+        return subprocess.check_output(('git',) + args, cwd=self.dir)
+
+    def commit(self, msg, name):
+        self.git(
+            '-c', 'user.name={0}'.format(name),
+            '-c', 'user.email={0}@example.com'.format(name),
+            'commit', '-q', '--allow-empty', '-m', msg
+        )
+
+    def test_cached_rows_match(self):
+        cache = CommitCache(cache_directory(os.path.join(self.dir, '.git')))
+        uncached = list(iter_commit_msgs(self.dir, '0.0.0'))
+        cached = list(iter_commit_msgs(self.dir, '0.0.0', cache))
+        self.assertEqual(cached, uncached)
+        self.assertEqual([r['message'] for r in cached], ['third\n', 'second\n'])
+        self.assertEqual(cache.misses, 2)
+
+        # only the new commit is parsed on the next build
+        self.commit('fourth', 'tom')
+        with mock.patch('cirrus.git_tools._commit_row') as mock_row:
+            mock_row.return_value = {'committer': 'tom'}
+            rows = list(iter_commit_msgs(self.dir, '0.0.0', cache))
+        self.assertEqual(mock_row.call_count, 1)
+        self.assertEqual(len(rows), 3)
+
+    def test_write_release_notes(self):
+        handle = io.StringIO()
+        write_release_notes(self.dir, '0.0.0', 'plaintext', handle)
+        self.failUnless(' -- Author: tom' in handle.getvalue())
+        cache_dir = cache_directory(os.path.join(self.dir, '.git'))
+        # the cache is opt in
+        self.failIf(os.path.exists(cache_dir))
+
+        handle = io.StringIO()
+        write_release_notes(
+            self.dir, '0.0.0', 'plaintext', handle, cache=True
+        )
+        self.failUnless(' -- Author: tom' in handle.getvalue())
+        self.failUnless(os.listdir(cache_dir))
+
+
+if __name__ == '__main__':
+    unittest.main()
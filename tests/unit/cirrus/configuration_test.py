@@ -8,7 +8,8 @@ import tempfile
 import mock
 
 from cirrus.plugins.creds.default import Default
-from cirrus.configuration import load_configuration
+from cirrus.configuration import load_configuration, invalidate_configuration
+from cirrus.environment import invalidate_git_environment
 from cirrus._2to3 import ConfigParser
 
 
@@ -101,6 +102,8 @@ class ConfigurationTests(unittest.TestCase):
     @mock.patch('cirrus.configuration.subprocess.Popen')
     def test_reading_missing(self, mock_pop, mock_shell):
         """test config load using repo dir"""
+        # plugin lookups may already have cached the real repo
+        invalidate_git_environment()
         mock_result = mock.Mock()
         mock_result.communicate = mock.Mock()
         mock_result.returncode = 0
@@ -110,13 +113,17 @@ class ConfigurationTests(unittest.TestCase):
         config = load_configuration(package_dir="womp")
 
         self.failUnless(mock_result.communicate.called)
-        mock_pop.assert_has_calls(mock.call(['git', 'rev-parse', '--show-toplevel'], stdout=-1))
+        mock_pop.assert_has_calls([
+            mock.call(
+                ['git', 'rev-parse', '--show-toplevel', '--git-dir',
+                 '--abbrev-ref', 'HEAD'],
+                stdout=-1, stderr=-1
+            )
+        ])
         self.assertEqual(config.package_version(), '1.2.3')
         self.assertEqual(config.package_name(), 'cirrus_tests')
-        self.failUnless(mock_shell.called)
-        mock_shell.assert_has_calls([
-            mock.call('git config --file {} -l'.format(self.gitconfig))
-        ])
+        # a gitconfig without includes is parsed without running git
+        self.failIf(mock_shell.called)
 
     def test_configuration_map(self):
         """test building config mapping"""
@@ -134,6 +141,74 @@ class ConfigurationTests(unittest.TestCase):
             mapping['cirrus']['configuration']['package']['name'], 'cirrus_tests'
         )
 
+    @mock.patch('cirrus.configuration.Configuration.load')
+    def test_cached_loading(self, mock_load):
+        """test configurations are reused until the files change"""
+        config = load_configuration(
+            package_dir=self.dir, gitconfig_file=self.gitconfig
+        )
+        self.assertEqual(mock_load.call_count, 1)
+        config['package'] = {'version': '9.9.9'}
+
+        config2 = load_configuration(
+            package_dir=self.dir, gitconfig_file=self.gitconfig
+        )
+        self.assertEqual(mock_load.call_count, 1)
+        self.failUnless(config is not config2)
+        self.failUnless('package' not in config2)
+
+        load_configuration(
+            package_dir=self.dir, gitconfig_file=self.gitconfig, cached=False
+        )
+        self.assertEqual(mock_load.call_count, 2)
+
+        with open(self.gitconfig, 'a') as handle:
+            handle.write("[alias]\n\tcirrus = ! cirrus\n")
+        load_configuration(package_dir=self.dir, gitconfig_file=self.gitconfig)
+        self.assertEqual(mock_load.call_count, 3)
+
+        invalidate_configuration(self.test_file)
+        load_configuration(package_dir=self.dir, gitconfig_file=self.gitconfig)
+        self.assertEqual(mock_load.call_count, 4)
+
+    @mock.patch('cirrus.gitconfig.shell_command')
+    def test_cached_parser_copied(self, mock_shell):
+        """test clones dont share the cached parser"""
+        mock_shell.return_value = self.gitconf_str
+        config = load_configuration(
+            package_dir=self.dir, gitconfig_file=self.gitconfig
+        )
+        config.parser.set('package', 'version', '9.9.9')
+        config2 = load_configuration(
+            package_dir=self.dir, gitconfig_file=self.gitconfig
+        )
+        self.assertEqual(config2.parser.get('package', 'version'), '1.2.3')
+
+    @mock.patch('cirrus.configuration.Configuration.load')
+    def test_same_size_edit(self, mock_load):
+        """test an edit keeping size and mtime invalidates the cache"""
+        load_configuration(package_dir=self.dir, gitconfig_file=self.gitconfig)
+        stat = os.stat(self.test_file)
+        with open(self.test_file, 'r') as handle:
+            content = handle.read()
+        with open(self.test_file, 'w') as handle:
+            handle.write(content.replace('1.2.3', '1.2.4'))
+        os.utime(self.test_file, (stat.st_atime, stat.st_mtime))
+        load_configuration(package_dir=self.dir, gitconfig_file=self.gitconfig)
+        self.assertEqual(mock_load.call_count, 2)
+
+    @mock.patch('cirrus.gitconfig.shell_command')
+    def test_update_invalidates(self, mock_shell):
+        """test writing the config file drops the cached copy"""
+        mock_shell.return_value = self.gitconf_str
+        config = load_configuration(
+            package_dir=self.dir, gitconfig_file=self.gitconfig
+        )
+        config.update_package_version('1.2.5')
+        config2 = load_configuration(
+            package_dir=self.dir, gitconfig_file=self.gitconfig
+        )
+        self.assertEqual(config2.package_version(), '1.2.5')
 
 
 if __name__ == '__main__':
@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+"""
+delegate command tests
+
+"""
+import os
+import sys
+import unittest
+import mock
+
+from cirrus.delegate import main, run_in_process, exit_status
+from cirrus.delegate import CommandTable
+
+
+class DelegateTests(unittest.TestCase):
+    """
+    tests for delegate main and dispatch modes
+    """
+    def setUp(self):
+        self.patch_environ = mock.patch.dict(
+            os.environ,
+            {'VIRTUALENV_HOME': '/nonexistent/venv'}
+        )
+        self.patch_environ.start()
+        self.patch_argv = mock.patch.object(sys, 'argv', ['cirrus'])
+        self.patch_argv.start()
+        self.patch_signals = mock.patch(
+            'cirrus.delegate.install_signal_handlers'
+        )
+        self.patch_signals.start()
+        self.command = mock.Mock(return_value=None)
+        self.commands = CommandTable()
+        self.commands._entry_points = {
+            'hello': mock.Mock(),
+            'cirrus': mock.Mock()
+        }
+        self.commands._entry_points['hello'].load.return_value = self.command
+
+    def tearDown(self):
+        self.patch_environ.stop()
+        self.patch_argv.stop()
+        self.patch_signals.stop()
+
+    def test_exit_status(self):
+        self.assertEqual(exit_status(None), 0)
+        self.assertEqual(exit_status(3), 3)
+        with mock.patch.object(sys, 'stderr') as mock_stderr:
+            with mock.patch.object(sys, 'stdout') as mock_stdout:
+                self.assertEqual(exit_status("error message"), 1)
+        mock_stderr.write.assert_called_once_with("error message\n")
+        self.failUnless(not mock_stdout.write.called)
+
+    def test_run_in_process(self):
+        """test argv is swapped and SystemExit converted"""
+        def command():
+            self.assertEqual(sys.argv, ['bin/womp', '--flag'])
+            sys.exit(2)
+        result = run_in_process(command, ['bin/womp', '--flag'])
+        self.assertEqual(result, 2)
+        self.assertEqual(sys.argv, ['cirrus'])
+
+    @mock.patch('cirrus.delegate.run_command')
+    def test_main_inprocess(self, mock_run):
+        os.environ['CIRRUS_DISPATCH'] = 'inprocess'
+        sys.argv = ['cirrus', 'hello', 'world']
+        self.assertEqual(main(self.commands), 0)
+        self.failUnless(self.command.called)
+        self.failUnless(not mock_run.called)
+
+    @mock.patch('cirrus.delegate.run_command')
+    @mock.patch('cirrus.delegate.os.path.exists')
+    def test_main_subprocess(self, mock_exists, mock_run):
+        mock_exists.return_value = True
+        mock_run.return_value = 0
+        sys.argv = ['cirrus', 'hello', 'world']
+        self.assertEqual(main(self.commands), 0)
+        self.failUnless(not self.command.called)
+        mock_run.assert_has_calls([
+            mock.call(['/nonexistent/venv/bin/hello', 'world'])
+        ])
+
+    def test_main_unknown_command(self):
+        os.environ['CIRRUS_DISPATCH'] = 'inprocess'
+        sys.argv = ['cirrus', 'womp']
+        self.assertEqual(main(self.commands), 127)
+
+    @mock.patch('cirrus.delegate.run_command')
+    @mock.patch('cirrus.delegate.os.path.exists')
+    def test_main_bad_mode(self, mock_exists, mock_run):
+        """unknown modes warn and run as a subprocess"""
+        mock_exists.return_value = True
+        mock_run.return_value = 0
+        os.environ['CIRRUS_DISPATCH'] = 'womp'
+        sys.argv = ['cirrus', 'hello', 'world']
+        with mock.patch.object(sys, 'stderr') as mock_stderr:
+            self.assertEqual(main(self.commands), 0)
+        self.failUnless('womp' in mock_stderr.write.call_args[0][0])
+        self.failUnless(not self.command.called)
+        self.failUnless(mock_run.called)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -50,13 +50,13 @@ class TestDocumentationUtils(unittest.TestCase):
 
     def test_build_docs(self):
         """test build_docs()"""
-        os.getcwd = mock.Mock(return_value='')
-        build_docs(make_opts=[])
-        self.assertTrue(self.mock_local.called_once_with(
-            '. ./venv/bin/activate && cd {} && make clean html'.format(self.makefile_dir)
-        ))
+        with mock.patch('os.getcwd', mock.Mock(return_value='')):
+            build_docs(make_opts=[])
+            self.assertTrue(self.mock_local.called_once_with(
+                '. ./venv/bin/activate && cd {} && make clean html'.format(self.makefile_dir)
+            ))
 
-        build_docs(make_opts=['man'])
+            build_docs(make_opts=['man'])
         self.assertTrue(self.mock_local.called_once_with(
             '. ./venv/bin/activate && cd {} && make man'.format(self.makefile_dir)
         ))
@@ -12,6 +12,8 @@ import tempfile
 
 from cirrus.environment import cirrus_home
 from cirrus.environment import virtualenv_home
+from cirrus.environment import git_environment
+from cirrus.environment import invalidate_git_environment
 
 
 class EnvironmentFunctionTests(unittest.TestCase):
@@ -119,5 +121,49 @@ class CleanEnvironmentTests(unittest.TestCase):
         self.failUnless(mock_env.__setitem__.called)
 
 
+class GitEnvironmentTests(unittest.TestCase):
+    """
+    test cached git environment discovery
+    """
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.dir = os.path.realpath(tempfile.mkdtemp())
+        os.chdir(self.dir)
+        os.system(
+            'git init -q . && git symbolic-ref HEAD refs/heads/main && '
+            'git config user.email a@b.c && git config user.name test'
+        )
+        invalidate_git_environment()
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        invalidate_git_environment()
+        if os.path.exists(self.dir):
+            os.system('rm -rf {}'.format(self.dir))
+
+    def test_git_environment(self):
+        env = git_environment()
+        self.assertEqual(env['repo_dir'], self.dir)
+        self.assertEqual(env['git_dir'], os.path.join(self.dir, '.git'))
+        self.assertEqual(env['branch'], None)
+
+        invalidate_git_environment()
+        os.system('git commit -q --allow-empty -m "first"')
+        env = git_environment()
+        self.assertEqual(env['branch'], 'main')
+
+        with mock.patch('cirrus.environment.subprocess.Popen') as mock_pop:
+            self.assertEqual(git_environment(), env)
+            self.failUnless(not mock_pop.called)
+
+        os.system('git checkout -q -b develop')
+        invalidate_git_environment()
+        self.assertEqual(git_environment()['branch'], 'develop')
+
+    def test_not_a_repo(self):
+        os.system('rm -rf .git')
+        self.assertEqual(git_environment(), None)
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,58 @@
+#!/usr/bin/env python
+"""
+tests for fabric_helpers module
+"""
+import sys
+import types
+import mock
+import unittest
+
+from cirrus.lazy_import import lazy_attribute, lazy_import
+
+
+class FakeEnv(object):
+    """stand in for fabric.api.env"""
+    host_string = None
+    user = None
+    key_filename = None
+
+
+class FabricHelperTests(unittest.TestCase):
+    """settings reach the real fabric env"""
+    def setUp(self):
+        self.api = types.ModuleType('fabric.api')
+        self.api.env = FakeEnv()
+        self.fabric = types.ModuleType('fabric')
+        self.fabric.api = self.api
+        self.patch_modules = mock.patch.dict(
+            sys.modules, {'fabric': self.fabric, 'fabric.api': self.api}
+        )
+        self.patch_modules.start()
+        self.patch_api = mock.patch(
+            'cirrus.fabric_helpers.fabric_api', lazy_import('fabric.api')
+        )
+        self.patch_api.start()
+
+    def tearDown(self):
+        self.patch_api.stop()
+        self.patch_modules.stop()
+
+    def test_fabric_helper(self):
+        from cirrus.fabric_helpers import FabricHelper
+        with FabricHelper('HOST', 'USER', 'KEY'):
+            self.assertEqual(self.api.env.host_string, 'HOST')
+            self.assertEqual(self.api.env.user, 'USER')
+            self.assertEqual(self.api.env.key_filename, 'KEY')
+        self.assertEqual(self.api.env.host_string, None)
+        self.assertEqual(self.api.env.user, None)
+        self.assertEqual(self.api.env.key_filename, None)
+
+    def test_lazy_attribute_set(self):
+        """sets on a lazy attribute proxy go to the real object"""
+        env = lazy_attribute('fabric.api', 'env')
+        env.host_string = 'HOST'
+        self.assertEqual(self.api.env.host_string, 'HOST')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,22 +1,41 @@
 '''
 tests for git_tools
 '''
+import io
+import os
 import mock
+import shutil
 import unittest
+import tempfile
+
+from git.exc import GitCommandError
 
 from cirrus.git_tools import branch
+from cirrus.git_tools import fetch_branches
+from cirrus.git_tools import invalidate_fetched
+from cirrus.git_tools import push_refs
+from cirrus.git_tools import publish_commits
 from cirrus.git_tools import checkout_and_pull
 from cirrus.git_tools import get_active_branch
 from cirrus.git_tools import get_diff_files
 from cirrus.git_tools import merge
+from cirrus.git_tools import merged_refs
 from cirrus.git_tools import push
 from cirrus.git_tools import build_release_notes
 from cirrus.git_tools import format_commit_messages
 from cirrus.git_tools import get_commit_msgs
 from cirrus.git_tools import get_tags
+from cirrus.git_tools import group_by_author
 from cirrus.git_tools import get_tags_with_sha
+from cirrus.git_tools import invalidate_tag_index
+from cirrus.git_tools import tag_index
+from cirrus.git_tools import _tag_refs_stamp
 from cirrus.git_tools import markdown_format
 from cirrus.git_tools import RepoInitializer
+from cirrus.git_tools import ReleaseIndex
+from cirrus.git_tools import release_index
+from cirrus.git_tools import get_repo
+from cirrus.git_tools import close_repos
 
 
 class GitToolsTest(unittest.TestCase):
@@ -49,10 +68,18 @@ class GitToolsTest(unittest.TestCase):
         self.mock_repo.remotes.origin.push.side_effect = lambda x: [
             self.mock_ret]
         self.mock_repo.tags = self.mock_tags
+        self.mock_repo.common_dir = '/nonexistent/.git'
+        self.tag_refs = (
+            b'refs/tags/banana\x1fBANANA_SHA\x1f\x1f1438210002\x1f\n'
+            b'refs/tags/apple\x1fAPPLE_SHA\x1f\x1f1438210001\x1f\n'
+            b'refs/tags/orange\x1fORANGE_SHA\x1f\x1f1438210003\x1f\n'
+        )
+        self.mock_repo.git_dir = '/nonexistent/.git'
         self.patch_git = mock.patch('cirrus.git_tools.git')
         self.mock_git = self.patch_git.start()
         self.mock_git.Repo = mock.Mock()
         self.mock_git.Repo.return_value = self.mock_repo
+        self.mock_git.exc.GitCommandError = GitCommandError
         self.release = '0.0.0'
         self.commit_info = [
             {
@@ -67,6 +94,8 @@ class GitToolsTest(unittest.TestCase):
 
     def tearDown(self):
         self.patch_git.stop()
+        invalidate_tag_index()
+        invalidate_fetched()
 
     def test_checkout_and_pull(self):
         """
@@ -85,12 +114,19 @@ class GitToolsTest(unittest.TestCase):
 
         self.mock_repo.remotes = Remotes(mock_remote)
         self.mock_repo.git = mock.Mock()
-        self.mock_repo.git.branch = mock.Mock(
-            return_value="develop master remotes/origin/master remotes/origin/develop"
-        )
         checkout_and_pull(None, 'master')
         self.failUnless(self.mock_git.Repo.called)
-        self.failUnless(mock_remote.pull.called)
+        self.mock_repo.git.fetch.assert_called_once_with(
+            'origin', '+refs/heads/master:refs/remotes/origin/master'
+        )
+        self.mock_repo.git.merge.assert_called_once_with(
+            '--no-edit', 'refs/remotes/origin/master'
+        )
+        # already fetched, no second round trip
+        checkout_and_pull(None, 'master')
+        self.assertEqual(self.mock_repo.git.fetch.call_count, 1)
+        self.assertEqual(self.mock_repo.git.merge.call_count, 2)
+        self.failUnless(not mock_remote.pull.called)
 
     def test_checkout_and_pull_no_remote(self):
         """
@@ -109,13 +145,76 @@ class GitToolsTest(unittest.TestCase):
 
         self.mock_repo.remotes = Remotes(mock_remote)
         self.mock_repo.git = mock.Mock()
-        self.mock_repo.git.branch = mock.Mock(
-            return_value="develop master remotes/origin/develop"
+        self.mock_repo.git.fetch.side_effect = GitCommandError(
+            'fetch', 128, "fatal: couldn't find remote ref refs/heads/master"
         )
+        self.mock_repo.git.ls_remote.return_value = ""
         checkout_and_pull(None, 'master')
         self.failUnless(self.mock_git.Repo.called)
+        self.failUnless(not self.mock_repo.git.merge.called)
         self.failUnless(not mock_remote.pull.called)
 
+    def test_fetch_branches(self):
+        """one fetch for all branches, missing ones found via ls-remote"""
+        self.mock_repo.git.fetch.side_effect = [
+            GitCommandError('fetch', 128, "couldn't find remote ref"),
+            None
+        ]
+        self.mock_repo.git.ls_remote.return_value = (
+            "SHA1\trefs/heads/master\n"
+        )
+        result = fetch_branches(self.mock_repo, ['master', 'develop'])
+        self.assertEqual(result, {'master': True, 'develop': False})
+        self.mock_repo.git.fetch.assert_has_calls([
+            mock.call(
+                'origin',
+                '+refs/heads/master:refs/remotes/origin/master',
+                '+refs/heads/develop:refs/remotes/origin/develop'
+            ),
+            mock.call(
+                'origin', '+refs/heads/master:refs/remotes/origin/master'
+            ),
+        ])
+        self.assertEqual(
+            fetch_branches(self.mock_repo, ['develop']), {'develop': False}
+        )
+        self.assertEqual(self.mock_repo.git.fetch.call_count, 2)
+
+    def test_push_refs(self):
+        """single atomic push with fallback"""
+        push_refs(self.mock_repo, ['master', 'refs/tags/1.0.0'])
+        self.mock_repo.git.push.assert_called_once_with(
+            '--atomic', '--porcelain', 'origin', 'master', 'refs/tags/1.0.0'
+        )
+        self.mock_repo.git.push.reset_mock()
+        self.mock_repo.git.push.side_effect = [
+            GitCommandError('push', 128, 'the receiving end does not support --atomic push'),
+            None
+        ]
+        push_refs(self.mock_repo, ['master'])
+        self.mock_repo.git.push.assert_called_with('--porcelain', 'origin', 'master')
+
+        self.mock_repo.git.push.side_effect = GitCommandError('push', 1, 'rejected')
+        self.assertRaises(RuntimeError, push_refs, self.mock_repo, ['master'])
+
+    def test_publish_commits(self):
+        """only commits the remote doesnt have are pushed"""
+        self.mock_repo.git.rev_list.return_value = "bbb\nccc\n"
+        refs = publish_commits(self.mock_repo, ['aaa', 'bbb'])
+        self.mock_repo.git.rev_list.assert_called_once_with(
+            'aaa', 'bbb', '--not', '--remotes=origin'
+        )
+        self.mock_repo.git.push.assert_called_once_with(
+            '--atomic', '--porcelain', 'origin',
+            'bbb:refs/cirrus/status/bbb'
+        )
+        self.assertEqual(refs, ['refs/cirrus/status/bbb'])
+
+        self.mock_repo.git.push.reset_mock()
+        self.mock_repo.git.rev_list.return_value = ""
+        self.assertEqual(publish_commits(self.mock_repo, ['aaa']), [])
+        self.failIf(self.mock_repo.git.push.called)
+
     def test_branch(self):
         """
         _test_branch_
@@ -205,34 +304,138 @@ class GitToolsTest(unittest.TestCase):
         msg = markdown_format(self.commit_info)
         print("Markdown release notes:\n{0}\n".format(msg))
 
+    def _mock_log(self, output, returncode=0, error=b''):
+        process = mock.Mock()
+        process.stdout = io.BytesIO(output)
+        process.stderr = io.BytesIO(error)
+        process.wait.return_value = returncode
+        process.poll.return_value = returncode
+        return mock.patch(
+            'cirrus.git_tools.subprocess.Popen', return_value=process
+        )
+
     def test_get_commit_msgs(self):
         """
         _test_get_commit_msgs_
         """
-        result = get_commit_msgs(None, 'RANDOM_SHA')
-        self.failUnless('committer' in result[0])
-        self.failUnless('message' in result[0])
-        self.failUnless('date' in result[0])
-        self.failUnless('committer' in result[1])
-        self.failUnless('message' in result[1])
-        self.failUnless('date' in result[1])
+        output = (
+            b'bob\x1f1438210783\x1fI made a commit!\n\x00'
+            b'tom\x1f1438150783\x1ftoms commit\n\nwith body\n\x00'
+        )
+        with self._mock_log(output) as mock_popen:
+            result = get_commit_msgs(None, 'RANDOM_SHA')
+        command = mock_popen.call_args[0][0]
+        self.assertEqual(command[:3], ['git', 'log', '-z'])
+        self.assertEqual(command[-1], 'RANDOM_SHA..HEAD')
+        self.assertEqual(len(result), 2)
+        self.assertEqual(
+            result[0],
+            {
+                'committer': 'bob',
+                'message': 'I made a commit!\n',
+                'date': '2015-07-29T22:59:43+00:00'
+            }
+        )
+        self.assertEqual(result[1]['committer'], 'tom')
+        self.assertEqual(result[1]['message'], 'toms commit\n\nwith body\n')
+
+    def test_get_commit_msgs_error(self):
+        """git log failures raise"""
+        with self._mock_log(b'', 128, b'fatal: bad revision'):
+            with mock.patch('cirrus.git_tools.LOGGER') as mock_logger:
+                self.assertRaises(
+                    RuntimeError, get_commit_msgs, None, 'RANDOM_SHA'
+                )
+        self.failUnless(mock_logger.error.called)
+
+    def test_merged_refs_missing_commit(self):
+        """a missing commit is expected, logged at debug only"""
+        with self._mock_log(b'', 129, b'error: malformed object name'):
+            with mock.patch('cirrus.git_tools.LOGGER') as mock_logger:
+                self.assertEqual(merged_refs(None, 'develop'), set())
+        self.failUnless(mock_logger.debug.called)
+        self.failUnless(not mock_logger.error.called)
+
+    def test_group_by_author(self):
+        """non adjacent commits by an author are grouped together"""
+        rows = [
+            {'committer': 'bob', 'message': 'one', 'date': '3'},
+            {'committer': 'tom', 'message': 'two', 'date': '2'},
+            {'committer': 'bob', 'message': 'three', 'date': '1'},
+        ]
+        groups = group_by_author(rows)
+        self.assertEqual(list(groups), ['bob', 'tom'])
+        self.assertEqual(
+            [c['message'] for c in groups['bob']], ['one', 'three']
+        )
+        msg = format_commit_messages(rows)
+        self.assertEqual(msg.count('Author: bob'), 1)
+        msg = markdown_format(rows)
+        self.assertEqual(msg.count('Author: bob'), 1)
 
     def test_get_tags(self):
         """
         _test_get_tags_
         """
-        result = get_tags(None)
+        with self._mock_log(self.tag_refs):
+            result = get_tags(None)
         self.failUnlessEqual(result, ['orange', 'banana', 'apple'])
 
     def test_get_tags_with_sha(self):
         """
         _test_get_tags_with_sha_
         """
-        result = get_tags_with_sha(None)
+        with self._mock_log(self.tag_refs):
+            result = get_tags_with_sha(None)
         self.assertEqual(result['orange'], 'ORANGE_SHA')
         self.assertEqual(result['apple'], 'APPLE_SHA')
         self.assertEqual(result['banana'], 'BANANA_SHA')
 
+    def test_tag_index(self):
+        """
+        _test_tag_index_
+
+        one for-each-ref call, cached until the tag refs change
+        """
+        refs = self.tag_refs + (
+            b'refs/tags/0.9.0\x1fTAG_OBJ\x1fNINE_SHA\x1f1438210009\x1f1438210004\n'
+            b'refs/tags/0.10.0\x1fTEN_SHA\x1f\x1f1438210005\x1f\n'
+        )
+        with self._mock_log(refs) as mock_popen:
+            index = tag_index(None)
+            self.failUnless(tag_index(None) is index)
+        self.assertEqual(mock_popen.call_count, 1)
+        # annotated tags resolve to the commit they point at
+        self.assertEqual(index.sha('0.9.0'), 'NINE_SHA')
+        self.assertEqual(index.dates['0.9.0'], 1438210004)
+        self.failUnless('0.10.0' in index)
+        self.assertEqual(index.by_date('0.'), ['0.10.0', '0.9.0'])
+        self.assertEqual(index.by_version('0.'), ['0.10.0', '0.9.0'])
+        self.assertEqual(
+            index.by_version(reverse=False)[:2], ['0.9.0', '0.10.0']
+        )
+
+        with mock.patch(
+                'cirrus.git_tools._tag_refs_stamp', return_value=(1, 1)):
+            with self._mock_log(self.tag_refs) as mock_popen:
+                self.assertEqual(len(tag_index(None)), 3)
+        self.assertEqual(mock_popen.call_count, 1)
+
+    def test_tag_refs_stamp_nested(self):
+        """tags in refs/tags subdirectories change the stamp"""
+        git_dir = tempfile.mkdtemp()
+        try:
+            nested = os.path.join(git_dir, 'refs', 'tags', 'nightly')
+            os.makedirs(nested)
+            stamp = _tag_refs_stamp(git_dir)
+            self.failUnless(any(nested == x[0] for x in stamp[1:]))
+            with open(os.path.join(nested, '1.2.3'), 'w') as handle:
+                handle.write('SHA\n')
+            os.utime(nested, (0, 0))
+            self.assertNotEqual(_tag_refs_stamp(git_dir), stamp)
+        finally:
+            shutil.rmtree(git_dir)
+
 
 class RepoInitializerTest(unittest.TestCase):
     """tests for RepoInitializer"""
@@ -308,5 +511,106 @@ class RepoInitializerTest(unittest.TestCase):
         ])
 
 
+class ReleaseIndexTest(unittest.TestCase):
+    """tests for the release branch index"""
+    def setUp(self):
+        self.index = ReleaseIndex(
+            'release/',
+            [
+                ('refs/heads/develop', 'DEV'),
+                ('refs/heads/release/0.9.0', 'A'),
+                ('refs/remotes/origin/release/0.9.0', 'A'),
+                ('refs/heads/release/0.10.0', 'B'),
+                ('refs/remotes/origin/release/0.11.0', 'C'),
+                ('refs/heads/release/0.8.0', 'D'),
+                ('refs/heads/release/womp', 'E'),
+            ],
+            set([
+                'refs/heads/release/0.8.0',
+                'refs/heads/release/0.9.0',
+            ])
+        )
+
+    def test_unmerged(self):
+        # the remote 0.9.0 branch is not merged
+        self.assertEqual(
+            self.index.unmerged(),
+            ['release/womp', 'release/0.9.0', 'release/0.10.0', 'release/0.11.0']
+        )
+        self.assertEqual(
+            self.index.unmerged(version_only=True)[1:], ['0.9.0', '0.10.0', '0.11.0']
+        )
+        self.failUnless('release/0.8.0' in self.index)
+        self.failUnless('0.8.0' in self.index)
+        self.failUnless(self.index.has_branch('0.11.0', 'origin'))
+        self.failIf(self.index.has_branch('0.11.0'))
+
+    def test_next_free_version(self):
+        def bump(version):
+            major, minor, micro = version.split('.')
+            return '.'.join([major, minor, str(int(micro) + 1)])
+
+        self.assertEqual(self.index.latest('0.1.0'), '0.11.0')
+        self.assertEqual(self.index.next_free_version('0.1.0', bump), '0.11.1')
+        self.assertEqual(self.index.next_free_version('0.12.0', bump), '0.12.1')
+        merged = ReleaseIndex(
+            'release/',
+            [('refs/heads/release/1.0.1', 'A')],
+            set(['refs/heads/release/1.0.1'])
+        )
+        # merged releases still block their version
+        self.assertEqual(merged.next_free_version('1.0.0', bump), '1.0.2')
+
+    def test_release_index(self):
+        output = (
+            b'refs/heads/release/1.0.0\x1fSHA1\n'
+            b'refs/remotes/origin/HEAD\x1fSHA2\n'
+        )
+        merged = b'refs/heads/release/1.0.0\n'
+        processes = []
+        for out in (output, merged):
+            process = mock.Mock()
+            process.stdout = io.BytesIO(out)
+            process.stderr = io.BytesIO(b'')
+            process.wait.return_value = 0
+            processes.append(process)
+        with mock.patch(
+                'cirrus.git_tools.subprocess.Popen',
+                side_effect=processes) as mock_popen:
+            index = release_index(None, 'release/', 'develop')
+        self.assertEqual(mock_popen.call_count, 2)
+        self.failUnless('--merged=develop' in mock_popen.call_args[0][0])
+        self.assertEqual(list(index.releases), ['1.0.0'])
+        self.assertEqual(index.unmerged(), [])
+
+
+class RepoPoolTest(unittest.TestCase):
+    """tests for the shared repo handle pool"""
+    def setUp(self):
+        self.repo_class = mock.Mock(side_effect=lambda path: mock.Mock())
+
+    def tearDown(self):
+        close_repos()
+
+    def test_get_repo(self):
+        repo1 = get_repo('/tmp/repo', self.repo_class)
+        repo2 = get_repo('/tmp/repo/', self.repo_class)
+        repo3 = get_repo('/tmp/other', self.repo_class)
+        self.failUnless(repo1 is repo2)
+        self.failUnless(repo1 is not repo3)
+        self.assertEqual(self.repo_class.call_count, 2)
+
+        close_repos()
+        self.failUnless(repo1.close.called)
+        self.failUnless(repo3.close.called)
+        self.failUnless(get_repo('/tmp/repo', self.repo_class) is not repo1)
+
+    def test_pool_disabled(self):
+        with mock.patch.dict(os.environ, {'CIRRUS_REPO_POOL': 'off'}):
+            repo1 = get_repo('/tmp/repo', self.repo_class)
+            repo2 = get_repo('/tmp/repo', self.repo_class)
+        self.failUnless(repo1 is not repo2)
+
+
 if __name__ == "__main__":
     unittest.main()
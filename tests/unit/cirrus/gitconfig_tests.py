@@ -5,7 +5,9 @@ tests for gitconfig module
 import os
 import tempfile
 import unittest
-from cirrus.gitconfig import load_gitconfig
+import mock
+from cirrus.gitconfig import load_gitconfig, parse_value, format_value
+from cirrus.gitconfig import can_parse_natively
 
 CONFIG1 = \
 """
@@ -32,6 +34,20 @@ CONFIG2 = \
     rebase = true
 """
 
+CONFIG3 = \
+"""
+# user settings
+[Cirrus]
+    credential-plugin = default ; trailing comment
+    github-user = "steve"
+    github-token = "a;b\\"c"
+    flag
+[remote "origin"]
+    url = git@github.com:evansde77/cirrus.git
+[push]
+    default = matching
+"""
+
 
 class GitConfigTests(unittest.TestCase):
 
@@ -63,6 +79,88 @@ class GitConfigTests(unittest.TestCase):
         self.assertTrue('alias' in gc.sections)
 
 
+    def test_native_matches_git(self):
+        """native parser should produce the same map as git config -l"""
+        for filename in (self.file_1, self.file_2):
+            gc = load_gitconfig(filename=filename)
+            native = load_gitconfig(filename=filename, native=True)
+            self.assertEqual(dict(gc), dict(native))
+
+    def test_native_parsing(self):
+        file_3 = os.path.join(self.dir, 'gc3')
+        with open(file_3, 'w') as handle:
+            handle.write(CONFIG3)
+        gc = load_gitconfig(filename=file_3, native=True)
+        self.assertEqual(sorted(gc.sections), ['cirrus', 'push'])
+        self.assertEqual(gc.get_param('cirrus', 'credential-plugin'), 'default')
+        self.assertEqual(gc.get_param('cirrus', 'github-user'), 'steve')
+        self.assertEqual(gc.get_param('cirrus', 'github-token'), 'a;b"c')
+        self.assertTrue('flag' not in gc['cirrus'].keys())
+        self.assertEqual(dict(gc), dict(load_gitconfig(filename=file_3)))
+
+    def test_can_parse_natively(self):
+        self.assertTrue(can_parse_natively(self.file_1))
+        self.assertFalse(can_parse_natively(os.path.join(self.dir, 'nope')))
+        file_4 = os.path.join(self.dir, 'gc4')
+        for include in ('[include]\n\tpath = gc1\n',
+                        '[includeIf "gitdir:~/work/"]\n\tpath = gc1\n'):
+            with open(file_4, 'w') as handle:
+                handle.write(CONFIG1 + include)
+            self.assertFalse(can_parse_natively(file_4))
+
+    def test_value_round_trip(self):
+        for value in ['plain', ' padded ', 'a;b', 'x#y', 'q"uote', 'back\\slash']:
+            self.assertEqual(parse_value(format_value(value)), value)
+
+    @mock.patch('cirrus.gitconfig.shell_command')
+    def test_batch(self, mock_shell):
+        gc = load_gitconfig(filename=self.file_1, native=True)
+        with gc.batch():
+            gc.add_section('cirrus')
+            gc.set_param('cirrus', 'github-user', 'steve')
+            gc.set_param('cirrus', 'github-token', 'a;b')
+            gc.set_param('push', 'default', 'simple')
+            gc.unset_param('alias', 'jira')
+            self.assertEqual(gc.get_param('cirrus', 'github-user'), 'steve')
+            self.assertEqual(len(gc.journal), 5)
+            with open(self.file_1, 'r') as handle:
+                self.assertEqual(handle.read(), CONFIG1)
+        self.assertFalse(mock_shell.called)
+        self.assertEqual(gc.journal, [])
+
+        with open(self.file_1, 'r') as handle:
+            content = handle.read()
+        self.assertTrue('[pull]\n    rebase = true\n' in content)
+        self.assertTrue('/Users/devans/.cirrus/venv/bin/cirrus' in content)
+        written = load_gitconfig(filename=self.file_1, native=True)
+        self.assertEqual(dict(written), dict(gc))
+        self.assertEqual(written.get_param('cirrus', 'github-token'), 'a;b')
+        self.assertEqual(written.get_param('push', 'default'), 'simple')
+        self.assertTrue('jira' not in written['alias'].keys())
+
+    def test_batch_matches_git(self):
+        """flushed file should read back the same through git"""
+        gc = load_gitconfig(filename=self.file_2, native=True)
+        with gc.batch():
+            gc.set_param('cirrus', 'github-token', ' a;b\\"c ')
+            gc.set_param('alias', 'cirrus', '! /opt/cirrus')
+        self.assertEqual(dict(load_gitconfig(filename=self.file_2)), dict(gc))
+
+    def test_batch_error(self):
+        gc = load_gitconfig(filename=self.file_1, native=True)
+        before = dict(gc)
+
+        def bad_batch():
+            with gc.batch():
+                gc.set_param('cirrus', 'github-user', 'steve')
+                gc.unset_param('cirrus', 'nope')
+
+        self.assertRaises(RuntimeError, bad_batch)
+        self.assertEqual(dict(gc), before)
+        self.assertEqual(gc.journal, [])
+        with open(self.file_1, 'r') as handle:
+            self.assertEqual(handle.read(), CONFIG1)
+
 
 if __name__ == '__main__':
     unittest.main()
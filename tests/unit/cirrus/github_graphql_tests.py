@@ -0,0 +1,249 @@
+#!/usr/bin/env python
+"""
+tests for github_graphql module
+"""
+import os
+import re
+import json
+import mock
+import unittest
+
+from cirrus.github_graphql import GraphQLClient
+from cirrus.github_graphql import GraphQLUnavailable
+from cirrus.github_tools import GitHubContext
+
+
+def pr_node(number, sha, state='SUCCESS'):
+    return {
+        'number': number,
+        'title': 'PR {}'.format(number),
+        'url': 'https://github.com/org/repo/pull/{}'.format(number),
+        'state': 'OPEN',
+        'author': {'login': 'user{}'.format(number)},
+        'headRefName': 'feature/{}'.format(number),
+        'headRefOid': sha,
+        'baseRefName': 'develop',
+        'reviewDecision': 'APPROVED',
+        'commits': {'nodes': [{'commit': {'status': {
+            'state': state,
+            'contexts': [
+                {'context': 'ci', 'state': state, 'description': 'ok'}
+            ]
+        }}}]}
+    }
+
+
+class MockGitHubServer(object):
+    """
+    fake requests session serving canned GraphQL pages
+    and REST responses, records requests made
+    """
+    def __init__(self, pages=None, graphql_status=200, rest=None):
+        self.pages = pages or []
+        self.graphql_status = graphql_status
+        self.rest = rest or {}
+        self.requests = []
+
+    def _response(self, status, body):
+        resp = mock.Mock()
+        resp.status_code = status
+        resp.headers = {}
+        resp.links = {}
+        resp.json = mock.Mock(return_value=body)
+        return resp
+
+    def post(self, url, data=None):
+        payload = json.loads(data)
+        self.requests.append(('POST', url, payload['variables']))
+        if self.graphql_status != 200:
+            return self._response(self.graphql_status, {})
+        cursor = payload['variables'].get('cursor')
+        index = 0 if cursor is None else int(cursor)
+        aliases = re.findall(r'pr(\d+): pullRequest', payload['query'])
+        if aliases:
+            nodes = dict(
+                ('pr{0}'.format(n['number']), n)
+                for page in self.pages for n in page
+                if str(n['number']) in aliases
+            )
+            return self._response(200, {'data': {'repository': nodes}})
+        if 'number' in payload['variables']:
+            nodes = [
+                n for page in self.pages for n in page
+                if n['number'] == payload['variables']['number']
+            ]
+            return self._response(
+                200,
+                {'data': {'repository': {'pullRequest': nodes[0]}}}
+            )
+        body = {'data': {'repository': {'pullRequests': {
+            'pageInfo': {
+                'hasNextPage': index + 1 < len(self.pages),
+                'endCursor': str(index + 1)
+            },
+            'nodes': self.pages[index]
+        }}}}
+        return self._response(200, body)
+
+    def get(self, url, params=None, endpoint=None, **kwargs):
+        self.requests.append(('GET', url, params))
+        for suffix, body in self.rest.items():
+            if url.endswith(suffix):
+                return self._response(200, body)
+        return self._response(404, {})
+
+
+class GraphQLClientTests(unittest.TestCase):
+    """tests for the GraphQL client"""
+
+    def test_pull_requests(self):
+        server = MockGitHubServer(pages=[
+            [pr_node(1, 'SHA1'), pr_node(2, 'SHA2', 'PENDING')],
+            [pr_node(3, 'SHA3')],
+        ])
+        client = GraphQLClient(server)
+        prs = list(client.pull_requests('org', 'repo'))
+        self.assertEqual([x['number'] for x in prs], [1, 2, 3])
+        self.assertEqual(len(server.requests), 2)
+        self.assertEqual(server.requests[1][2]['cursor'], '1')
+        pr = prs[1]
+        self.assertEqual(pr['head']['sha'], 'SHA2')
+        self.assertEqual(pr['user']['login'], 'user2')
+        self.assertEqual(pr['combined_status']['state'], 'pending')
+        self.assertEqual(pr['review_decision'], 'APPROVED')
+        self.assertEqual(
+            pr['statuses_url'],
+            'https://api.github.com/repos/org/repo/statuses/SHA2'
+        )
+        self.assertEqual(
+            pr['issue_url'],
+            'https://api.github.com/repos/org/repo/issues/2'
+        )
+
+    def test_pull_request(self):
+        server = MockGitHubServer(pages=[[pr_node(1, 'SHA1')]])
+        pr = GraphQLClient(server).pull_request('org', 'repo', '1')
+        self.assertEqual(pr['head']['sha'], 'SHA1')
+
+    def test_pull_requests_by_number(self):
+        server = MockGitHubServer(pages=[
+            [pr_node(1, 'SHA1'), pr_node(2, 'SHA2'), pr_node(3, 'SHA3')]
+        ])
+        prs = GraphQLClient(server).pull_requests_by_number(
+            'org', 'repo', [3, 1]
+        )
+        self.assertEqual(sorted(prs), [1, 3])
+        self.assertEqual(prs[3]['head']['sha'], 'SHA3')
+        self.assertEqual(len(server.requests), 1)
+        self.assertRaises(
+            RuntimeError,
+            GraphQLClient(server).pull_requests_by_number, 'org', 'repo', [4]
+        )
+
+    def test_unavailable(self):
+        server = MockGitHubServer(graphql_status=404)
+        client = GraphQLClient(server)
+        self.assertRaises(
+            GraphQLUnavailable, list, client.pull_requests('org', 'repo')
+        )
+        server = mock.Mock()
+        server.post.return_value.status_code = 200
+        server.post.return_value.json.return_value = {
+            'errors': [{'message': 'nope'}]
+        }
+        self.assertRaises(
+            GraphQLUnavailable, GraphQLClient(server).pull_request, 'o', 'r', 1
+        )
+        with mock.patch.dict(os.environ, {'CIRRUS_GITHUB_GRAPHQL': 'off'}):
+            server = MockGitHubServer(pages=[[pr_node(1, 'SHA1')]])
+            self.assertRaises(
+                GraphQLUnavailable,
+                GraphQLClient(server).pull_request, 'o', 'r', 1
+            )
+            self.assertEqual(server.requests, [])
+
+
+class PullRequestSummaryTests(unittest.TestCase):
+    """tests for GitHubContext batch PR summaries"""
+    def setUp(self):
+        self.patch_environ = mock.patch.dict(
+            os.environ, {'HOME': 'unittest', 'USER': 'steve'}
+        )
+        self.patch_environ.start()
+        self.patch_gitconfig = mock.patch('cirrus.gitconfig.shell_command')
+        self.mock_gitconfig = self.patch_gitconfig.start()
+        self.mock_gitconfig.return_value = "cirrus.credential-plugin=default"
+        self.patch_git = mock.patch('cirrus.github_tools.git')
+        self.patch_git.start()
+
+    def tearDown(self):
+        self.patch_git.stop()
+        self.patch_gitconfig.stop()
+        self.patch_environ.stop()
+
+    def test_graphql_summaries(self):
+        ghc = GitHubContext('REPO')
+        ghc.session = MockGitHubServer(pages=[
+            [pr_node(1, 'SHA1'), pr_node(2, 'SHA2', 'FAILURE')]
+        ])
+        prs = ghc.pull_request_summaries(user='user2')
+        self.assertEqual(len(prs), 1)
+        self.assertEqual(prs[0]['combined_status']['state'], 'failure')
+        self.assertEqual(len(ghc.session.requests), 1)
+
+    def test_rest_fallback(self):
+        rest_pr = {
+            'number': 1, 'title': 'PR 1',
+            'user': {'login': 'user1'},
+            'head': {'ref': 'feature/1', 'sha': 'SHA1'},
+            'statuses_url': 'STATUSES', 'issue_url': 'ISSUE'
+        }
+        ghc = GitHubContext('REPO')
+        ghc.session = MockGitHubServer(
+            graphql_status=502,
+            rest={
+                '/pulls': [rest_pr],
+                '/commits/SHA1/status': {
+                    'state': 'success',
+                    'statuses': [{'context': 'ci', 'state': 'success'}]
+                },
+            }
+        )
+        prs = ghc.pull_request_summaries()
+        self.assertEqual(len(prs), 1)
+        self.assertEqual(prs[0]['combined_status']['state'], 'success')
+        self.assertEqual(prs[0]['review_decision'], None)
+        self.assertEqual(
+            [x[0] for x in ghc.session.requests], ['POST', 'GET', 'GET']
+        )
+
+
+    def test_by_number(self):
+        """only the requested PRs are fetched"""
+        ghc = GitHubContext('REPO')
+        ghc.session = MockGitHubServer(pages=[
+            [pr_node(1, 'SHA1'), pr_node(2, 'SHA2'), pr_node(3, 'SHA3')]
+        ])
+        prs = ghc.pull_requests_by_number([1, 3])
+        self.assertEqual(sorted(prs), [1, 3])
+        self.assertEqual(len(ghc.session.requests), 1)
+
+        ghc.session = MockGitHubServer(
+            graphql_status=502,
+            rest={
+                '/pulls/1': {'number': 1, 'head': {'sha': 'SHA1'}},
+                '/pulls/3': {'number': 3, 'head': {'sha': 'SHA3'}},
+            }
+        )
+        prs = ghc.pull_requests_by_number([1, 3], status=False)
+        self.assertEqual(prs[3]['head']['sha'], 'SHA3')
+        # one details call per requested PR, no status calls
+        self.assertEqual(
+            [(x[0], x[1].rsplit('/', 2)[1:]) for x in ghc.session.requests],
+            [('POST', ['api.github.com', 'graphql']),
+             ('GET', ['pulls', '1']), ('GET', ['pulls', '3'])]
+        )
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -11,6 +11,9 @@ from cirrus.github_tools import create_pull_request
 from cirrus.github_tools import current_branch_mark_status
 from cirrus.github_tools import get_releases
 from cirrus.github_tools import GitHubContext
+from cirrus.github_tools import backoff_delay, rate_limit_delay
+from cirrus.github_tools import paginate
+from cirrus.github_tools import PushCoordinator
 from git.exc import GitCommandError
 from .harnesses import _repo_directory
 
@@ -106,8 +109,9 @@ class GithubToolsTest(unittest.TestCase):
 
     @mock.patch('cirrus.github_tools.load_configuration')
     @mock.patch("cirrus.github_tools.requests.post")
-    @mock.patch("cirrus.github_tools.push")
-    def test_current_branch_mark_status(self, mock_push, mock_post, mock_config_load):
+    @mock.patch("cirrus.github_tools.unpublish_commits")
+    @mock.patch("cirrus.github_tools.publish_commits")
+    def test_current_branch_mark_status(self, mock_publish, mock_unpublish, mock_post, mock_config_load):
         """
         _test_current_branch_mark_status_
 
@@ -125,9 +129,62 @@ class GithubToolsTest(unittest.TestCase):
         mock_config_load.organisation_name.return_value = self.owner
         mock_config_load.package_name.return_value = self.repo
 
+        mock_publish.return_value = ['refs/cirrus/status/abc']
+
         current_branch_mark_status(_repo_directory(), "success")
 
         self.failUnless(mock_post.called)
+        self.failUnless(mock_publish.called)
+        self.assertEqual(
+            mock_unpublish.call_args[0][1], ['refs/cirrus/status/abc']
+        )
+
+    @mock.patch('cirrus.github_tools.git')
+    @mock.patch("cirrus.github_tools.unpublish_commits")
+    @mock.patch("cirrus.github_tools.publish_commits")
+    def test_set_commit_states(self, mock_publish, mock_unpublish, mock_git):
+        """commits published once, one status POST per context"""
+        mock_repo = mock.Mock()
+        mock_git.Repo = mock.Mock(return_value=mock_repo)
+        mock_repo.commit = mock.Mock(
+            side_effect=lambda ref: mock.Mock(hexsha='sha-' + ref)
+        )
+        mock_publish.return_value = ['refs/cirrus/status/sha-master']
+        ghc = GitHubContext('REPO')
+        ghc.config = mock.Mock()
+        ghc.config.organisation_name.return_value = self.owner
+        ghc.config.package_name.return_value = self.repo
+        ghc.session = mock.Mock()
+
+        ghc.set_commit_states(
+            'success',
+            [('master', 'ci/a'), ('master', 'ci/b'), ('develop', 'ci/a')]
+        )
+        mock_publish.assert_called_once_with(
+            mock_repo, ['sha-master', 'sha-develop']
+        )
+        mock_unpublish.assert_called_once_with(
+            mock_repo, ['refs/cirrus/status/sha-master']
+        )
+        posted = sorted(
+            (c[0][0].rsplit('/', 1)[1], json.loads(c[1]['data'])['context'])
+            for c in ghc.session.post.call_args_list
+        )
+        self.assertEqual(
+            posted,
+            [
+                ('sha-develop', 'ci/a'),
+                ('sha-master', 'ci/a'),
+                ('sha-master', 'ci/b')
+            ]
+        )
+
+        # set_branch_state uses the named branch, not HEAD
+        ghc.session.post.reset_mock()
+        ghc.set_branch_state('success', 'ci/a', branch='develop')
+        self.failUnless(
+            ghc.session.post.call_args[0][0].endswith('/statuses/sha-develop')
+        )
 
     @mock.patch('cirrus.github_tools.git')
     def test_push_branch(self, mock_git):
@@ -154,6 +211,26 @@ class GithubToolsTest(unittest.TestCase):
         mock_repo.remotes.origin.push = mock.Mock(side_effect=GitCommandError('A', 128))
         self.assertRaises(RuntimeError, ghc.push_branch, 'womp2')
 
+    @mock.patch('cirrus.github_tools.git')
+    @mock.patch('cirrus.github_tools.merge_tracking_branch')
+    def test_pull_branch(self, mock_merge, mock_git):
+        """a branch missing on origin is an error, not a silent no-op"""
+        mock_repo = mock.Mock()
+        mock_git.Repo = mock.Mock(return_value=mock_repo)
+        ghc = GitHubContext('REPO')
+        ghc.fetch_branches = mock.Mock(return_value={'develop': True})
+        self.assertEqual(ghc.pull_branch('develop'), mock_merge.return_value)
+        mock_repo.git.checkout.assert_called_once_with('develop')
+        mock_merge.assert_called_once_with(mock_repo, 'develop')
+
+        ghc.fetch_branches.return_value = {'develop': False}
+        self.assertRaises(RuntimeError, ghc.pull_branch, 'develop')
+        self.assertEqual(mock_merge.call_count, 1)
+
+        # local only pulls dont touch origin
+        ghc.pull_branch('develop', remote=False)
+        self.assertEqual(ghc.fetch_branches.call_count, 2)
+
     @mock.patch('cirrus.github_tools.git')
     @mock.patch('cirrus.github_tools.time.sleep')
     def test_push_branch_with_retry(self, mock_sleep, mock_git):
@@ -184,6 +261,75 @@ class GithubToolsTest(unittest.TestCase):
         mock_repo.remotes.origin.push = mock.Mock(side_effect=GitCommandError('B', 128))
         self.assertRaises(RuntimeError, ghc.push_branch_with_retry, 'womp', attempts=3, cooloff=2)
 
+    @mock.patch('cirrus.github_tools.git')
+    @mock.patch('cirrus.github_tools.time.sleep')
+    def test_push_refs_with_retry(self, mock_sleep, mock_git):
+        """branches and tags pushed together, whole push retried"""
+        mock_repo = mock.Mock()
+        mock_git.Repo = mock.Mock(return_value=mock_repo)
+        mock_repo.git.push = mock.Mock(
+            side_effect=[GitCommandError('push', 1, 'rejected'), None]
+        )
+        refs = ['master', 'develop', 'refs/tags/1.2.3']
+        ghc = GitHubContext('REPO')
+        ghc.push_refs_with_retry(refs, attempts=3, cooloff=0)
+        self.assertEqual(mock_repo.git.push.call_count, 2)
+        mock_repo.git.push.assert_called_with(
+            '--atomic', '--porcelain', 'origin', *refs
+        )
+
+        mock_repo.git.push = mock.Mock(
+            side_effect=GitCommandError('push', 1, 'rejected')
+        )
+        self.assertRaises(
+            RuntimeError, ghc.push_refs_with_retry, refs, attempts=2, cooloff=0
+        )
+
+    @mock.patch('cirrus.github_tools.random.uniform', new=lambda low, high: high)
+    @mock.patch('cirrus.github_tools.time')
+    def test_push_coordinator(self, mock_time):
+        """backoff between attempts, latency recorded per attempt"""
+        clock = [100.0]
+        mock_time.time = mock.Mock(side_effect=lambda: clock[0])
+
+        def sleep(seconds):
+            clock[0] += seconds
+        mock_time.sleep = mock.Mock(side_effect=sleep)
+        push = mock.Mock(side_effect=[RuntimeError('a'), RuntimeError('b'), 'ok'])
+        coord = PushCoordinator(
+            'master', push, attempts=5, interval=1, max_interval=30
+        )
+        self.assertEqual(coord.run(), 'ok')
+        self.assertEqual(push.call_count, 3)
+        self.assertEqual(
+            [c[0][0] for c in mock_time.sleep.call_args_list], [1, 2]
+        )
+        self.assertEqual([h[0] for h in coord.history], [1, 2, 3])
+        self.assertEqual(coord.history[-1][2], None)
+        self.assertEqual(len(coord.report()), 3)
+
+    @mock.patch('cirrus.github_tools.random.uniform', new=lambda low, high: high)
+    @mock.patch('cirrus.github_tools.time')
+    def test_push_coordinator_deadline(self, mock_time):
+        """retries stop once the total deadline has passed"""
+        clock = [0.0]
+        mock_time.time = mock.Mock(side_effect=lambda: clock[0])
+
+        def sleep(seconds):
+            clock[0] += seconds
+        mock_time.sleep = mock.Mock(side_effect=sleep)
+        push = mock.Mock(side_effect=RuntimeError('rejected'))
+        coord = PushCoordinator(
+            'master', push, attempts=100, interval=4, max_interval=60,
+            deadline=10
+        )
+        self.assertRaises(RuntimeError, coord.run)
+        # sleeps of 4 then 6 (clipped to the deadline)
+        self.assertEqual(push.call_count, 3)
+        self.assertEqual(
+            [c[0][0] for c in mock_time.sleep.call_args_list], [4, 6]
+        )
+
     @mock.patch('cirrus.github_tools.git')
     def test_tag_release(self, mock_git):
         """test tag_release call"""
@@ -212,8 +358,8 @@ class GithubToolsTest(unittest.TestCase):
         self.failUnless(mock_repo.remotes.origin.push.called)
 
     @mock.patch('cirrus.github_tools.git')
-    @mock.patch('cirrus.github_tools.time')
-    def test_tag_release_retry(self, mock_time, mock_git):
+    @mock.patch('cirrus.github_tools.time.sleep')
+    def test_tag_release_retry(self, mock_sleep, mock_git):
         """test repeated tries to push tags"""
         mock_repo = mock.Mock()
         mock_repo.active_branch = mock.Mock()
@@ -234,7 +380,6 @@ class GithubToolsTest(unittest.TestCase):
         mock_repo.remotes.origin.push = mock.Mock(
             side_effect=RuntimeError("push it real good")
         )
-        mock_time.sleep = mock.Mock()
 
         ghc = GitHubContext('REPO')
         self.assertRaises(
@@ -247,7 +392,8 @@ class GithubToolsTest(unittest.TestCase):
             cooloff=0
         )
         self.assertEqual(mock_repo.remotes.origin.push.call_count, 5)
-        self.assertEqual(mock_time.sleep.call_count, 5)
+        # no sleep after the final attempt
+        self.assertEqual(mock_sleep.call_count, 4)
         self.failUnless(mock_repo.create_tag.called)
 
     @mock.patch('cirrus.github_tools.git')
@@ -277,6 +423,197 @@ class GithubToolsTest(unittest.TestCase):
         ghc = GitHubContext('REPO')
         self.assertRaises(GitCommandError, ghc.merge_branch, 'develop')
 
+    @mock.patch('cirrus.github_tools.git')
+    def test_delete_branch_missing_remote(self, mock_git):
+        """a branch already gone from origin isnt an error"""
+        mock_repo = mock.Mock()
+        mock_repo.active_branch.name = 'develop'
+        mock_repo.git.push = mock.Mock(side_effect=GitCommandError(
+            ['git', 'push'], 1,
+            "error: unable to delete 'release/1.2.3': remote ref does not exist"
+        ))
+        mock_git.Repo = mock.Mock(return_value=mock_repo)
+        ghc = GitHubContext('REPO')
+        ghc.delete_branch('release/1.2.3', True)
+        mock_repo.git.branch.assert_called_once_with('-D', 'release/1.2.3')
+        mock_repo.git.push.assert_called_once_with(
+            'origin', '--delete', 'release/1.2.3'
+        )
+
+        mock_repo.git.push.side_effect = GitCommandError(
+            ['git', 'push'], 128, 'fatal: unable to access origin'
+        )
+        self.assertRaises(
+            GitCommandError, ghc.delete_branch, 'release/1.2.3', True
+        )
+
+    @mock.patch('cirrus.github_tools.git')
+    @mock.patch('cirrus.github_tools.release_index')
+    def test_unmerged_releases_prunes(self, mock_index, mock_git):
+        """stale remote tracking branches are pruned first"""
+        mock_repo = mock.Mock()
+        mock_repo.git.remote = mock.Mock(side_effect=GitCommandError(
+            ['git', 'remote'], 128, 'offline'
+        ))
+        mock_git.Repo = mock.Mock(return_value=mock_repo)
+        mock_index.return_value.unmerged.return_value = ['1.2.3']
+        ghc = GitHubContext('REPO')
+        ghc.config = mock.Mock()
+        self.assertEqual(ghc.unmerged_releases(True), ['1.2.3'])
+        mock_repo.git.remote.assert_called_once_with('prune', 'origin')
+
+    @mock.patch('cirrus.github_tools.git')
+    @mock.patch('cirrus.github_tools.time.sleep')
+    def test_wait_on_gh_statuses(self, mock_sleep, mock_git):
+        """test polling several shas from one loop"""
+        def status(state, headers=None):
+            resp = mock.Mock()
+            resp.status_code = 200
+            resp.headers = headers or {}
+            resp.json = mock.Mock(return_value={'state': state})
+            return resp
+
+        def limited(wait):
+            resp = mock.Mock()
+            resp.status_code = 403
+            resp.headers = {'Retry-After': str(wait)}
+            return resp
+
+        responses = {
+            'SHA1': [status('pending'), status('pending'), status('success')],
+            'SHA2': [limited(30), status('failure')],
+        }
+        ghc = GitHubContext('REPO')
+        ghc.session = mock.Mock()
+        ghc.session.get = mock.Mock(
+            side_effect=lambda url, endpoint: responses[url.split('/')[-2]].pop(0)
+        )
+        result = ghc.wait_on_gh_statuses(['SHA1', 'SHA2'], interval=1)
+        self.assertEqual(result, {'SHA1': 'success', 'SHA2': 'failure'})
+        self.assertEqual(ghc.session.get.call_count, 5)
+        self.assertEqual(mock_sleep.call_count, 2)
+        # first sleep honours Retry-After
+        self.assertEqual(mock_sleep.call_args_list[0], mock.call(30))
+
+    @mock.patch('cirrus.github_tools.git')
+    @mock.patch('cirrus.github_tools.time')
+    def test_wait_on_gh_status_timeout(self, mock_time, mock_git):
+        clock = [1000.0]
+
+        def sleep(delay):
+            clock[0] += delay
+        mock_time.time = mock.Mock(side_effect=lambda: clock[0])
+        mock_time.sleep = mock.Mock(side_effect=sleep)
+        resp = mock.Mock()
+        resp.status_code = 200
+        resp.headers = {}
+        resp.json = mock.Mock(return_value={'state': 'pending'})
+        ghc = GitHubContext('REPO')
+        ghc.session = mock.Mock()
+        ghc.session.get = mock.Mock(return_value=resp)
+        self.assertRaises(
+            RuntimeError, ghc.wait_on_gh_status, 'SHA1', timeout=10, interval=2
+        )
+        self.failUnless(mock_time.sleep.call_count >= 2)
+        self.failUnless(clock[0] <= 1010)
+
+    @mock.patch('cirrus.github_tools.git')
+    @mock.patch('cirrus.github_tools.backoff_delay')
+    @mock.patch('cirrus.github_tools.time')
+    def test_wait_on_gh_status_last_poll(self, mock_time, mock_backoff, mock_git):
+        """the last sleep is cut short and the deadline gets one more poll"""
+        clock = [1000.0]
+
+        def sleep(delay):
+            clock[0] += delay
+        mock_time.time = mock.Mock(side_effect=lambda: clock[0])
+        mock_time.sleep = mock.Mock(side_effect=sleep)
+        mock_backoff.return_value = 8
+
+        def status(state):
+            resp = mock.Mock()
+            resp.status_code = 200
+            resp.headers = {}
+            resp.json = mock.Mock(return_value={'state': state})
+            return resp
+        ghc = GitHubContext('REPO')
+        ghc.session = mock.Mock()
+        ghc.session.get = mock.Mock(side_effect=[
+            status('pending'), status('pending'), status('success')
+        ])
+        result = ghc.wait_on_gh_statuses(['SHA1'], timeout=10)
+        self.assertEqual(result, {'SHA1': 'success'})
+        self.assertEqual(ghc.session.get.call_count, 3)
+        self.assertEqual(
+            mock_time.sleep.call_args_list, [mock.call(8), mock.call(2)]
+        )
+        self.assertEqual(clock[0], 1010)
+
+    def test_paginate(self):
+        """test concurrent page fetching using the last link"""
+        base = 'https://api.github.com/repos/org/repo/branches'
+
+        def page(num, links=None):
+            resp = mock.Mock()
+            resp.json = mock.Mock(return_value=[num * 10, num * 10 + 1])
+            resp.links = links or {}
+            return resp
+        first = page(1, {
+            'next': {'url': base + '?per_page=2&page=2'},
+            'last': {'url': base + '?per_page=2&page=5'}
+        })
+        calls = []
+
+        def get(url, params):
+            calls.append((url, params))
+            if url == base:
+                return first
+            return page(int(url.rsplit('=', 1)[1]))
+
+        result = list(paginate(get, base, {'per_page': 2}, pool_size=2))
+        self.assertEqual(
+            result, [10, 11, 20, 21, 30, 31, 40, 41, 50, 51]
+        )
+        self.assertEqual(calls[0], (base, {'per_page': 2}))
+        self.assertEqual(
+            sorted(calls[1:]),
+            [(base + '?per_page=2&page={}'.format(i), None) for i in range(2, 6)]
+        )
+
+    def test_paginate_next_links(self):
+        """test following next links when there is no last link"""
+        pages = [
+            mock.Mock(links={'next': {'url': 'page2'}}),
+            mock.Mock(links={}),
+        ]
+        pages[0].json = mock.Mock(return_value=[1])
+        pages[1].json = mock.Mock(return_value=[2])
+        get = mock.Mock(side_effect=pages)
+        self.assertEqual(list(paginate(get, 'page1')), [1, 2])
+        get.assert_has_calls([mock.call('page1', None), mock.call('page2', None)])
+
+    def test_backoff_delay(self):
+        for attempt in range(10):
+            delay = backoff_delay(attempt, 2, 60)
+            self.failUnless(2 <= delay <= min(60, 2 * 2 ** attempt))
+
+    @mock.patch('cirrus.github_tools.time.time')
+    def test_rate_limit_delay(self, mock_time):
+        mock_time.return_value = 1000
+        self.assertEqual(rate_limit_delay({}), 0)
+        self.assertEqual(rate_limit_delay({'Retry-After': '5'}), 5)
+        self.assertEqual(
+            rate_limit_delay(
+                {'X-RateLimit-Remaining': '0', 'X-RateLimit-Reset': '1060'}
+            ),
+            60
+        )
+        self.assertEqual(
+            rate_limit_delay(
+                {'X-RateLimit-Remaining': '10', 'X-RateLimit-Reset': '1060'}
+            ),
+            0
+        )
 
 
 if __name__ == "__main__":
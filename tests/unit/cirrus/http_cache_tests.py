@@ -0,0 +1,127 @@
+#!/usr/bin/env python
+"""
+tests for http_cache module
+"""
+import os
+import json
+import mock
+import unittest
+import tempfile
+
+from cirrus.http_cache import ResponseCache
+from cirrus.http_cache import CachedSession
+from cirrus.http_cache import cache_directory
+
+
+def make_response(status, body=None, headers=None):
+    resp = mock.Mock()
+    resp.status_code = status
+    resp.text = json.dumps(body)
+    resp.json = mock.Mock(return_value=body)
+    resp.headers = headers or {}
+    return resp
+
+
+class ResponseCacheTests(unittest.TestCase):
+    """tests for the on disk store"""
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.cache_dir = os.path.join(self.dir, 'http_cache')
+
+    def tearDown(self):
+        if os.path.exists(self.dir):
+            os.system('rm -rf {}'.format(self.dir))
+
+    def test_put_get(self):
+        cache = ResponseCache(self.cache_dir)
+        self.assertEqual(cache.get('womp'), None)
+        cache.put('womp', {'body': 'x'})
+        self.assertEqual(cache.get('womp'), {'body': 'x'})
+        cache.clear()
+        self.assertEqual(cache.get('womp'), None)
+
+    def test_lru_eviction(self):
+        cache = ResponseCache(self.cache_dir, max_bytes=100)
+        cache.put('a', {'body': 'x' * 30})
+        cache.put('b', {'body': 'x' * 30})
+        # make a the oldest then read it to mark it as recently used
+        os.utime(os.path.join(self.cache_dir, 'a.json'), (1, 1))
+        os.utime(os.path.join(self.cache_dir, 'b.json'), (2, 2))
+        self.failUnless(cache.get('a') is not None)
+        cache.put('c', {'body': 'x' * 30})
+        self.failUnless(cache.get('a') is not None)
+        self.assertEqual(cache.get('b'), None)
+        self.failUnless(cache.get('c') is not None)
+
+    def test_cache_directory(self):
+        with mock.patch.dict(os.environ, {'CIRRUS_HTTP_CACHE': 'off'}):
+            self.assertEqual(cache_directory(), None)
+        with mock.patch.dict(os.environ, {'CIRRUS_HTTP_CACHE': self.dir}):
+            self.assertEqual(cache_directory(), self.dir)
+
+
+class CachedSessionTests(unittest.TestCase):
+    """tests for conditional GETs"""
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.session = mock.Mock()
+        self.session.headers = {'Authorization': 'token TOKEN'}
+        self.cached = CachedSession(
+            self.session, ResponseCache(self.dir)
+        )
+        self.url = 'https://api.github.com/repos/org/repo/pulls/1'
+
+    def tearDown(self):
+        if os.path.exists(self.dir):
+            os.system('rm -rf {}'.format(self.dir))
+
+    def test_conditional_get(self):
+        self.session.get.return_value = make_response(
+            200, {'number': 1}, {'ETag': '"abc"'}
+        )
+        resp = self.cached.get(self.url, endpoint='pr')
+        self.assertEqual(resp.json(), {'number': 1})
+        self.session.get.assert_called_with(
+            self.url, params=None, headers={}
+        )
+
+        self.session.get.return_value = make_response(304)
+        resp = self.cached.get(self.url, endpoint='pr')
+        self.session.get.assert_called_with(
+            self.url, params=None, headers={'If-None-Match': '"abc"'}
+        )
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.json(), {'number': 1})
+        self.failUnless(resp.from_cache)
+        self.assertEqual(self.cached.stats, {'pr': {'hit': 1, 'miss': 1}})
+        self.assertEqual(self.cached.report(), ['pr: 1 hits, 1 misses'])
+
+    def test_links(self):
+        link = '<https://api.github.com/x?page=2>; rel="next"'
+        self.session.get.return_value = make_response(
+            200, [], {'Last-Modified': 'yesterday', 'Link': link}
+        )
+        self.cached.get(self.url)
+        self.session.get.return_value = make_response(304)
+        resp = self.cached.get(self.url)
+        self.session.get.assert_called_with(
+            self.url, params=None, headers={'If-Modified-Since': 'yesterday'}
+        )
+        self.assertEqual(
+            resp.links['next']['url'], 'https://api.github.com/x?page=2'
+        )
+
+    def test_no_cache(self):
+        cached = CachedSession(self.session)
+        self.session.get.return_value = make_response(200, {})
+        cached.get(self.url, params={'state': 'open'})
+        self.session.get.assert_called_with(self.url, params={'state': 'open'})
+        self.assertEqual(cached.stats, {self.url: {'hit': 0, 'miss': 1}})
+
+    def test_passthrough(self):
+        self.cached.post(self.url, data='{}')
+        self.session.post.assert_called_with(self.url, data='{}')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+"""
+import budget tests
+
+Import each cirrus command module in a clean interpreter and
+check that none of the heavy third party libraries are pulled in
+at import time. Those should only be imported by the code path
+that uses them, via cirrus.lazy_import
+
+"""
+import os
+import sys
+import json
+import unittest
+import subprocess
+
+import cirrus
+
+HEAVY_MODULES = [
+    'arrow',
+    'chef',
+    'dockerstache',
+    'fabric',
+    'git',
+    'invoke',
+    'pkg_resources',
+    'pystache',
+    'requests',
+    'twine',
+]
+
+COMMAND_MODULES = [
+    'cirrus.build',
+    'cirrus.cirrus_setup',
+    'cirrus.delegate',
+    'cirrus.deploy',
+    'cirrus.docker',
+    'cirrus.docs',
+    'cirrus.feature',
+    'cirrus.hello',
+    'cirrus.package',
+    'cirrus.plusone',
+    'cirrus.quality_control',
+    'cirrus.release',
+    'cirrus.review',
+    'cirrus.selfupdate',
+    'cirrus.test',
+]
+
+SCRIPT = """
+import sys, json
+import {module}
+print(json.dumps(sorted(sys.modules.keys())))
+"""
+
+
+def imported_modules(module):
+    """import module in a subprocess, return the list of loaded modules"""
+    src_dir = os.path.dirname(os.path.dirname(cirrus.__file__))
+    env = os.environ.copy()
+    env['PYTHONPATH'] = os.pathsep.join(
+        [src_dir, env.get('PYTHONPATH', '')]
+    )
+    outp = subprocess.check_output(
+        [sys.executable, '-c', SCRIPT.format(module=module)],
+        env=env
+    )
+    return json.loads(outp.decode('utf-8').strip().split('\n')[-1])
+
+
+class ImportBudgetTests(unittest.TestCase):
+    """
+    fail if a command module grows a top level heavy import
+    """
+    def test_import_budgets(self):
+        over_budget = {}
+        for module in COMMAND_MODULES:
+            loaded = imported_modules(module)
+            heavy = [
+                m for m in loaded
+                if m.split('.')[0] in HEAVY_MODULES
+            ]
+            if heavy:
+                over_budget[module] = sorted(
+                    set(m.split('.')[0] for m in heavy)
+                )
+        self.assertEqual(
+            over_budget, {},
+            "Command modules importing heavy libs: {}".format(over_budget)
+        )
+
+
+if __name__ == '__main__':
+    unittest.main()
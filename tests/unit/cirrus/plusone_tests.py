@@ -22,5 +22,21 @@ class PlusoneTests(unittest.TestCase):
         self.assertTrue('Authorization' in mock_session.headers)
         self.assertEqual(mock_session.headers['Authorization'], 'token TOKEN')
 
+    @mock.patch('cirrus.plusone.requests.Session')
+    @mock.patch('cirrus.plusone.get_github_auth')
+    def test_get_pr_rest_fallback(self, mock_gha, mock_sess):
+        mock_gha.return_value = ('USER', 'TOKEN')
+        mock_session = mock.Mock()
+        mock_session.headers = {}
+        mock_session.post.return_value.status_code = 404
+        mock_session.get.return_value.json.return_value = {'number': 1}
+        mock_sess.return_value = mock_session
+        gh = GitHubHelper()
+        self.assertEqual(gh.get_pr('org', 'repo', 1), {'number': 1})
+        self.assertTrue(mock_session.post.called)
+        mock_session.get.assert_called_with(
+            'https://api.github.com/repos/org/repo/pulls/1'
+        )
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,155 @@
+#!/usr/bin/env python
+"""
+registry_cache tests
+
+"""
+import os
+import sys
+import unittest
+import tempfile
+import mock
+
+import cirrus.registry_cache as registry_cache
+from cirrus.registry_cache import write_registry, load_registry
+from cirrus.registry_cache import LazyRegistry, CachedEntryPoint
+from pluggage.errors import FactoryError
+
+
+class RegistryCacheTests(unittest.TestCase):
+    """
+    tests for writing/loading/invalidating the registry cache
+    """
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.cache = os.path.join(self.dir, 'cirrus_registry.json')
+        self.patch_scan_commands = mock.patch(
+            'cirrus.registry_cache.scan_commands'
+        )
+        self.patch_scan_plugins = mock.patch(
+            'cirrus.registry_cache.scan_plugins'
+        )
+        self.mock_commands = self.patch_scan_commands.start()
+        self.mock_plugins = self.patch_scan_plugins.start()
+        self.mock_commands.return_value = {
+            'hello': 'cirrus.hello:main'
+        }
+        self.mock_plugins.return_value = {
+            'publish': {
+                'jenkins': 'cirrus.plugins.publishers.jenkins:Documentation'
+            }
+        }
+        registry_cache._REGISTRY.clear()
+
+    def tearDown(self):
+        self.patch_scan_commands.stop()
+        self.patch_scan_plugins.stop()
+        registry_cache._REGISTRY.clear()
+        if os.path.exists(self.dir):
+            os.system('rm -rf {}'.format(self.dir))
+
+    def test_write_and_load(self):
+        written = write_registry(self.cache)
+        loaded = load_registry(self.cache)
+        self.assertEqual(written, loaded)
+        self.assertEqual(loaded['commands']['hello'], 'cirrus.hello:main')
+        self.failUnless(not os.path.exists(self.cache + '.tmp'))
+
+    def test_missing_or_corrupt(self):
+        self.assertEqual(load_registry(self.cache), None)
+        with open(self.cache, 'w') as handle:
+            handle.write('{not json')
+        self.assertEqual(load_registry(self.cache), None)
+
+    def test_stale_stamp(self):
+        """upgrade changes the version stamp and invalidates the cache"""
+        write_registry(self.cache)
+        with mock.patch('cirrus.registry_cache.cirrus') as mock_cirrus:
+            mock_cirrus.__version__ = '999.0.0'
+            mock_cirrus.__file__ = registry_cache.__file__
+            self.assertEqual(load_registry(self.cache), None)
+
+    def test_distribution_stamp(self):
+        """installing or upgrading a dist with entry points invalidates"""
+        site_dir = os.path.join(self.dir, 'site-packages')
+        dist_dir = os.path.join(site_dir, 'womp-1.0.dist-info')
+        os.makedirs(dist_dir)
+        entry_points = os.path.join(dist_dir, 'entry_points.txt')
+        with open(entry_points, 'w') as handle:
+            handle.write("[cirrus_commands]\nwomp = womp:main\n")
+        with mock.patch.object(sys, 'path', [site_dir]):
+            write_registry(self.cache)
+            self.failUnless(load_registry(self.cache) is not None)
+            os.utime(entry_points, (0, 0))
+            self.assertEqual(load_registry(self.cache), None)
+
+            write_registry(self.cache)
+            os.rename(dist_dir, os.path.join(site_dir, 'womp-1.1.dist-info'))
+            self.assertEqual(load_registry(self.cache), None)
+
+    def test_command_entry_points(self):
+        write_registry(self.cache)
+        with mock.patch.dict(
+                os.environ, {'CIRRUS_REGISTRY_CACHE': self.cache}):
+            eps = registry_cache.command_entry_points()
+        self.assertEqual(list(eps.keys()), ['hello'])
+        from cirrus.hello import main
+        self.assertEqual(eps['hello'].load(), main)
+
+    def test_cached_entry_point(self):
+        ep = CachedEntryPoint('womp', 'cirrus.registry_cache:LazyRegistry.get')
+        self.assertEqual(ep.load(), LazyRegistry.get)
+
+
+class LazyRegistryTests(unittest.TestCase):
+    """
+    tests for LazyRegistry plugin loading
+    """
+    @mock.patch('cirrus.registry_cache.LazyRegistry._plugins')
+    @mock.patch('cirrus.registry_cache.importlib.import_module')
+    def test_lazy_import_cached_module(self, mock_import, mock_plugins):
+        """a cached plugin is imported without the pluggage registry"""
+        factory = LazyRegistry(
+            'unittest-factory',
+            load_modules=['womp.plugins'],
+            plugin_targets={'Womp': 'womp.plugins.womp:Womp'}
+        )
+        self.assertEqual(
+            factory.get('Womp'), mock_import.return_value.Womp
+        )
+        mock_import.assert_has_calls([mock.call('womp.plugins.womp')])
+        self.assertEqual(mock_import.call_count, 1)
+        self.failIf(mock_plugins.called)
+
+    def test_cached_target(self):
+        factory = LazyRegistry(
+            'publish',
+            load_modules=['womp.plugins'],
+            plugin_targets={
+                'jenkins': 'cirrus.plugins.publishers.jenkins:Documentation'
+            }
+        )
+        from cirrus.plugins.publishers.jenkins import Documentation
+        self.failUnless(factory.get('jenkins') is Documentation)
+
+    @mock.patch('cirrus.registry_cache.importlib.import_module')
+    def test_unknown_plugin(self, mock_import):
+        factory = LazyRegistry(
+            'unittest-factory',
+            load_modules=['womp.plugins'],
+            plugin_targets={}
+        )
+        self.assertRaises(FactoryError, factory, 'Womp')
+        mock_import.assert_has_calls([mock.call('womp.plugins')])
+
+    def test_real_factory(self):
+        factory = LazyRegistry(
+            'publish',
+            load_modules=['cirrus.plugins.publishers'],
+            plugin_targets={}
+        )
+        self.failUnless('jenkins' in factory.registry)
+        self.failUnless(factory.get('jenkins') is not None)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,298 @@
+#!/usr/bin/env python
+"""
+tests for release_batch module
+"""
+import os
+import json
+import mock
+import argparse
+import unittest
+import tempfile
+import threading
+import subprocess
+
+import cirrus
+from cirrus.release_batch import BatchPackage, ReleaseBatch
+from cirrus.release_batch import dependency_order, read_manifest
+from cirrus.release_batch import release_batch
+
+CIRRUS_CONF = """
+[package]
+name = {name}
+version = {version}
+
+[gitflow]
+develop_branch = develop
+release_branch_prefix = release/
+"""
+
+GITCONFIG = """
+[user]
+    name = unittest
+    email = unit@test.com
+[cirrus]
+    credential-plugin = default
+"""
+
+
+def batch_options(**kwargs):
+    options = dict(
+        manifest=None, major=False, minor=False, micro=True, workers=4,
+        build=False, upload=False, plugin='pypi', merge=False,
+        no_remote=False, dry_run=False, resume=False
+    )
+    options.update(kwargs)
+    return argparse.Namespace(**options)
+
+
+class BatchFixture(unittest.TestCase):
+    """repos for packages, each with an origin bare repo"""
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.home = os.path.join(self.dir, 'home')
+        os.makedirs(self.home)
+        with open(os.path.join(self.home, '.gitconfig'), 'w') as handle:
+            handle.write(GITCONFIG)
+        src_dir = os.path.dirname(os.path.dirname(cirrus.__file__))
+        self.patch_env = mock.patch.dict(os.environ, {
+            'HOME': self.home,
+            'PYTHONPATH': os.pathsep.join(
+                [src_dir, os.environ.get('PYTHONPATH', '')]
+            )
+        })
+        self.patch_env.start()
+
+    def tearDown(self):
+        self.patch_env.stop()
+        os.system('rm -rf {}'.format(self.dir))
+
+    def git(self, path, *args):
+        return subprocess.check_output(
+            ('git',) + args, cwd=path
+        ).decode('utf-8').strip()
+
+    def make_repo(self, name, version, requirements=()):
+        origin = os.path.join(self.dir, 'origin', '{0}.git'.format(name))
+        os.makedirs(origin)
+        self.git(origin, 'init', '-q', '--bare')
+        path = os.path.join(self.dir, 'repos', name)
+        os.makedirs(path)
+        self.git(path, 'init', '-q')
+        self.git(path, 'checkout', '-q', '-b', 'develop')
+        with open(os.path.join(path, 'cirrus.conf'), 'w') as handle:
+            handle.write(CIRRUS_CONF.format(name=name, version=version))
+        with open(os.path.join(path, 'requirements.txt'), 'w') as handle:
+            for line in requirements:
+                handle.write('{0}\n'.format(line))
+        self.git(path, 'add', 'cirrus.conf', 'requirements.txt')
+        self.git(path, 'commit', '-q', '-m', 'initial')
+        self.git(path, 'remote', 'add', 'origin', origin)
+        self.git(path, 'push', '-q', 'origin', 'develop')
+        self.git(path, 'branch', '-q', '-u', 'origin/develop')
+        return path
+
+    def write_manifest(self, *names):
+        manifest = os.path.join(self.dir, 'repos', 'manifest.txt')
+        with open(manifest, 'w') as handle:
+            handle.write('# batch\n\n')
+            for name in names:
+                handle.write('{0}\n'.format(name))
+        return manifest
+
+
+class ReleaseBatchTests(BatchFixture):
+    """ordering and pin bumps with a recording runner"""
+    def setUp(self):
+        super(ReleaseBatchTests, self).setUp()
+        self.make_repo('pkg_core', '1.0.0', ['requests==2.0.0'])
+        self.make_repo('pkg-util', '0.3.0', ['pkg_core==1.0.0'])
+        self.make_repo('pkg_other', '2.1.0')
+        self.make_repo(
+            'pkg_app', '0.9.0', ['PKG_UTIL>=0.3.0', 'pkg_core==1.0.0']
+        )
+        self.manifest = self.write_manifest(
+            'pkg_app', 'pkg-util', 'pkg_core', 'pkg_other'
+        )
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def runner(self, path, *args):
+        with self.lock:
+            self.calls.append((os.path.basename(path),) + args)
+        if args[0] == 'new':
+            # what git cirrus release new --micro would do to cirrus.conf
+            version = BatchPackage(path).version.split('.')
+            version[-1] = str(int(version[-1]) + 1)
+            self.set_version(path, '.'.join(version))
+        if args[0] == 'resume':
+            self.set_version(path, args[2])
+
+    def set_version(self, path, version):
+        with open(os.path.join(path, 'cirrus.conf'), 'w') as handle:
+            handle.write(
+                CIRRUS_CONF.format(name=os.path.basename(path), version=version)
+            )
+
+    def packages(self):
+        return [BatchPackage(path) for path in read_manifest(self.manifest)]
+
+    def test_dependency_order(self):
+        ordered = [p.name for p in dependency_order(self.packages())]
+        self.failUnless(ordered.index('pkg_core') < ordered.index('pkg-util'))
+        self.failUnless(ordered.index('pkg-util') < ordered.index('pkg_app'))
+        app = [p for p in self.packages() if p.name == 'pkg_app'][0]
+        dependency_order([app] + self.packages()[1:])
+        # names match case and -/_ insensitively, as written in the file
+        self.assertEqual(
+            sorted(req for req, _ in app.requires), ['PKG_UTIL', 'pkg_core']
+        )
+
+    def test_cycle(self):
+        packages = self.packages()
+        core = [p for p in packages if p.name == 'pkg_core'][0]
+        core.requirements.append('pkg_app')
+        self.assertRaises(RuntimeError, dependency_order, packages)
+
+    def test_release_bumps_pins(self):
+        opts = batch_options(merge=True, no_remote=True)
+        batch = ReleaseBatch(self.packages(), opts, runner=self.runner)
+        results = batch.run()
+        self.assertEqual(results, {
+            'pkg_core': '1.0.1', 'pkg-util': '0.3.1',
+            'pkg_other': '2.1.1', 'pkg_app': '0.9.1'
+        })
+        new_calls = dict(
+            (call[0], call[1:]) for call in self.calls if call[1] == 'new'
+        )
+        self.assertEqual(
+            new_calls['pkg-util'],
+            ('new', '--micro', '--bump', 'pkg_core', '1.0.1', '--no-remote')
+        )
+        self.assertEqual(
+            new_calls['pkg_app'],
+            ('new', '--micro', '--bump', 'PKG_UTIL', '0.3.1',
+             '--bump', 'pkg_core', '1.0.1', '--no-remote')
+        )
+        self.assertEqual(new_calls['pkg_core'], ('new', '--micro', '--no-remote'))
+        # upstream merged before the downstream release is started
+        self.failUnless(
+            self.calls.index(('pkg_core', 'merge', '--cleanup', '--no-remote'))
+            < self.calls.index(('pkg-util',) + new_calls['pkg-util'])
+        )
+
+    def test_independent_packages_concurrent(self):
+        """packages without a dependency between them overlap"""
+        started = threading.Event()
+        overlapped = []
+
+        def runner(path, *args):
+            name = os.path.basename(path)
+            if name == 'pkg_other':
+                started.set()
+                return self.runner(path, *args)
+            if name == 'pkg_core':
+                overlapped.append(started.wait(5))
+            return self.runner(path, *args)
+
+        batch = ReleaseBatch(self.packages(), batch_options(), runner=runner)
+        batch.pipeline().run()
+        self.assertEqual(overlapped, [True])
+
+    def test_resume_skips_released(self):
+        """a rerun skips the commands already done, no second bump"""
+        opts = batch_options(manifest=self.manifest, no_remote=True, build=True)
+        failing = []
+
+        def runner(path, *args):
+            if os.path.basename(path) == 'pkg_app' and args[0] == 'build':
+                failing.append(path)
+                raise RuntimeError('build broke')
+            return self.runner(path, *args)
+
+        self.assertRaises(RuntimeError, release_batch, opts, runner)
+        self.assertEqual(len(failing), 1)
+        released = set(call[0] for call in self.calls)
+        self.assertEqual(
+            released, set(['pkg_core', 'pkg-util', 'pkg_other', 'pkg_app'])
+        )
+
+        self.calls = []
+        opts.resume = True
+        results = release_batch(opts, self.runner)
+        self.assertEqual(self.calls, [('pkg_app', 'build', '--resume')])
+        self.assertEqual(results['pkg_app'], '0.9.1')
+        self.assertEqual(results['pkg_core'], '1.0.1')
+
+    def write_journal(self, name, version):
+        journal_dir = os.path.join(self.dir, 'repos', name, '.git', 'cirrus')
+        if not os.path.exists(journal_dir):
+            os.makedirs(journal_dir)
+        filename = os.path.join(journal_dir, 'release-{0}.json'.format(version))
+        with open(filename, 'w') as handle:
+            json.dump({'new': {'status': 'running', 'completed': {}}}, handle)
+
+    def test_resume_part_done_command(self):
+        """a release new left running is resumed, not run again"""
+        self.write_journal('pkg_other', '2.1.1')
+        opts = batch_options(resume=True)
+        batch = ReleaseBatch(self.packages(), opts, runner=self.runner)
+        results = batch.run()
+        self.assertEqual(results['pkg_other'], '2.1.1')
+        other_calls = [call[1:] for call in self.calls if call[0] == 'pkg_other']
+        self.assertEqual(other_calls, [('resume', '--version', '2.1.1')])
+
+    def test_resume_version_from_journal(self):
+        """the version recorded in the batch journal is the one resumed"""
+        opts = batch_options(manifest=self.manifest, no_remote=True)
+        failing = []
+
+        def runner(path, *args):
+            if os.path.basename(path) == 'pkg_other' and not failing:
+                # release new got as far as bumping cirrus.conf
+                failing.append(path)
+                self.set_version(path, '2.1.1')
+                self.write_journal('pkg_other', '2.1.1')
+                raise RuntimeError('push rejected')
+            return self.runner(path, *args)
+
+        self.assertRaises(RuntimeError, release_batch, opts, runner)
+        self.calls = []
+        opts.resume = True
+        results = release_batch(opts, self.runner)
+        self.assertEqual(results['pkg_other'], '2.1.1')
+        self.assertEqual(
+            [call for call in self.calls if call[0] == 'pkg_other'],
+            [('pkg_other', 'resume', '--version', '2.1.1')]
+        )
+
+    def test_stale_journal(self):
+        """another release left running fails the resume loudly"""
+        self.write_journal('pkg_other', '1.9.9')
+        opts = batch_options(resume=True)
+        batch = ReleaseBatch(self.packages(), opts, runner=self.runner)
+        self.assertRaises(RuntimeError, batch.run)
+        self.failUnless(
+            not [call for call in self.calls if call[0] == 'pkg_other']
+        )
+
+
+class ReleaseBatchRepoTests(BatchFixture):
+    """git cirrus release new run for real against bare origins"""
+    def test_release_batch(self):
+        core = self.make_repo('pkg_core', '1.0.0')
+        util = self.make_repo('pkg_util', '0.3.0', ['pkg_core==1.0.0'])
+        manifest = self.write_manifest('pkg_util', 'pkg_core')
+        results = release_batch(batch_options(manifest=manifest, workers=2))
+        self.assertEqual(results, {'pkg_core': '1.0.1', 'pkg_util': '0.3.1'})
+
+        origin = os.path.join(self.dir, 'origin', 'pkg_util.git')
+        reqs = self.git(origin, 'show', 'release/0.3.1:requirements.txt')
+        self.assertEqual(reqs, 'pkg_core==1.0.1')
+        for path, branch in ((core, 'release/1.0.1'), (util, 'release/0.3.1')):
+            self.assertEqual(
+                self.git(path, 'rev-parse', '--abbrev-ref', 'HEAD'), branch
+            )
+
+
+if __name__ == '__main__':
+    unittest.main()
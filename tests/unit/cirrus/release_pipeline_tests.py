@@ -0,0 +1,168 @@
+#!/usr/bin/env python
+"""
+tests for release_pipeline module
+"""
+import os
+import json
+import mock
+import argparse
+import unittest
+import tempfile
+import threading
+
+from cirrus.release_pipeline import Pipeline, Checkpoint
+
+
+class PipelineTests(unittest.TestCase):
+    """dependency ordering, overlap and checkpoints"""
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.filename = os.path.join(self.dir, 'cirrus', 'release-1.2.3.json')
+        self.calls = []
+
+    def tearDown(self):
+        os.system('rm -rf {}'.format(self.dir))
+
+    def step(self, name, result=None, error=None):
+        def func(results):
+            self.calls.append(name)
+            if error is not None:
+                raise error
+            return result
+        return func
+
+    def test_dependency_order(self):
+        pipeline = Pipeline()
+        pipeline.add('b', lambda r: r['a'] + 1, requires=('a',))
+        pipeline.add('a', lambda r: 1)
+        pipeline.add('c', lambda r: r['b'] * 2, requires=('b', 'optional'))
+        self.assertEqual(pipeline.run(), {'a': 1, 'b': 2, 'c': 4})
+
+    def test_independent_steps_overlap(self):
+        """a step blocked on another is not delayed by it"""
+        polling = threading.Event()
+        pushed = threading.Event()
+
+        def wait_ci(results):
+            polling.set()
+            # only returns once the independent push has happened
+            self.failUnless(pushed.wait(5))
+
+        def push(results):
+            self.failUnless(polling.wait(5))
+            pushed.set()
+
+        pipeline = Pipeline()
+        pipeline.add('wait_ci', wait_ci)
+        pipeline.add('push', push)
+        pipeline.run()
+
+    def test_resources_exclusive(self):
+        """steps sharing a resource never run together"""
+        active = []
+        overlaps = []
+        lock = threading.Lock()
+
+        def work(results):
+            with lock:
+                active.append(1)
+                overlaps.append(len(active))
+            threading.Event().wait(0.05)
+            with lock:
+                active.pop()
+
+        pipeline = Pipeline()
+        for name in ('one', 'two', 'three'):
+            pipeline.add(name, work, resources=('repo',))
+        pipeline.run()
+        self.assertEqual(overlaps, [1, 1, 1])
+
+    def test_resume_from_checkpoint(self):
+        checkpoint = Checkpoint(self.filename, 'merge')
+        pipeline = Pipeline(checkpoint=checkpoint)
+        pipeline.add('merge', self.step('merge', 'abc123'))
+        pipeline.add(
+            'push', self.step('push', error=RuntimeError('rejected')),
+            requires=('merge',)
+        )
+        pipeline.add('cleanup', self.step('cleanup'), requires=('push',))
+        self.assertRaises(RuntimeError, pipeline.run)
+        self.assertEqual(self.calls, ['merge', 'push'])
+        self.assertEqual(checkpoint.completed, {'merge': 'abc123'})
+
+        self.calls = []
+        pipeline = Pipeline(checkpoint=checkpoint)
+        pipeline.add('merge', self.step('merge', 'def456'))
+        pipeline.add('push', lambda r: r['merge'], requires=('merge',))
+        pipeline.add('cleanup', self.step('cleanup'), requires=('push',))
+        results = pipeline.run()
+        self.assertEqual(self.calls, ['cleanup'])
+        self.assertEqual(results['push'], 'abc123')
+
+        # sections are independent
+        Checkpoint(self.filename, 'build').record('sdist', 'dist/x.tar.gz')
+        with open(self.filename) as handle:
+            content = json.load(handle)
+        self.assertEqual(sorted(content), ['build', 'merge'])
+        checkpoint.clear()
+        self.assertEqual(checkpoint.completed, {})
+        self.assertEqual(
+            Checkpoint(self.filename, 'build').completed,
+            {'sdist': 'dist/x.tar.gz'}
+        )
+
+    def test_begin_finish(self):
+        """finished commands start afresh, failed ones resume if asked"""
+        checkpoint = Checkpoint(self.filename, 'build')
+        opts = argparse.Namespace(command='build', plugin=None, opts=object())
+        checkpoint.begin(opts, release={'version': '1.2.3'})
+        checkpoint.record('sdist', 'dist/pkg-1.2.3.tar.gz')
+        section = checkpoint.load()['build']
+        self.assertEqual(section['status'], 'running')
+        self.assertEqual(section['options'], {'command': 'build', 'plugin': None})
+        self.assertEqual(section['release'], {'version': '1.2.3'})
+
+        # resumed, completed steps kept
+        checkpoint.begin(opts, resume=True)
+        self.assertEqual(list(checkpoint.completed), ['sdist'])
+
+        pipeline = Pipeline(checkpoint=checkpoint)
+        pipeline.add('sdist', self.step('sdist'))
+        pipeline.run()
+        self.assertEqual(checkpoint.status, 'done')
+        self.assertEqual(self.calls, [])
+
+        # a new run of a finished command starts again
+        checkpoint.begin(opts)
+        self.assertEqual(checkpoint.completed, {})
+        self.assertEqual(checkpoint.status, 'running')
+
+
+    def test_rerun_without_resume(self):
+        """a plain rerun drops the progress of a failed run"""
+        checkpoint = Checkpoint(self.filename, 'merge')
+        opts = argparse.Namespace(command='merge')
+        checkpoint.begin(opts)
+        checkpoint.record('merge', 'abc123')
+        with mock.patch('cirrus.release_pipeline.LOGGER') as mock_logger:
+            checkpoint.begin(opts)
+        self.failUnless(mock_logger.warning.called)
+        self.assertEqual(checkpoint.completed, {})
+        self.assertEqual(checkpoint.status, 'running')
+
+    def test_step_error_reraised(self):
+        """the failing step's own exception reaches the caller"""
+        class PushRejected(Exception):
+            pass
+
+        pipeline = Pipeline()
+        pipeline.add('merge', self.step('merge', 'abc123'))
+        pipeline.add(
+            'push', self.step('push', error=PushRejected('rejected')),
+            requires=('merge',)
+        )
+        self.assertRaises(PushRejected, pipeline.run)
+
+
+if __name__ == '__main__':
+    unittest.main()
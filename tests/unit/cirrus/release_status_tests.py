@@ -3,10 +3,17 @@
 tests for release status module
 """
 
+import os
 import unittest
+import tempfile
+import subprocess
 import mock
 
+from cirrus.git_tools import close_repos
+from cirrus.git_tools import invalidate_tag_index
 from cirrus.release_status import release_status
+from cirrus.release_status import release_status_rows
+from cirrus.release_status import format_status_table
 
 
 class ReleaseStatusTests(unittest.TestCase):
@@ -61,5 +68,88 @@ class ReleaseStatusTests(unittest.TestCase):
         self.assertTrue(not release_status('0.2.3'))
 
 
+class ReleaseStatusAllTests(unittest.TestCase):
+    """
+    bulk release status against a real gitflow style repo
+    """
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.env = dict(
+            os.environ,
+            GIT_AUTHOR_NAME='unittest', GIT_AUTHOR_EMAIL='unit@test.com',
+            GIT_COMMITTER_NAME='unittest', GIT_COMMITTER_EMAIL='unit@test.com'
+        )
+        self.git('init', '-q')
+        self.git('symbolic-ref', 'HEAD', 'refs/heads/master')
+        self.git('commit', '-q', '--allow-empty', '-m', 'init')
+        self.git('branch', 'develop')
+        # 1.0.0 released, merged and its branch removed
+        self.git('checkout', '-q', '-b', 'release/1.0.0', 'develop')
+        self.git('commit', '-q', '--allow-empty', '-m', 'release 1.0.0')
+        self.git('checkout', '-q', 'master')
+        self.git('merge', '-q', '--no-ff', 'release/1.0.0', '-m', 'merge')
+        self.git('tag', '1.0.0')
+        self.git('checkout', '-q', 'develop')
+        self.git('merge', '-q', '--no-ff', 'release/1.0.0', '-m', 'merge')
+        self.git('branch', '-q', '-D', 'release/1.0.0')
+        # 1.1.0 still open
+        self.git('checkout', '-q', '-b', 'release/1.1.0')
+        self.git('commit', '-q', '--allow-empty', '-m', 'release 1.1.0')
+        self.git('checkout', '-q', 'develop')
+
+        self.config = mock.Mock()
+        self.config.gitflow_release_prefix.return_value = 'release/'
+        self.config.gitflow_branch_name.return_value = 'develop'
+        self.config.gitflow_master_name.return_value = 'master'
+        self.config.gitflow_origin_name.return_value = 'origin'
+
+    def tearDown(self):
+        close_repos()
+        invalidate_tag_index()
+        os.system('rm -rf {}'.format(self.dir))
+
+    def git(self, *args):
+        subprocess.check_call(('git',) + args, cwd=self.dir, env=self.env)
+
+    def test_release_status_rows(self):
+        rows = release_status_rows(self.dir, self.config)
+        self.assertEqual([r['release'] for r in rows], ['1.0.0', '1.1.0'])
+        released, pending = rows
+        self.failUnless(released['ok'])
+        self.failUnless(released['develop'])
+        self.failIf(released['branch'])
+        self.failIf(pending['ok'])
+        self.failUnless(pending['branch'])
+        self.failIf(pending['develop'] or pending['master'] or pending['tag'])
+
+        table = format_status_table(rows)
+        self.assertEqual(table[0].split(), ['Release', 'Branch', 'Tag', 'Develop', 'Master', 'Status'])
+        self.assertEqual(table[1].split(), ['1.0.0', '-', 'yes', 'yes', 'yes', 'released'])
+        self.assertEqual(table[2].split(), ['1.1.0', 'yes', '-', '-', '-', 'incomplete'])
+
+
+    def test_tag_on_plain_commit(self):
+        """a tag on a non merge commit is checked against develop itself"""
+        # tagged on a hotfix commit whose parent is on develop
+        self.git('checkout', '-q', '-b', 'hotfix', 'develop')
+        self.git('commit', '-q', '--allow-empty', '-m', 'hotfix 1.0.1')
+        self.git('tag', '1.0.1')
+        self.git('checkout', '-q', 'develop')
+        self.git('branch', '-q', '-D', 'hotfix')
+        rows = dict(
+            (r['release'], r) for r in release_status_rows(self.dir, self.config)
+        )
+        self.failIf(rows['1.0.1']['develop'])
+        self.failUnless(rows['1.0.0']['develop'])
+
+        # fast forwarded into develop
+        self.git('merge', '-q', '--ff-only', '1.0.1')
+        invalidate_tag_index()
+        rows = dict(
+            (r['release'], r) for r in release_status_rows(self.dir, self.config)
+        )
+        self.failUnless(rows['1.0.1']['develop'])
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -4,16 +4,24 @@ release command tests
 
 """
 import os
+import argparse
+import hashlib
 import unittest
 import tempfile
+import threading
 import mock
 
 from cirrus.release import new_release
 from cirrus.release import upload_release
 from cirrus.release import build_release
+from cirrus.release import copy_source_tree
 from cirrus.release import cleanup_release
 from cirrus.release import artifact_name
+from cirrus.release import ReleaseMerge
+from cirrus.release import resume_release
 from cirrus.configuration import Configuration
+from cirrus.utils import working_dir
+from cirrus.git_tools import ReleaseIndex
 from cirrus._2to3 import to_str
 from pluggage.errors import FactoryError
 
@@ -41,6 +49,13 @@ class ReleaseNewCommandTest(unittest.TestCase):
         self.patch_pull = mock.patch('cirrus.release.checkout_and_pull')
         self.patch_branch = mock.patch('cirrus.release.branch')
         self.patch_commit = mock.patch('cirrus.release.commit_files_optional_push')
+        self.patch_journal = mock.patch(
+            'cirrus.release.checkpoint_file',
+            side_effect=lambda repo_dir, version: os.path.join(
+                self.dir, 'release-{0}.json'.format(version)
+            )
+        )
+        self.patch_journal.start()
         self.mock_pull = self.patch_pull.start()
         self.mock_branch = self.patch_branch.start()
         self.mock_commit = self.patch_commit.start()
@@ -49,6 +64,7 @@ class ReleaseNewCommandTest(unittest.TestCase):
         self.patch_pull.stop()
         self.patch_branch.stop()
         self.patch_commit.stop()
+        self.patch_journal.stop()
         self.harness.tearDown()
         self.harness_utils.tearDown()
         if os.path.exists(self.dir):
@@ -84,17 +100,52 @@ class ReleaseNewCommandTest(unittest.TestCase):
         self.assertEqual(self.mock_branch.call_args[0][1], 'release/1.2.4')
         self.failUnless(self.mock_commit.called)
         self.assertEqual(self.mock_commit.call_args[0][2], False)
-        self.assertEqual(self.mock_commit.call_args[0][3], 'cirrus.conf')
+        self.assertEqual(self.mock_commit.call_args[0][3], self.config)
 
     @mock.patch('cirrus.release.has_unstaged_changes')
-    @mock.patch('cirrus.release.unmerged_releases')
-    def test_new_release_skip_existing(self, mock_unmerged, mock_unstaged):
+    def test_new_release_resume(self, mock_unstaged):
+        """a failed new release is continued from the journal"""
+        mock_unstaged.return_value = False
+        opts = mock.Mock()
+        opts.micro = True
+        opts.major = False
+        opts.minor = False
+        opts.nightly = False
+        opts.bump = None
+        opts.skip_existing = False
+        opts.no_remote = True
+        opts.commit_cache = False
+        self.mock_commit.side_effect = RuntimeError('index.lock exists')
+        self.assertRaises(RuntimeError, new_release, opts)
+        self.assertEqual(self.mock_pull.call_count, 1)
+
+        self.mock_commit.side_effect = None
+        resume_opts = mock.Mock()
+        resume_opts.version = '1.2.4'
+        result = resume_release(resume_opts)
+        self.assertEqual(result, ('1.2.4', 'micro'))
+        # branch creation is not repeated
+        self.assertEqual(self.mock_pull.call_count, 1)
+        self.assertEqual(self.mock_branch.call_count, 1)
+        self.assertEqual(self.mock_commit.call_count, 2)
+
+        # nothing left to do
+        self.assertEqual(resume_release(resume_opts), None)
+        self.assertEqual(self.mock_commit.call_count, 2)
+
+    @mock.patch('cirrus.release.has_unstaged_changes')
+    @mock.patch('cirrus.release.release_index')
+    def test_new_release_skip_existing(self, mock_index, mock_unstaged):
         """
         _test_new_release_
 
         """
         mock_unstaged.return_value = False
-        mock_unmerged.return_value = ['1.2.4']
+        mock_index.return_value = ReleaseIndex(
+            'release/',
+            [('refs/heads/release/1.2.4', 'SHA')],
+            set()
+        )
         opts = mock.Mock()
         opts.micro = True
         opts.major = False
@@ -118,7 +169,7 @@ class ReleaseNewCommandTest(unittest.TestCase):
         self.assertEqual(self.mock_branch.call_args[0][1], 'release/1.2.5')
         self.failUnless(self.mock_commit.called)
         self.assertEqual(self.mock_commit.call_args[0][2], False)
-        self.assertEqual(self.mock_commit.call_args[0][3], 'cirrus.conf')
+        self.assertEqual(self.mock_commit.call_args[0][3], self.config)
 
     @mock.patch('cirrus.release.has_unstaged_changes')
     @mock.patch('cirrus.release_utils.datetime')
@@ -156,11 +207,11 @@ class ReleaseNewCommandTest(unittest.TestCase):
         self.assertEqual(self.mock_branch.call_args[0][1], 'release/1.2.3-nightly-TIMESTAMP')
         self.failUnless(self.mock_commit.called)
         self.assertEqual(self.mock_commit.call_args[0][2], False)
-        self.assertEqual(self.mock_commit.call_args[0][3], 'cirrus.conf')
+        self.assertEqual(self.mock_commit.call_args[0][3], self.config)
 
 
     @mock.patch('cirrus.release.has_unstaged_changes')
-    @mock.patch('cirrus.release.bump_package')
+    @mock.patch('cirrus.release.VersionEdits.bump_requirement')
     def test_new_release_bump(self, mock_bump, mock_unstaged):
         """
         _test_new_release_
@@ -190,7 +241,7 @@ class ReleaseNewCommandTest(unittest.TestCase):
         self.assertEqual(self.mock_branch.call_args[0][1], 'release/1.2.4')
         self.failUnless(self.mock_commit.called)
         self.assertEqual(self.mock_commit.call_args[0][2], False)
-        self.assertEqual(self.mock_commit.call_args[0][3], 'cirrus.conf')
+        self.assertEqual(self.mock_commit.call_args[0][3], self.config)
 
         self.assertEqual(mock_bump.call_count, 2)
 
@@ -288,34 +339,160 @@ class ReleaseBuildCommandTest(unittest.TestCase):
 
         self.patch_local =  mock.patch('cirrus.release.local')
         self.mock_local = self.patch_local.start()
+        self.patch_journal = mock.patch(
+            'cirrus.release.checkpoint_file',
+            return_value=os.path.join(self.dir, 'release-1.2.3.json')
+        )
+        self.patch_journal.start()
+        self.sources = []
 
     def tearDown(self):
         self.harness.tearDown()
         self.patch_local.stop()
+        self.patch_journal.stop()
+        if os.path.exists(self.dir):
+            os.system('rm -rf {0}'.format(self.dir))
+
+    def fake_build(self, built, barrier=None):
+        """local stand in writing the artifact into the --dist-dir"""
+        def build(command):
+            dist_dir = command.split('--dist-dir ')[1].strip()
+            self.failUnless(os.path.isdir(os.path.dirname(dist_dir)))
+            source_dir = command.split()[1]
+            self.failUnless(
+                os.path.exists(os.path.join(source_dir, 'cirrus.conf'))
+            )
+            self.sources.append(source_dir)
+            os.makedirs(dist_dir)
+            release_format = [x for x in built if x in command.split()][0]
+            if barrier is not None:
+                barrier[release_format].set()
+                for event in barrier.values():
+                    self.failUnless(event.wait(5))
+            filename = os.path.join(dist_dir, built[release_format])
+            with open(filename, 'w') as handle:
+                handle.write(release_format)
+        return build
 
     def test_build_command_raises(self):
         """should raise when build artifact is not present"""
         opts = mock.Mock()
-        self.assertRaises(RuntimeError, build_release, opts)
+        opts.formats = None
+        with working_dir(self.dir):
+            self.assertRaises(RuntimeError, build_release, opts)
+        self.failUnless(not os.path.exists(os.path.join(self.dir, 'dist')))
 
     def test_build_command(self):
-        """test calling build, needs os.path.exists mocks since we arent actually building"""
-        with mock.patch('cirrus.release.os') as mock_os:
-
-            mock_os.path = mock.Mock()
-            mock_os.path.exists = mock.Mock()
-            mock_os.path.exists.return_value = True
-            mock_os.path.join = mock.Mock()
-            mock_os.path.join.return_value = 'build_artifact'
-
-            opts = mock.Mock()
+        """sdist built in a temp dir, moved to dist and hashed"""
+        self.mock_local.side_effect = self.fake_build(
+            {'sdist': 'cirrus_unittest-1.2.3.tar.gz'}
+        )
+        opts = mock.Mock()
+        opts.formats = None
+        with working_dir(self.dir):
             result = build_release(opts)
-            self.assertEqual(result, 'build_artifact')
-            self.failUnless(mock_os.path.exists.called)
-            self.assertEqual(mock_os.path.exists.call_args[0][0], 'build_artifact')
+        dist_dir = os.path.join(self.dir, 'dist')
+        self.assertEqual(
+            result, os.path.join(dist_dir, 'cirrus_unittest-1.2.3.tar.gz')
+        )
+        self.failUnless(os.path.exists(result))
+        self.assertEqual(self.mock_local.call_count, 1)
+        command = self.mock_local.call_args[0][0]
+        self.failUnless(command.startswith('cd '))
+        self.failUnless(' && python setup.py egg_info --egg-base ' in command)
+        self.failUnless(' sdist --dist-dir ' in command)
+
+        with open(os.path.join(dist_dir, 'cirrus_unittest-1.2.3.sha256')) as handle:
+            self.assertEqual(
+                handle.read(),
+                '{0}  cirrus_unittest-1.2.3.tar.gz\n'.format(hashlib.sha256(b'sdist').hexdigest())
+            )
 
-            self.failUnless(self.mock_local.called)
-            self.assertEqual(self.mock_local.call_args[0][0], 'python setup.py sdist')
+    def test_build_formats_concurrent(self):
+        """sdist and wheel build at the same time and are both verified"""
+        wheel = 'cirrus_unittest-1.2.3-py2.py3-none-any.whl'
+        barrier = {'sdist': threading.Event(), 'bdist_wheel': threading.Event()}
+        self.mock_local.side_effect = self.fake_build(
+            {'sdist': 'cirrus_unittest-1.2.3.tar.gz', 'bdist_wheel': wheel},
+            barrier
+        )
+        opts = mock.Mock()
+        opts.formats = ['sdist', 'wheel']
+        with working_dir(self.dir):
+            result = build_release(opts)
+        dist_dir = os.path.join(self.dir, 'dist')
+        self.assertEqual(
+            sorted(os.listdir(dist_dir)),
+            ['cirrus_unittest-1.2.3-py2.py3-none-any.whl',
+             'cirrus_unittest-1.2.3.sha256',
+             'cirrus_unittest-1.2.3.tar.gz']
+        )
+        self.assertEqual(result, os.path.join(dist_dir, 'cirrus_unittest-1.2.3.tar.gz'))
+        build_dirs = set(
+            call[0][0].split('--egg-base ')[1].split()[0]
+            for call in self.mock_local.call_args_list
+        )
+        self.assertEqual(len(build_dirs), 2)
+        self.failUnless(not any(os.path.exists(x) for x in build_dirs))
+        # each format built from its own copy of the source
+        self.assertEqual(len(set(self.sources)), 2)
+        self.failUnless(self.dir not in self.sources)
+
+        # a missing wheel fails the build
+        opts.formats = ['wheel']
+        self.mock_local.side_effect = None
+        os.remove(os.path.join(dist_dir, wheel))
+        with working_dir(self.dir):
+            self.assertRaises(RuntimeError, build_release, opts)
+
+
+    def test_build_rerun(self):
+        """a plain rerun builds every format, --resume only the failed one"""
+        wheel = 'cirrus_unittest-1.2.3-py2.py3-none-any.whl'
+        built = {'sdist': 'cirrus_unittest-1.2.3.tar.gz', 'bdist_wheel': wheel}
+        build = self.fake_build(built)
+
+        def failing_wheel(command):
+            if 'bdist_wheel' in command:
+                raise RuntimeError('wheel broke')
+            return build(command)
+
+        opts = argparse.Namespace(formats=['sdist', 'wheel'], resume=False)
+        self.mock_local.side_effect = failing_wheel
+        with working_dir(self.dir):
+            self.assertRaises(RuntimeError, build_release, opts)
+            self.mock_local.side_effect = build
+            self.mock_local.reset_mock()
+            opts.resume = True
+            build_release(opts)
+            self.assertEqual(self.mock_local.call_count, 1)
+            self.failUnless('bdist_wheel' in self.mock_local.call_args[0][0])
+
+            self.mock_local.side_effect = failing_wheel
+            self.assertRaises(RuntimeError, build_release, opts)
+            self.mock_local.side_effect = build
+            self.mock_local.reset_mock()
+            opts.resume = False
+            build_release(opts)
+            self.assertEqual(self.mock_local.call_count, 2)
+
+    def test_copy_source_tree(self):
+        """build output and bytecode are left out, .git is linked"""
+        for path in ('pkg/build', 'dist', 'build', 'pkg.egg-info', '.git'):
+            os.makedirs(os.path.join(self.dir, path))
+        for path in ('pkg/__init__.py', 'pkg/build/__init__.py', 'pkg/mod.pyc'):
+            with open(os.path.join(self.dir, path), 'w') as handle:
+                handle.write('')
+        dest = os.path.join(self.dir, 'dist', 'src')
+        copy_source_tree(self.dir, dest)
+        self.assertEqual(
+            sorted(os.listdir(dest)), ['.git', 'cirrus.conf', 'pkg']
+        )
+        self.assertEqual(
+            sorted(os.listdir(os.path.join(dest, 'pkg'))),
+            ['__init__.py', 'build']
+        )
+        self.failUnless(os.path.islink(os.path.join(dest, '.git')))
 
 
 class ReleaseUploadTest(unittest.TestCase):
@@ -338,9 +515,17 @@ class ReleaseUploadTest(unittest.TestCase):
         self.harness = CirrusConfigurationHarness('cirrus.release.load_configuration', self.config)
         self.harness.setUp()
         self.artifact_name = artifact_name(self.harness.config)
+        self.patch_journal = mock.patch(
+            'cirrus.release.checkpoint_file',
+            return_value=os.path.join(self.dir, 'release-1.2.3.json')
+        )
+        self.patch_journal.start()
 
     def tearDown(self):
         self.harness.tearDown()
+        self.patch_journal.stop()
+        if os.path.exists(self.dir):
+            os.system('rm -rf {0}'.format(self.dir))
 
     def test_missing_build_artifact(self):
         """test throws if build artifact not found"""
@@ -388,5 +573,128 @@ class ReleaseUploadTest(unittest.TestCase):
 
 
 
+class ReleaseMergeTest(unittest.TestCase):
+    """
+    tests for the release merge step graph
+    """
+    def setUp(self):
+        self.config = mock.Mock()
+        self.config.package_version.return_value = '1.2.3'
+        self.config.gitflow_master_name.return_value = 'master'
+        self.config.gitflow_branch_name.return_value = 'develop'
+        self.config.gitflow_release_prefix.return_value = 'release/'
+        self.rel_conf = {
+            'wait_on_ci': False,
+            'wait_on_ci_master': True,
+            'wait_on_ci_develop': False,
+            'wait_on_ci_timeout': 600,
+            'wait_on_ci_interval': 2,
+            'wait_on_ci_max_interval': 60,
+            'push_retry_attempts': 1,
+            'push_retry_cooloff': 0,
+            'push_retry_max_interval': 30,
+            'push_retry_deadline': 120,
+            'update_github_context': False,
+            'update_master_github_context': False,
+            'update_develop_github_context': False,
+        }
+        self.opts = mock.Mock()
+        self.opts.no_remote = False
+        self.opts.skip_master = False
+        self.opts.skip_develop = False
+        self.opts.log_status = False
+        self.opts.cleanup = True
+        self.patch_nightly = mock.patch(
+            'cirrus.release.rel_utils.is_nightly', return_value=False
+        )
+        self.patch_nightly.start()
+        self.patch_refs = mock.patch('cirrus.release.ref_shas', return_value={})
+        self.mock_refs = self.patch_refs.start()
+
+        self.ghc = mock.Mock()
+        self.ghc.active_branch_name = 'release/1.2.3'
+        self.shas = iter(['release-sha', 'master-sha', 'develop-sha'])
+        type(self.ghc.repo.head.ref).commit = mock.PropertyMock(
+            side_effect=lambda: mock.Mock(hexsha=next(self.shas))
+        )
+
+    def tearDown(self):
+        self.patch_nightly.stop()
+        self.patch_refs.stop()
+
+    def test_develop_pushed_while_master_ci_polled(self):
+        develop_pushed = threading.Event()
+
+        def wait(shas, **kwargs):
+            self.assertEqual(shas, ['master-sha'])
+            self.failUnless(develop_pushed.wait(5))
+            return {'master-sha': 'success'}
+
+        def push(refs, **kwargs):
+            if refs == ['develop']:
+                develop_pushed.set()
+
+        self.ghc.wait_on_gh_statuses.side_effect = wait
+        self.ghc.push_refs_with_retry.side_effect = push
+        merge = ReleaseMerge(self.ghc, self.config, self.rel_conf, self.opts)
+        results = merge.pipeline().run()
+
+        self.assertEqual(results['merge_master'], 'master-sha')
+        self.assertEqual(results['merge_develop'], 'develop-sha')
+        self.ghc.tag_release.assert_called_once_with(
+            '1.2.3', 'master', push=False, ref='master-sha'
+        )
+        pushed = [c[0][0] for c in self.ghc.push_refs_with_retry.call_args_list]
+        self.assertEqual(pushed, [['develop'], ['master', 'refs/tags/1.2.3']])
+        self.ghc.delete_branch.assert_called_once_with(
+            'release/1.2.3', remote=True
+        )
+
+    def test_master_ci_failure(self):
+        """a failed or timed out CI run stops the master tag and push"""
+        self.rel_conf['update_master_github_context'] = True
+        self.rel_conf['github_master_context_string'] = ['ci/cirrus']
+        self.ghc.wait_on_gh_statuses.return_value = {'master-sha': 'failure'}
+        merge = ReleaseMerge(self.ghc, self.config, self.rel_conf, self.opts)
+        self.assertRaises(RuntimeError, merge.pipeline().run)
+        self.failIf(self.ghc.tag_release.called)
+        self.failIf(self.ghc.set_commit_states.called)
+        self.failIf(self.ghc.delete_branch.called)
+        pushed = [c[0][0] for c in self.ghc.push_refs_with_retry.call_args_list]
+        self.failIf(['master', 'refs/tags/1.2.3'] in pushed)
+
+    def test_pushed_refs_skipped(self):
+        """refs already on origin and existing tags arent redone"""
+        self.rel_conf['wait_on_ci_master'] = False
+        self.opts.cleanup = False
+        self.mock_refs.side_effect = lambda repo_dir, *refs: {
+            'refs/tags/1.2.3': 'master-sha',
+            'refs/heads/develop': 'develop-sha',
+            'refs/remotes/origin/develop': 'develop-sha',
+            'refs/heads/master': 'master-sha',
+            'refs/remotes/origin/master': 'old-sha',
+        }
+        merge = ReleaseMerge(self.ghc, self.config, self.rel_conf, self.opts)
+        merge.pipeline().run()
+        self.failIf(self.ghc.tag_release.called)
+        self.ghc.push_refs_with_retry.assert_called_once_with(
+            ['master', 'refs/tags/1.2.3'], attempts=1, cooloff=0,
+            max_interval=30, deadline=120
+        )
+
+    def test_skip_and_no_remote(self):
+        self.opts.skip_master = True
+        self.opts.no_remote = True
+        merge = ReleaseMerge(self.ghc, self.config, self.rel_conf, self.opts)
+        names = [step.name for step in merge.pipeline().steps]
+        self.assertEqual(names, ['check_branch', 'merge_develop', 'cleanup'])
+
+    def test_wrong_branch(self):
+        self.ghc.active_branch_name = 'develop'
+        merge = ReleaseMerge(self.ghc, self.config, self.rel_conf, self.opts)
+        self.assertRaises(RuntimeError, merge.pipeline().run)
+        self.failIf(self.ghc.merge_branch.called)
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,39 @@
+#!/usr/bin/env python
+"""
+tests for utils module
+"""
+import os
+import stat
+import unittest
+import tempfile
+
+from cirrus.utils import update_file
+
+
+class UpdateFileTests(unittest.TestCase):
+    """inserting text after a sentinel"""
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.filename = os.path.join(self.dir, 'RELEASE_NOTES')
+        with open(self.filename, 'w') as handle:
+            handle.write("Release Notes\n=============\n\nolder notes\n")
+
+    def tearDown(self):
+        os.system('rm -rf {}'.format(self.dir))
+
+    def test_update_file(self):
+        os.chmod(self.filename, 0o640)
+        update_file(self.filename, '=============', 'new notes')
+        with open(self.filename, 'r') as handle:
+            content = handle.read()
+        self.assertEqual(
+            content,
+            "Release Notes\n=============\n\nnew notes\n\nolder notes\n"
+        )
+        # replacing the file keeps its mode
+        self.assertEqual(stat.S_IMODE(os.stat(self.filename).st_mode), 0o640)
+        self.failUnless(not os.path.exists(self.filename + '.tmp'))
+
+
+if __name__ == '__main__':
+    unittest.main()
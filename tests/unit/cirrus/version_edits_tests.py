@@ -0,0 +1,160 @@
+#!/usr/bin/env python
+"""
+tests for version_edits module
+"""
+import os
+import mock
+import unittest
+import tempfile
+
+from cirrus.version_edits import VersionEdits, bump_version, version_key
+from cirrus.utils import max_version
+
+CIRRUS_CONF = u"""# package settings
+[package]
+name = cirrus_unittest
+; keep this
+version = 1.2.3
+version_file = src/pkg/__init__.py
+
+[gitflow]
+# gitflow settings
+develop_branch = develop
+version = not this one
+"""
+
+REQUIREMENTS = u"""# pinned
+argparse
+arrow == 0.4.2  # why
+keyring>=8.5.1,<9.0.0
+requests==2.3.0; python_version > '2.7'
+requests-toolbelt==0.6.2
+"""
+
+VERSION_FILE = u"""#!/usr/bin/env python
+__version__ = '1.2.3'  # release managed
+__versionlike__ = 'nope'
+"""
+
+
+class VersionTests(unittest.TestCase):
+    """version parsing and bumping"""
+    def test_bump_version(self):
+        self.assertEqual(bump_version('1.2.3', 'major'), '2.0.0')
+        self.assertEqual(bump_version('1.2.3', 'minor'), '1.3.0')
+        self.assertEqual(bump_version('1.2.3', 'micro'), '1.2.4')
+        self.assertRaises(ValueError, bump_version, '1.2', 'micro')
+        self.assertRaises(ValueError, version_key, '1.2.3-nightly')
+
+    def test_max_version(self):
+        self.assertEqual(max_version('0.9.10', '0.10.0', '0.9.9'), '0.10.0')
+        # StrictVersion forms are still accepted
+        self.assertEqual(max_version('1.2', '1.1.9'), '1.2')
+        self.assertEqual(max_version('1.0', '1.0b1', '1.0a2'), '1.0')
+        self.assertEqual(max_version('1.0b2', '1.0b1', '0.9'), '1.0b2')
+        self.assertRaises(ValueError, max_version, '1.2.3', 'nightly')
+        self.assertRaises(ValueError, max_version, '1.2.3', '1.2.3rc1')
+
+
+class VersionEditsTests(unittest.TestCase):
+    """edits applied in memory and written once"""
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.conf = self.write('cirrus.conf', CIRRUS_CONF)
+        self.reqs = self.write('requirements.txt', REQUIREMENTS)
+        self.version_file = self.write('__init__.py', VERSION_FILE)
+
+    def tearDown(self):
+        os.system('rm -rf {}'.format(self.dir))
+
+    def write(self, name, content):
+        filename = os.path.join(self.dir, name)
+        with open(filename, 'w') as handle:
+            handle.write(content)
+        return filename
+
+    def read(self, filename):
+        with open(filename, 'r') as handle:
+            return handle.read()
+
+    def test_edits(self):
+        edits = VersionEdits()
+        edits.set_config_version(self.conf, '1.3.0')
+        edits.set_version_attribute(self.version_file, '1.3.0')
+        edits.bump_requirement(self.reqs, 'argparse', '1.4.0')
+        edits.bump_requirement(self.reqs, 'arrow', '0.5.0')
+        edits.bump_requirement(self.reqs, 'keyring', '8.6.0')
+        edits.bump_requirement(self.reqs, 'requests', '2.4.0')
+
+        # nothing written until applied
+        self.assertEqual(self.read(self.conf), CIRRUS_CONF)
+        with mock.patch('cirrus.version_edits.codecs.open', wraps=open) as mock_open:
+            changes = edits.apply()
+        self.assertEqual(changes, [self.conf, self.version_file, self.reqs])
+        self.assertEqual(
+            [call[0][1] for call in mock_open.call_args_list], ['w'] * 3
+        )
+
+        self.assertEqual(
+            self.read(self.conf),
+            CIRRUS_CONF.replace('version = 1.2.3', 'version = 1.3.0')
+        )
+        self.assertEqual(
+            self.read(self.version_file),
+            VERSION_FILE.replace("'1.2.3'", "'1.3.0'")
+        )
+        self.assertEqual(self.read(self.reqs), (
+            u"# pinned\n"
+            u"argparse==1.4.0\n"
+            u"arrow == 0.5.0  # why\n"
+            u"keyring>=8.6.0,<9.0.0\n"
+            u"requests==2.4.0; python_version > '2.7'\n"
+            u"requests-toolbelt==0.6.2\n"
+        ))
+
+    def test_requirement_names(self):
+        """names match like pip, extras are kept"""
+        self.write(
+            'requirements.txt',
+            u"Flask[async]==2.0.0\nrequests_toolbelt==0.6.2\nflask-login\n"
+        )
+        edits = VersionEdits()
+        edits.bump_requirement(self.reqs, 'Flask_Login', '0.5.0')
+        edits.bump_requirement(self.reqs, 'Requests-Toolbelt', '0.7.0')
+        edits.bump_requirement(self.reqs, 'flask', '2.1.0')
+        edits.apply()
+        self.assertEqual(self.read(self.reqs), (
+            u"Flask[async]==2.1.0\n"
+            u"requests_toolbelt==0.7.0\n"
+            u"flask-login==0.5.0\n"
+        ))
+
+    def test_missing_entries(self):
+        """missing versions are added, missing packages are an error"""
+        self.write('cirrus.conf', u"[package]\nname = pkg\n\n[gitflow]\n")
+        self.write('__init__.py', u"import os")
+        edits = VersionEdits()
+        edits.set_config_version(self.conf, '0.0.1')
+        edits.set_version_attribute(self.version_file, '0.0.1')
+        self.assertRaises(
+            KeyError, edits.bump_requirement, self.reqs, 'womp', '1.0.0'
+        )
+        edits.apply()
+        self.assertEqual(
+            self.read(self.conf),
+            u"[package]\nname = pkg\nversion = 0.0.1\n\n[gitflow]\n"
+        )
+        self.assertEqual(
+            self.read(self.version_file), u"import os\n__version__ = \"0.0.1\"\n"
+        )
+
+    def test_unchanged_files_not_written(self):
+        edits = VersionEdits()
+        edits.set_config_version(self.conf, '1.2.3')
+        with mock.patch('cirrus.version_edits.os.rename') as mock_rename:
+            self.assertEqual(edits.apply(), [self.conf])
+        self.failUnless(not mock_rename.called)
+
+
+if __name__ == '__main__':
+    unittest.main()